@@ -5,30 +5,29 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('main.ui', '.'), ('image/icon.ico', 'image')],
+    datas=[('image/icon.ico', 'image')],  # main.uiはmainUi.pyとして取り込まれる
     hiddenimports=['openpyxl.cell._writer'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # 使わない大きなパッケージ(起動時の展開と読み込みを減らす)
+    excludes=['tkinter', 'matplotlib', 'IPython', 'PyQt5.QtWebEngineWidgets'],
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
+# one-dirで配布する(one-fileは起動のたびに全てを一時フォルダに展開するため遅い)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='MSNAAnalyzer',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,  # UPXで圧縮したDLLは読み込むたびに展開が必要になる
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -37,3 +36,12 @@ exe = EXE(
     entitlements_file=None,
     icon=['image\\icon.ico'],
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='MSNAAnalyzer',
+)
@@ -1,5 +1,8 @@
 import numpy as np
 
+import beatFeatures
+import stageProfiler
+
 class auto_check():
     def __init__(self, MSNA: list, fs: int, baseline: float):
         """バーストのSN比を求め, MSNAのバーストを検出する
@@ -25,20 +28,71 @@ class auto_check():
         Returns:
             0 | 1: バーストの有無
         '''
-        F_MSNA_window = self.MSNA[R0:R1]
-        F_MSNA_max_arg = np.argmax(F_MSNA_window)
-        F_MSNA_max = np.max(F_MSNA_window)
-        if F_MSNA_max_arg == 0:
-            F_MSNA_min = F_MSNA_max
-        else:
-            F_MSNA_min = np.min(F_MSNA_window[:F_MSNA_max_arg])
-        SNR = F_MSNA_max / F_MSNA_min
-
-        if SNR > (1 + self.baseline * 0.01):
-            Burst = 1
-        else:
-            Burst = 0
-        return Burst
+        with stageProfiler.stage("burst_SNR", beats=1):
+            F_MSNA_window = self.MSNA[R0:R1]
+            F_MSNA_max_arg = np.argmax(F_MSNA_window)
+            F_MSNA_max = np.max(F_MSNA_window)
+            if F_MSNA_max_arg == 0:
+                F_MSNA_min = F_MSNA_max
+            else:
+                F_MSNA_min = np.min(F_MSNA_window[:F_MSNA_max_arg])
+            SNR = F_MSNA_max / F_MSNA_min
+
+            if SNR > (1 + self.baseline * 0.01):
+                Burst = 1
+            else:
+                Burst = 0
+            return Burst
+
+    def burst_SNR_all(self, window_starts: np.ndarray, window_stops: np.ndarray, block: int = 512) -> tuple:
+        """全ての区間のバーストのSN比を一括で求め, MSNAのバーストを検出する
+
+        burst_SNRを区間ごとに呼んだ結果と同じ判定を返す. 区間は重なってもよい.
+
+        Args:
+            window_starts (np.ndarray): 各区間の始点
+            window_stops (np.ndarray): 各区間の終点(含まない)
+            block (int): 一度に処理する区間の数
+
+        Returns:
+            np.ndarray: バーストの有無(0 | 1)
+            np.ndarray: 区間内のMSNAの最大値(高さ)
+            np.ndarray: 区間内のMSNAの和(面積)
+            np.ndarray: 区間の始点から最大値までの時間(秒)
+        """
+        SNR, MSNA_max, MSNA_sum, max_time = self.burst_SNR_values(window_starts, window_stops, block)
+        return self.is_burst(SNR), MSNA_max, MSNA_sum, max_time
+
+    def burst_SNR_values(self, window_starts: np.ndarray, window_stops: np.ndarray, block: int = 512) -> tuple:
+        """全ての区間のSN比を一括で求める(baselineによる判定はしない)
+
+        MSNAの固定長の窓(ストライドによるビュー)をblock区間ずつ取り出して縮約するため,
+        MSNA全体をコピーせず, メモリマップのデータにも使える.
+
+        Args:
+            window_starts (np.ndarray): 各区間の始点
+            window_stops (np.ndarray): 各区間の終点(含まない)
+            block (int): 一度に処理する区間の数
+
+        Returns:
+            np.ndarray: SN比(区間内の最大値 / 最大値より前の最小値)
+            np.ndarray: 区間内のMSNAの最大値(高さ)
+            np.ndarray: 区間内のMSNAの和(面積)
+            np.ndarray: 区間の始点から最大値までの時間(秒)
+        """
+        SNR, MSNA_max, MSNA_sum, max_arg = beatFeatures.window_stats(self.MSNA, window_starts, window_stops, block)
+        return SNR, MSNA_max, MSNA_sum, max_arg / self.fs
+
+    def is_burst(self, SNR: np.ndarray) -> np.ndarray:
+        """SN比からバーストを判定する(burst_SNRと同じ閾値)
+
+        Args:
+            SNR (np.ndarray): SN比
+
+        Returns:
+            np.ndarray: バーストの有無(0 | 1)
+        """
+        return (np.asarray(SNR) > (1 + self.baseline * 0.01)).astype(int)
 
 if  __name__ == "__main__":
     pass
\ No newline at end of file
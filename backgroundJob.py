@@ -0,0 +1,69 @@
+import threading
+
+from PyQt5 import QtCore
+
+
+class job_cancelled(Exception):
+    """取り消されたジョブの中で投げる(background_job.check)"""
+
+
+class background_job(QtCore.QThread):
+    progress = QtCore.pyqtSignal(int, str)  # 進み具合(%), 段階の名前
+    done = QtCore.pyqtSignal(object)  # funcの戻り値
+    failed = QtCore.pyqtSignal(object)  # funcが投げた例外
+
+    def __init__(self, func, *args):
+        """func(job, *args)を別のスレッドで実行し, 結果をシグナルでメインスレッドに返す
+
+        funcはjob.report(...)で進み具合を伝え, その中で取り消しを確認する(取り消されていればjob_cancelled).
+        取り消した後はdone, failedを出さない. ただし取り消す前に出したシグナルは届くことがあるので,
+        受け取る側でも最新のジョブかどうかを確認する.
+
+        Args:
+            func: 実行する関数(最初の引数にこのジョブを受け取る)
+            *args: funcに渡す引数
+        """
+        super().__init__()
+        self.func = func
+        self.args = args
+        self._cancel = threading.Event()
+
+    def run(self):
+        """funcを実行する(QThread.start()から呼ばれる. 直接呼ぶと呼んだスレッドで実行する)"""
+        try:
+            result = self.func(self, *self.args)
+        except job_cancelled:
+            return
+        except Exception as e:
+            if not self.cancelled:
+                self.failed.emit(e)
+            return
+        if not self.cancelled:
+            self.done.emit(result)
+
+    def cancel(self):
+        """ジョブを取り消す(funcは次にreport, checkを呼んだ時点で止まる)"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """取り消されたかどうか"""
+        return self._cancel.is_set()
+
+    def check(self):
+        """取り消されていればjob_cancelledを投げる"""
+        if self.cancelled:
+            raise job_cancelled()
+
+    def report(self, fraction: float, stage: str = ""):
+        """進み具合を伝える(取り消されていればjob_cancelled)
+
+        Args:
+            fraction (float): 進み具合(0-1)
+            stage (str): 段階の名前
+        """
+        self.check()
+        self.progress.emit(round(100 * fraction), stage)
+
+if __name__ == "__main__":
+    pass
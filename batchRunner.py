@@ -0,0 +1,261 @@
+"""
+msna-batch
+研究フォルダ内の全ての記録を、プロセスプールで並列に解析するツールです。
+
+使い方:
+python batchRunner.py study_folder -o results -j 8 --timeout 600 --baseline 10 --fs 2000
+
+各記録の結果表をresults以下に(フォルダ構成を保って)保存し、全記録の要約をresults/summary.(xlsx|txt)に出力します。
+完了した記録はresults/manifest.jsonlに記録され、同じ設定で再実行すると飛ばされます
+(記録ファイルまたは設定が変わった場合は解析し直します)。
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing.connection import wait
+from pathlib import Path
+
+import pandas as pd
+
+import dataCache
+import dataProcessing
+import msnaAnalyze
+
+MANIFEST = "manifest.jsonl"
+SUMMARY = "summary"  # 全記録の要約のファイル名(拡張子は--format)
+
+
+def find_recordings(paths: list, pattern: str = "*.txt", out_dir: Path | None = None) -> list:
+    """ファイルまたはフォルダ(再帰的に検索)から記録ファイルを集める(結果ファイル, 要約, 出力先の中のファイルは除く)
+
+    Args:
+        paths (list): ファイルまたはフォルダ
+        pattern (str): 記録ファイルのパターン
+        out_dir (Path | None): 出力先(検索するフォルダの中のサブフォルダの場合に, その中を除く)
+
+    Returns:
+        list: (記録ファイル, 出力先の相対パスの基準)のリスト
+    """
+    out_dir = None if out_dir is None else Path(out_dir).resolve()
+    recordings = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            root = path.resolve()
+            skip = out_dir if out_dir is not None and out_dir != root and out_dir.is_relative_to(root) else None
+            for file in sorted(path.rglob(pattern)):
+                if not file.is_file() or file.stem.endswith("_result") or file.stem == SUMMARY:
+                    continue
+                if skip is not None and file.resolve().is_relative_to(skip):
+                    continue
+                recordings.append((file, path))
+        else:
+            recordings.append((path, path.parent))
+    return recordings
+
+
+def settings_hash(options: dict) -> str:
+    """解析結果に影響する設定のハッシュ(変わったら解析し直す)
+
+    Args:
+        options (dict): analyze_recordingのキーワード引数
+
+    Returns:
+        str: ハッシュ値
+    """
+    settings = dict(options, **dataProcessing.data_set(None, None, None, options["fs"]).settings())
+    return hashlib.blake2b(json.dumps(settings, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+
+
+def read_manifest(out_dir: Path) -> dict:
+    """マニフェストを読み込む(同じ記録は最後の行を使う)
+
+    Args:
+        out_dir (Path): 出力先
+
+    Returns:
+        dict: 記録ファイルの絶対パス -> 行
+    """
+    entries = {}
+    path = out_dir / MANIFEST
+    if path.exists():
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 書き込み途中で中断された行
+                entries[entry["file"]] = entry
+    return entries
+
+
+def is_done(entry: dict | None, file: Path, settings: str) -> bool:
+    """同じ記録を同じ設定で解析済みかどうか
+
+    Args:
+        entry (dict | None): マニフェストの行
+        file (Path): 記録ファイル
+        settings (str): 設定のハッシュ
+
+    Returns:
+        bool: 解析済みで結果ファイルがある場合True
+    """
+    if entry is None or entry["status"] != "ok" or entry["settings"] != settings:
+        return False
+    stat = file.stat()
+    return entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns and Path(entry["output"]).exists()
+
+
+def _worker(file: str, output: str, options: dict, cache_args: dict | None, conn):
+    """子プロセスで1つの記録を解析し, 要約をconnに送る
+
+    Args:
+        file (str): 記録ファイル
+        output (str): 結果表の保存先
+        options (dict): analyze_recordingのキーワード引数
+        cache_args (dict | None): data_cacheの引数(Noneの場合はキャッシュを使わない)
+        conn: 結果を送るパイプ
+    """
+    try:
+        cache = None if cache_args is None else dataCache.data_cache(**cache_args)
+        df = msnaAnalyze.analyze_recording(file, cache=cache, **options)
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        msnaAnalyze.save_result(df, output)
+        conn.send(("ok", msnaAnalyze.summarize(df)))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def run_batch(recordings: list, out_dir: Path, options: dict, cache_args: dict | None = None, workers: int | None = None,
+              timeout: float | None = None, fmt: str = "xlsx", force: bool = False) -> pd.DataFrame:
+    """記録をプロセスプールで並列に解析し, 全記録の要約を返す
+
+    記録ごとに子プロセスを起動するため, 失敗やタイムアウトした記録は他に影響しない.
+    終わった記録はすぐにマニフェストへ追記するので, 中断しても再実行で続きから処理できる.
+
+    Args:
+        recordings (list): find_recordingsの戻り値
+        out_dir (Path): 出力先
+        options (dict): analyze_recordingのキーワード引数
+        cache_args (dict | None): data_cacheの引数(Noneの場合はキャッシュを使わない)
+        workers (int | None): 同時に実行するプロセス数(Noneの場合はCPU数)
+        timeout (float | None): 1つの記録の制限時間(秒)
+        fmt (str): 結果表の形式(xlsx | txt)
+        force (bool): 解析済みの記録も解析し直す
+
+    Returns:
+        pd.DataFrame: 全記録の要約
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    settings = settings_hash(options)
+    manifest = read_manifest(out_dir)
+
+    todo = []
+    for file, root in recordings:
+        key = str(file.resolve())
+        if not force and is_done(manifest.get(key), file, settings):
+            continue
+        output = out_dir / file.relative_to(root).parent / f"{file.stem}_result.{fmt}"
+        todo.append((file, key, output))
+    print(f"{len(recordings)} recordings, {len(recordings) - len(todo)} already done, {len(todo)} to analyze", file=sys.stderr)
+
+    running = {}  # sentinel -> (process, conn, file, key, output, start)
+    with open(out_dir / MANIFEST, "a") as manifest_file:
+        def record(file: Path, key: str, output: Path, status: str, result, elapsed: float):
+            stat = file.stat()
+            entry = {
+                "file": key, "output": str(output), "settings": settings, "size": stat.st_size,
+                "mtime": stat.st_mtime_ns, "status": status, "elapsed": round(elapsed, 3),
+            }
+            if status == "ok":
+                entry["summary"] = result
+            else:
+                entry["error"] = result
+            manifest_file.write(json.dumps(entry) + "\n")
+            manifest_file.flush()
+            manifest[key] = entry
+            print(f"{file}: {status} ({elapsed:.1f} s){'' if status == 'ok' else ' ' + result}", file=sys.stderr)
+
+        while todo or running:
+            while todo and len(running) < workers:
+                file, key, output = todo.pop(0)
+                parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=_worker, args=(str(file), str(output), options, cache_args, child_conn))
+                process.start()
+                child_conn.close()
+                running[process.sentinel] = (process, parent_conn, file, key, output, time.perf_counter())
+
+            # 最も早く制限時間に達する記録まで待つ
+            wait_time = 0.5
+            if timeout is not None:
+                deadline = min(start for _, _, _, _, _, start in running.values()) + timeout
+                wait_time = min(wait_time, max(0.0, deadline - time.perf_counter()))
+            ready = wait(list(running), timeout=wait_time)
+            now = time.perf_counter()
+            for sentinel in list(running):
+                process, conn, file, key, output, start = running[sentinel]
+                if sentinel in ready:
+                    process.join()
+                    status, result = conn.recv() if conn.poll() else ("error", f"worker exited with code {process.exitcode}")
+                elif timeout is not None and now - start > timeout:
+                    process.terminate()
+                    process.join()
+                    status, result = "error", f"timeout after {timeout} s"
+                else:
+                    continue
+                conn.close()
+                del running[sentinel]
+                record(file, key, output, status, result, now - start)
+
+    # 今回の記録の要約(マニフェストの最新の行から)
+    rows = []
+    for file, root in recordings:
+        entry = manifest.get(str(file.resolve()), {})
+        row = {"file": str(file), "status": entry.get("status", "missing"), "error": entry.get("error", "")}
+        row.update(entry.get("summary", {}))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv: list | None = None) -> int:
+    """コマンドラインから研究フォルダを一括で解析する
+
+    Args:
+        argv (list | None): コマンドライン引数
+
+    Returns:
+        int: 終了コード(失敗した記録があれば1)
+    """
+    parser = argparse.ArgumentParser(prog="msna-batch", description="Analyze many recordings in parallel.")
+    parser.add_argument("paths", nargs="+", help="recording files or folders (searched recursively)")
+    parser.add_argument("-o", "--output-dir", required=True, help="output directory for results, manifest and summary")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None, help="time limit per recording (s)")
+    parser.add_argument("--pattern", default="*.txt", help="file pattern when searching folders")
+    parser.add_argument("--format", choices=msnaAnalyze.EXPORT_CHOICES, default="xlsx", help="output format")
+    parser.add_argument("--force", action="store_true", help="re-analyze recordings already in the manifest")
+    msnaAnalyze.add_analysis_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.mmap and args.no_cache:
+        parser.error("--mmap cannot be used with --no-cache")
+
+    cache_args = None if args.no_cache else {"cache_dir": args.cache_dir, "max_bytes": msnaAnalyze.cache_bytes(args)}
+    out_dir = Path(args.output_dir)
+    summary = run_batch(find_recordings(args.paths, args.pattern, out_dir), out_dir, msnaAnalyze.analysis_options(args),
+                        cache_args, args.workers, args.timeout, args.format, args.force)
+    summary_path = out_dir / f"{SUMMARY}.{args.format}"
+    msnaAnalyze.save_result(summary, str(summary_path))
+    failed = int((summary["status"] != "ok").sum())
+    print(f"{len(summary) - failed} ok, {failed} failed -> {summary_path}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
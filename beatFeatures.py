@@ -0,0 +1,260 @@
+import numpy as np
+import pandas as pd
+
+import stageProfiler
+
+
+def _window_blocks(x: np.ndarray, starts: np.ndarray, stops: np.ndarray, fill: float,
+                   block: int = 512, max_elements: int = 1 << 22):
+    """区間[starts, stops)を固定長の窓(ストライドによるビュー)としてblock区間ずつ取り出す
+
+    xの全体をコピーしないため, メモリマップのデータにも使える. 区間の長さより後ろはfillで埋める.
+    1回に取り出す要素数がmax_elementsを超えないようにblockを小さくする.
+
+    Args:
+        x (np.ndarray): データ
+        starts (np.ndarray): 各区間の始点
+        stops (np.ndarray): 各区間の終点(含まない, xの長さで切り詰める)
+        fill (float): 区間外を埋める値
+        block (int): 一度に取り出す区間の数
+        max_elements (int): 一度に取り出す要素数の上限
+
+    Yields:
+        int: ブロックの最初の区間の番号
+        np.ndarray: 窓((区間の数, 窓の幅))
+        np.ndarray: 区間内かどうか((区間の数, 窓の幅))
+    """
+    x = np.asarray(x)
+    starts = np.asarray(starts, dtype=np.intp)
+    stops = np.minimum(np.asarray(stops, dtype=np.intp), len(x))
+    if np.any(starts < 0) or np.any(stops <= starts):
+        raise ValueError("Invalid burst window")
+    lengths = stops - starts
+    dtype = np.result_type(x.dtype, np.float32)
+
+    # データの末尾を越える窓は, 末尾だけをfillで埋めた短い配列から取る
+    width = int(lengths.max()) if len(lengths) else 1
+    n_full = max(len(x) - width + 1, 0)
+    tail = np.concatenate([x[n_full:], np.full(width, fill, dtype=dtype)])
+    tail_windows = np.lib.stride_tricks.sliding_window_view(tail, width)
+    windows = np.lib.stride_tricks.sliding_window_view(x[:n_full + width - 1], width) if n_full else tail_windows
+
+    cols = np.arange(width)
+    block = max(min(block, max_elements // width), 1)
+    for b in range(0, len(starts), block):
+        s = starts[b:b + block]
+        head = s < n_full
+        W = np.empty((len(s), width), dtype=dtype)
+        W[head] = windows[s[head]]
+        W[~head] = tail_windows[s[~head] - n_full]
+        valid = cols < lengths[b:b + block, None]
+        W[~valid] = fill
+        yield b, W, valid
+
+
+def _equal_windows(x: np.ndarray, starts: np.ndarray, stops: np.ndarray, max_elements: int = 1 << 20):
+    """区間[starts, stops)を長さの等しいものごとにまとめ, その長さの窓(ストライドによるビュー)として取り出す
+
+    窓を最長の区間に合わせて埋めないので, 計算量は区間が覆うサンプル数に比例し,
+    長いR-R間隔(記録の途切れ, カフの再較正など)が他の区間を遅くしない.
+    xの全体をコピーしないため, メモリマップのデータにも使える.
+
+    Args:
+        x (np.ndarray): データ
+        starts (np.ndarray): 各区間の始点
+        stops (np.ndarray): 各区間の終点(含まない, xの長さで切り詰める)
+        max_elements (int): 一度に取り出す要素数の上限
+
+    Yields:
+        np.ndarray: 取り出した区間の番号
+        np.ndarray: 窓((区間の数, 区間の長さ))
+    """
+    starts = np.asarray(starts, dtype=np.intp)
+    stops = np.minimum(np.asarray(stops, dtype=np.intp), len(x))
+    if np.any(starts < 0) or np.any(stops <= starts):
+        raise ValueError("Invalid burst window")
+    if len(starts) == 0:
+        return
+    lengths = stops - starts
+    order = np.argsort(lengths, kind="stable")
+    for group in np.split(order, np.flatnonzero(np.diff(lengths[order])) + 1):
+        width = int(lengths[group[0]])
+        windows = np.lib.stride_tricks.sliding_window_view(x, width)
+        block = max(max_elements // width, 1)
+        for b in range(0, len(group), block):
+            index = group[b:b + block]
+            yield index, windows[starts[index]]
+
+
+def window_argmax(x: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """各区間の最大値の位置(区間の始点から, 同じ値が複数ある場合は最初)
+
+    Args:
+        x (np.ndarray): データ
+        starts (np.ndarray): 各区間の始点
+        stops (np.ndarray): 各区間の終点(含まない)
+
+    Returns:
+        np.ndarray: 最大値の位置
+    """
+    arg = np.empty(len(starts), dtype=np.intp)
+    for index, W in _equal_windows(x, starts, stops):
+        arg[index] = np.argmax(W, axis=1)
+    return arg
+
+
+def window_argmin(x: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """各区間の最小値の位置(区間の始点から, 同じ値が複数ある場合は最初)
+
+    Args:
+        x (np.ndarray): データ
+        starts (np.ndarray): 各区間の始点
+        stops (np.ndarray): 各区間の終点(含まない)
+
+    Returns:
+        np.ndarray: 最小値の位置
+    """
+    arg = np.empty(len(starts), dtype=np.intp)
+    for index, W in _equal_windows(x, starts, stops):
+        arg[index] = np.argmin(W, axis=1)
+    return arg
+
+
+def window_stats(x: np.ndarray, starts: np.ndarray, stops: np.ndarray, block: int = 512) -> tuple:
+    """各区間のバーストのSN比, 最大値, 和を求める(auto_check.burst_SNRを区間ごとに呼ぶのと同じ値)
+
+    Args:
+        x (np.ndarray): MSNAのデータ
+        starts (np.ndarray): 各区間の始点
+        stops (np.ndarray): 各区間の終点(含まない)
+        block (int): 一度に処理する区間の数
+
+    Returns:
+        np.ndarray: SN比(区間内の最大値 / 最大値より前の最小値)
+        np.ndarray: 区間内の最大値(高さ)
+        np.ndarray: 区間内の和(面積)
+        np.ndarray: 区間の始点から最大値までのサンプル数
+    """
+    with stageProfiler.stage("burst_SNR", beats=len(starts)):
+        MSNA_max = np.empty(len(starts), dtype=np.float64)
+        MSNA_min = np.empty(len(starts), dtype=np.float64)
+        MSNA_sum = np.empty(len(starts), dtype=np.float64)
+        max_arg = np.empty(len(starts), dtype=np.intp)
+        for b, W, valid in _window_blocks(x, starts, stops, -np.inf, block):
+            rows = np.arange(len(W))
+            arg = np.argmax(W, axis=1)
+            max_arg[b:b + len(W)] = arg
+            MSNA_max[b:b + len(W)] = W[rows, arg]
+            # 最大値より前の最小値(最大値が先頭の場合は最大値)
+            pre = np.where(np.arange(W.shape[1]) < arg[:, None], W, np.inf).min(axis=1)
+            MSNA_min[b:b + len(W)] = np.where(arg == 0, W[rows, arg], pre)
+            MSNA_sum[b:b + len(W)] = np.where(valid, W, 0).sum(axis=1, dtype=np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            SNR = MSNA_max / MSNA_min
+        return SNR, MSNA_max, MSNA_sum, max_arg
+
+
+def window_segments(x: np.ndarray, starts: np.ndarray, width: int, fill: float = np.nan) -> np.ndarray:
+    """各区間の始点からwidthサンプルの波形を切り出す(データの末尾を越える部分はfillで埋める)
+
+    Args:
+        x (np.ndarray): データ
+        starts (np.ndarray): 各区間の始点
+        width (int): 切り出すサンプル数
+        fill (float): 区間外を埋める値
+
+    Returns:
+        np.ndarray: 波形((区間の数, width))
+    """
+    starts = np.asarray(starts, dtype=np.intp)
+    out = np.empty((len(starts), width), dtype=np.result_type(np.asarray(x[:0]).dtype, np.float32))
+    for b, W, _ in _window_blocks(x, starts, starts + width, fill):
+        out[b:b + len(W)] = W
+    return out
+
+
+def reject_short_RR(peaks_ECG: np.ndarray, RR_reject: float) -> np.ndarray:
+    """直前のピークとの間隔が, 平均RR間隔のRR_reject倍より短いピークを削除する
+
+    Args:
+        peaks_ECG (np.ndarray): ECGのピーク
+        RR_reject (float): 平均RR間隔に対する割合
+
+    Returns:
+        np.ndarray: 残したピーク
+    """
+    peaks_ECG = np.asarray(peaks_ECG)
+    peaks_ECG_diff = np.diff(peaks_ECG)
+    short = peaks_ECG_diff < RR_reject * np.mean(peaks_ECG_diff)
+    return peaks_ECG[np.concatenate([[True], ~short])]
+
+
+def bp_peaks(F_BP: np.ndarray, peaks_ECG: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """各R-R間隔の前半からBPのsystolicピーク(最大値)とdiastolicピーク(最小値)を探す
+
+    Args:
+        F_BP (np.ndarray): フィルタをかけたBPデータ
+        peaks_ECG (np.ndarray): ECGのピーク
+
+    Returns:
+        np.ndarray: BPのsystolicピーク
+        np.ndarray: BPのdiastolicピーク
+    """
+    peaks_ECG = np.asarray(peaks_ECG, dtype=np.intp)
+    starts = peaks_ECG[:-1]
+    stops = starts + np.diff(peaks_ECG) // 2
+    # 同じ窓から最大値と最小値を求める
+    sbp_arg = np.empty(len(starts), dtype=np.intp)
+    dbp_arg = np.empty(len(starts), dtype=np.intp)
+    for index, W in _equal_windows(F_BP, starts, stops):
+        sbp_arg[index] = np.argmax(W, axis=1)
+        dbp_arg[index] = np.argmin(W, axis=1)
+    return sbp_arg + starts, dbp_arg + starts
+
+
+def beat_table(F_BP: np.ndarray, F_MSNA: np.ndarray, peaks_ECG_arg: np.ndarray, sbp_arg: np.ndarray,
+               dbp_arg: np.ndarray, fs: int, min_val: int, max_val: int) -> pd.DataFrame:
+    """全ての拍の特徴量をまとめて求める(最後の2拍はGUIと同じく含まない)
+
+    手動モードと自動モードはどちらもこの表の行を使う.
+
+    Args:
+        F_BP (np.ndarray): フィルタをかけたBPデータ
+        F_MSNA (np.ndarray): 補正したMSNAデータ
+        peaks_ECG_arg (np.ndarray): ECGのピーク
+        sbp_arg (np.ndarray): BPのsystolicピーク
+        dbp_arg (np.ndarray): BPのdiastolicピーク
+        fs (int): サンプリング周波数
+        min_val (int): R波からのバースト判定区間の始点(サンプル)
+        max_val (int): R波からのバースト判定区間の終点(サンプル)
+
+    Returns:
+        pd.DataFrame: 拍ごとのR time, RRI, HR, DBP time, DBP, SBP time, SBP, iMSNA time, iMSNA height,
+            iMSNA area, SNR(バースト判定に使うSN比)
+    """
+    peaks_ECG_arg = np.asarray(peaks_ECG_arg)
+    R = peaks_ECG_arg[:max(len(peaks_ECG_arg) - 2, 0)]
+    r_lift = min_val + R
+    r_right = max_val + R
+    SNR, MSNA_height, MSNA_area, _ = window_stats(F_MSNA, r_lift, r_right + 1)
+    RRI = np.diff(peaks_ECG_arg)[:len(R)] / fs
+    dbp = np.asarray(dbp_arg[:len(R)], dtype=np.intp)
+    sbp = np.asarray(sbp_arg[:len(R)], dtype=np.intp)
+    F_BP = np.asarray(F_BP)
+    return pd.DataFrame({
+        "R time": R / fs,
+        "RRI": RRI,
+        "HR": 60 / RRI,
+        "DBP time": dbp / fs,
+        "DBP": F_BP[dbp],
+        "SBP time": sbp / fs,
+        "SBP": F_BP[sbp],
+        "iMSNA time": r_lift,
+        "iMSNA height": MSNA_height,
+        "iMSNA area": MSNA_area,
+        "SNR": SNR,
+    })
+
+if __name__ == "__main__":
+    pass
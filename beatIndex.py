@@ -0,0 +1,111 @@
+import numpy as np
+
+# 見直しで絞り込む拍の種類
+REVIEW_FILTERS = ["all", "burst", "no burst", "error", "borderline"]
+# 見直しで表示するラベルの名前(-1は未判定)
+LABEL_NAMES = {-1: "unscored", 0: "no burst", 1: "burst", 2: "error"}
+
+
+class beat_index:
+    def __init__(self, R: np.ndarray, fs: int):
+        """R波の位置(サンプル)から, 時刻やサンプルに対応する拍の番号を二分探索で求める索引
+
+        拍iはR[i]からR[i + 1]の手前まで(最初のR波より前は拍0, 最後のR波より後は最後の拍)とする.
+        絞り込んだ拍(selection)の中の前後の移動も二分探索で行うので, 24時間の記録(10万拍)でも
+        1回の移動は拍数によらない.
+
+        Args:
+            R (np.ndarray): 各拍のR波の位置(サンプル, 昇順)
+            fs (int): サンプリング周波数
+        """
+        self.R = np.asarray(R, dtype=np.int64)
+        if len(self.R) == 0:
+            raise ValueError("No beats to index")
+        if np.any(np.diff(self.R) <= 0):
+            raise ValueError("R peaks must be strictly increasing")
+        self.fs = fs
+
+    def __len__(self) -> int:
+        return len(self.R)
+
+    def beat_at(self, sample: float) -> int:
+        """sampleを含む拍の番号
+
+        Args:
+            sample (float): サンプル
+
+        Returns:
+            int: 拍の番号
+        """
+        return int(np.clip(np.searchsorted(self.R, sample, side="right") - 1, 0, len(self.R) - 1))
+
+    def beat_at_time(self, t: float) -> int:
+        """時刻t(秒)を含む拍の番号
+
+        Args:
+            t (float): 記録の先頭からの時刻(秒)
+
+        Returns:
+            int: 拍の番号
+        """
+        return self.beat_at(t * self.fs)
+
+    def time_of(self, i: int) -> float:
+        """i番目の拍のR波の時刻(秒)
+
+        Args:
+            i (int): 拍の番号
+
+        Returns:
+            float: 時刻
+        """
+        return self.R[i] / self.fs
+
+    @staticmethod
+    def neighbor(selection: np.ndarray, i: int, direction: int = 1) -> int | None:
+        """絞り込んだ拍のうち, iより後(direction=-1の場合は前)の最初の拍
+
+        Args:
+            selection (np.ndarray): 絞り込んだ拍の番号(昇順)
+            i (int): 今の拍の番号
+            direction (int): 1: 次, -1: 前
+
+        Returns:
+            int | None: 拍の番号(なければNone)
+        """
+        if direction > 0:
+            k = np.searchsorted(selection, i, side="right")
+            return int(selection[k]) if k < len(selection) else None
+        k = np.searchsorted(selection, i, side="left") - 1
+        return int(selection[k]) if k >= 0 else None
+
+
+def review_selection(label: np.ndarray, SNR: np.ndarray, name: str, threshold: float,
+                     margin: float = 0.1) -> np.ndarray:
+    """見直す拍を絞り込む
+
+    "borderline"はSN比がバースト判定の閾値の前後margin(閾値に対する割合)以内の拍で,
+    自動モードの判定が入れ替わりやすい拍. 絞り込みは選んだ時点のラベルで行い, その後に書き換えても変えない.
+
+    Args:
+        label (np.ndarray): 拍ごとのラベル(scoringSession.session_table.label)
+        SNR (np.ndarray): 拍ごとのSN比
+        name (str): REVIEW_FILTERSのいずれか
+        threshold (float): バースト判定の閾値(1 + Baseline * 0.01)
+        margin (float): borderlineの幅
+
+    Returns:
+        np.ndarray: 拍の番号(昇順)
+    """
+    if name == "all":
+        return np.arange(len(label))
+    if name == "borderline":
+        with np.errstate(invalid="ignore"):
+            return np.flatnonzero(np.abs(np.asarray(SNR) / threshold - 1) <= margin)
+    labels = {value: key for key, value in LABEL_NAMES.items()}
+    if name not in labels:
+        raise ValueError(f"Unknown review filter: {name}")
+    return np.flatnonzero(np.asarray(label) == labels[name])
+
+if __name__ == "__main__":
+    pass
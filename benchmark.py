@@ -0,0 +1,215 @@
+"""
+msna-benchmark
+合成した記録(syntheticData)で、読み込みからバースト判定、書き出しまでの各段階の時間とメモリを計測するツールです。
+
+使い方:
+python benchmark.py --durations 5m 1h --fs 2000 -o benchmark.xlsx
+python benchmark.py --durations 24h --float32 --chunk-size 10000000 --no-load
+
+段階: load(.txtの読み込み), filter(zerofilter_sci), peaks(find_peaks + RR間隔の除外),
+BP peaks(SBP/DBPの抽出), scoring(バーストのSN比と判定), export(結果表の書き出し)。
+正解(R波, SBP, DBP, バースト)との一致も出力するので、実際の記録を使わずに
+dataProcessingとautoCheckの変更の速度と精度を比べられます。
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import dataLoader
+import dataProcessing
+import msnaAnalyze
+import stageProfiler
+import syntheticData
+
+# 計測する段階
+STAGES = ["load", "filter", "peaks", "BP peaks", "scoring", "export"]
+# 出力する表の列
+BENCH_COLUMNS = ["duration (s)", "samples", "stage", "time (s)", "M samples/s", "peak memory (MB)"]
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def duration_seconds(value: str) -> float:
+    """"30s", "5m", "1.5h"形式(単位なしは秒)の長さを読む(argparseのtype)
+
+    Args:
+        value (str): 長さ
+
+    Returns:
+        float: 秒
+    """
+    unit = DURATION_UNITS.get(value[-1:].lower())
+    try:
+        seconds = float(value[:-1]) * unit if unit else float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid duration {value!r}, expected e.g. 300, 5m or 24h") from None
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"invalid duration {value!r}, must be positive")
+    return seconds
+
+
+class stage_timer:
+    def __init__(self, repeat: int = 1, memory: bool = True):
+        """段階ごとの時間(repeat回の最小値)とPythonのヒープの最大使用量(1回目)を計測する
+
+        Args:
+            repeat (int): 各段階を繰り返す回数
+            memory (bool): tracemallocでメモリを計測する(計測しない方が時間は正確)
+        """
+        self.repeat = repeat
+        self.memory = memory
+        self.times = {}
+        self.peaks = {}
+
+    def measure(self, stage: str, func, *args):
+        """func(*args)を計測し, 最後の戻り値を返す
+
+        Args:
+            stage (str): 段階の名前
+            func: 計測する関数
+
+        Returns:
+            funcの戻り値
+        """
+        best = float("inf")
+        for i in range(self.repeat):
+            if self.memory and i == 0:
+                tracemalloc.start()
+            t0 = time.perf_counter()
+            result = func(*args)
+            best = min(best, time.perf_counter() - t0)
+            if self.memory and i == 0:
+                self.peaks[stage] = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+        self.times[stage] = best
+        return result
+
+
+def run_benchmark(recording: syntheticData.synthetic_recording, work_dir: Path, region: tuple[float, float] = (0.5, 1.5),
+                  baseline: float = 10.0, dtype: type = np.float64, chunk_size: int | None = None, load: bool = True,
+                  fmt: str = "txt", repeat: int = 1, memory: bool = True) -> tuple[pd.DataFrame, dict]:
+    """合成した記録を各段階に分けて解析し, 時間, メモリ, 精度を求める
+
+    Args:
+        recording (syntheticData.synthetic_recording): 合成した記録
+        work_dir (Path): .txtファイル, メモリマップ, 結果表を置くディレクトリ
+        region (tuple[float, float]): R波からのバースト判定区間(秒)
+        baseline (float): ベースライン(%)
+        dtype (type): 読み込むデータの型(np.float64 | np.float32)
+        chunk_size (int | None): フィルタとピーク検出を分割して行うサンプル数(指定するとメモリマップに書き込む)
+        load (bool): .txtファイルを書き出して読み込みも計測する(Falseの場合は信号を直接作る)
+        fmt (str): 結果表の形式
+        repeat (int): 各段階を繰り返す回数
+        memory (bool): メモリを計測する
+
+    Returns:
+        pd.DataFrame: 段階ごとの時間, スループット, メモリ(BENCH_COLUMNS)
+        dict: 正解との比較(synthetic_recording.evaluate)
+    """
+    timer = stage_timer(repeat, memory)
+    fs = recording.fs
+    out = [str(work_dir / f"{name}.npy") for name in ("ECG", "BP", "iMSNA")] if chunk_size else None
+    if load:
+        file = work_dir / "synthetic.txt"
+        recording.write_txt(file)
+        ECG, BP, iMSNA = timer.measure("load", dataLoader.txt_loader(str(file), dtype).read, out)
+    else:
+        ECG, BP, iMSNA = recording.signals(dtype)
+
+    dataSet = dataProcessing.data_set(ECG, BP, iMSNA, fs, chunk_size, str(work_dir) if chunk_size else None)
+    F_ECG, F_BP = timer.measure("filter", dataSet.filter_signals)
+    peaks_ECG = timer.measure("peaks", dataSet.detect_peaks, F_ECG)
+    offset = int(peaks_ECG[0])
+    _, F_BP, F_MSNA, peaks_ECG, sbp_arg, dbp_arg = timer.measure("BP peaks", dataSet.beat_peaks, F_ECG, F_BP, peaks_ECG)
+    min_val, max_val = msnaAnalyze.region_samples(region, fs)
+    df = timer.measure("scoring", msnaAnalyze.score_beats, F_BP, F_MSNA, peaks_ECG, sbp_arg, dbp_arg, fs, baseline,
+                       min_val, max_val)
+    timer.measure("export", msnaAnalyze.save_result, df, str(work_dir / f"result.{fmt}"))
+
+    rows = []
+    for stage in STAGES:
+        if stage not in timer.times:
+            continue
+        t = timer.times[stage]
+        rows.append({
+            "duration (s)": recording.duration,
+            "samples": recording.n,
+            "stage": stage,
+            "time (s)": t,
+            "M samples/s": recording.n / t / 1e6 if t > 0 else float("inf"),
+            "peak memory (MB)": timer.peaks.get(stage, float("nan")),
+        })
+    accuracy = {"duration (s)": recording.duration, "beats": len(recording.R),
+                **recording.evaluate(peaks_ECG, offset, df, region)}
+    return pd.DataFrame(rows, columns=BENCH_COLUMNS), accuracy
+
+
+def main(argv: list | None = None) -> int:
+    """コマンドラインから合成した記録の解析を計測する
+
+    Args:
+        argv (list | None): コマンドライン引数
+
+    Returns:
+        int: 終了コード
+    """
+    parser = argparse.ArgumentParser(prog="msna-benchmark", description="Time and profile the analysis on synthetic recordings.")
+    parser.add_argument("--durations", type=duration_seconds, nargs="+", default=[300.0, 3600.0], metavar="DURATION",
+                        help="recording lengths, e.g. 5m 1h 24h (default: 5m 1h)")
+    parser.add_argument("--fs", type=int, default=2000, help="sample frequency (Hz)")
+    parser.add_argument("--hr", type=float, default=70.0, help="mean heart rate (/min)")
+    parser.add_argument("--hrv", type=float, default=0.03, help="RR interval variability (fraction of the mean)")
+    parser.add_argument("--ectopic", type=float, default=0.0, help="fraction of ectopic (premature) beats")
+    parser.add_argument("--incidence", type=float, default=50.0, help="true burst incidence (/100 beats)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--baseline", type=float, default=10.0, help="burst SNR baseline (%%)")
+    parser.add_argument("--region", type=float, nargs=2, default=(0.5, 1.5), metavar=("LEFT", "RIGHT"),
+                        help="burst window after each R peak (s)")
+    parser.add_argument("--float32", action="store_true", help="load signals as float32")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="filter and detect peaks in chunks of this many samples, writing memory-mapped files")
+    parser.add_argument("--no-load", action="store_true", help="generate signals in memory instead of timing the .txt load")
+    parser.add_argument("--format", choices=msnaAnalyze.EXPORT_CHOICES, default="txt", help="export format to time")
+    parser.add_argument("--repeat", type=int, default=1, help="repeat each stage and report the fastest run")
+    parser.add_argument("--no-memory", action="store_true", help="do not trace memory (tracing slows some stages)")
+    parser.add_argument("--work-dir", default=None, help="keep the generated files in this directory")
+    parser.add_argument("-o", "--output", default=None,
+                        help="save the timing table here and the accuracy table next to it (<name>_accuracy)")
+    args = parser.parse_args(argv)
+
+    tables, accuracies = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for duration in args.durations:
+            work_dir = Path(args.work_dir or tmp) / f"{duration:g}s"
+            work_dir.mkdir(parents=True, exist_ok=True)
+            recording = syntheticData.synthetic_recording(duration, args.fs, args.hr, args.hrv, args.ectopic,
+                                                          args.incidence, seed=args.seed)
+            table, accuracy = run_benchmark(recording, work_dir, tuple(args.region), args.baseline,
+                                            np.float32 if args.float32 else np.float64, args.chunk_size,
+                                            not args.no_load, args.format, args.repeat, not args.no_memory)
+            print(table.to_string(index=False, float_format="%.3f"))
+            tables.append(table)
+            accuracies.append(accuracy)
+
+    accuracy = pd.DataFrame(accuracies)
+    print(accuracy.to_string(index=False, float_format="%.3f"))
+    rss = stageProfiler.peak_rss()
+    if rss is not None:
+        print(f"max resident memory: {rss:.0f} MB", file=sys.stderr)
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        msnaAnalyze.save_result(pd.concat(tables, ignore_index=True), str(output))
+        msnaAnalyze.save_result(accuracy, str(output.with_name(f"{output.stem}_accuracy{output.suffix}")))
+        print(f"-> {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import dataLoader
+import signalReaders
+
+# data_set.read_dataの戻り値の名前(キャッシュに保存する順序)
+PROCESSED_NAMES = ["F_ECG", "F_BP", "F_iMSNA", "peaks_ECG", "sbp_arg", "dbp_arg"]
+RAW_NAMES = ["ECG", "BP", "iMSNA"]
+CHUNK_SIZE = 10_000_000  # メモリマップ使用時にフィルタとピーク検出を分割するサンプル数
+SESSIONS_DIR = "sessions"  # 手動モードのジャーナルの保存先(キャッシュの削除の対象外)
+MIN_CACHE_BYTES = 2 * 1024**3  # 上限を指定しない場合の最小の上限(バイト)
+CACHE_DISK_FRACTION = 0.25  # 上限を指定しない場合に使う, 空き容量(キャッシュの分を含む)の割合
+
+
+def default_cache_size() -> int | None:
+    """環境変数MSNA_CACHE_SIZE(GB)で指定したキャッシュの上限(指定がない場合はNoneで空き容量から決める)
+
+    Returns:
+        int | None: 上限(バイト)
+    """
+    size = os.environ.get("MSNA_CACHE_SIZE")
+    return None if not size else int(float(size) * 1024**3)
+
+
+def default_cache_dir() -> Path:
+    """キャッシュの保存先(環境変数MSNA_CACHE_DIRで変更可能)
+
+    Returns:
+        Path: キャッシュディレクトリ
+    """
+    return Path(os.environ.get("MSNA_CACHE_DIR", Path.home() / ".cache" / "MSNAAnalyzer"))
+
+
+class data_cache:
+    def __init__(self, cache_dir: str | None = None, max_bytes: int | None = None):
+        """読み込んだデータと処理結果を.npyとしてディスクに保存する
+
+        エントリはファイル内容のハッシュと処理の設定をキーとし,
+        合計サイズが上限を超えると古いものから削除する. 今の記録ファイルで読み書きしたエントリ
+        (読み込んだデータと処理結果)は上限を超えても削除しない.
+
+        Args:
+            cache_dir (str | None): キャッシュディレクトリ(Noneの場合はdefault_cache_dir())
+            max_bytes (int | None): キャッシュの最大サイズ(バイト, Noneの場合はdefault_cache_size(),
+                それもなければ空き容量のCACHE_DISK_FRACTION(MIN_CACHE_BYTES以上))
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_bytes = max_bytes if max_bytes is not None else default_cache_size()
+        self.last_report = ""
+        self._hashes = {}
+        self._current = None  # 今の記録ファイルのハッシュ
+        self._pinned = set()  # 今の記録ファイルで読み書きしたエントリのキー(削除しない)
+
+    def file_hash(self, file: str) -> str:
+        """ファイル内容のハッシュ(同じファイルはパス, サイズ, 更新時刻が同じ間は再計算しない)
+
+        Args:
+            file (str): ファイルパス
+
+        Returns:
+            str: ハッシュ値
+        """
+        stat = os.stat(file)
+        memo_key = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._hashes:
+            h = hashlib.blake2b(digest_size=16)
+            with open(file, "rb") as f:
+                for block in iter(lambda: f.read(8 * 1024**2), b""):
+                    h.update(block)
+            self._hashes[memo_key] = h.hexdigest()
+        return self._hashes[memo_key]
+
+    def key(self, file: str, **settings) -> str:
+        """ファイル内容と設定からキーを作る
+
+        Args:
+            file (str): ファイルパス
+            **settings: 処理結果に影響する設定
+
+        Returns:
+            str: キー
+        """
+        file_hash = self.file_hash(file)
+        if file_hash != self._current:
+            self._current = file_hash
+            self._pinned = set()
+        h = hashlib.blake2b(digest_size=16)
+        h.update(file_hash.encode())
+        h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def load(self, key: str, names: list, mmap: bool = False) -> list | None:
+        """キャッシュからデータを読み込む
+
+        Args:
+            key (str): キー
+            names (list): 配列の名前
+            mmap (bool): メモリマップで読み込む
+
+        Returns:
+            list | None: 配列のリスト(キャッシュがない場合はNone)
+        """
+        entry = self.cache_dir / key
+        try:
+            arrays = [np.load(entry / f"{name}.npy", mmap_mode="r" if mmap else None) for name in names]
+        except (OSError, ValueError):
+            return None
+        os.utime(entry)  # 最近使ったエントリとして残す
+        self._pinned.add(key)
+        return arrays
+
+    def save(self, key: str, names: list, arrays: list):
+        """データをキャッシュに保存し, 上限を超えた分を削除する
+
+        Args:
+            key (str): キー
+            names (list): 配列の名前
+            arrays (list): 保存する配列
+        """
+        tmp = self._new_entry()
+        try:
+            for name, array in zip(names, arrays):
+                np.save(tmp / f"{name}.npy", np.asarray(array))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self._commit(tmp, key)
+
+    def _new_entry(self) -> Path:
+        """書き込み途中のエントリを読まないように, 一時ディレクトリを作る
+
+        Returns:
+            Path: 一時ディレクトリ
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-"))
+
+    def _commit(self, tmp: Path, key: str):
+        """一時ディレクトリをエントリとして登録する
+
+        Args:
+            tmp (Path): 一時ディレクトリ
+            key (str): キー
+        """
+        try:
+            tmp.rename(self.cache_dir / key)
+        except OSError:
+            # 同じキーのエントリが既にある場合
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self._pinned.add(key)
+        self.evict(keep=key)
+
+    def limit(self, cached: int = 0) -> int:
+        """キャッシュの上限(バイト)
+
+        Args:
+            cached (int): 今のキャッシュの合計サイズ(空き容量に足して上限を決める)
+
+        Returns:
+            int: max_bytes(Noneの場合は空き容量とcachedの和のCACHE_DISK_FRACTION, MIN_CACHE_BYTES以上)
+        """
+        if self.max_bytes is not None:
+            return self.max_bytes
+        try:
+            free = shutil.disk_usage(self.cache_dir).free
+        except OSError:
+            return MIN_CACHE_BYTES
+        return max(MIN_CACHE_BYTES, int((free + cached) * CACHE_DISK_FRACTION))
+
+    def evict(self, keep: str | None = None):
+        """合計サイズが上限(limit)以下になるまで, 最も古く使われたエントリから削除する
+
+        今の記録ファイルで読み書きしたエントリは削除しないので, 1つの記録が上限より大きい場合は上限を超える.
+
+        Args:
+            keep (str | None): 削除しないエントリのキー(直前に保存したもの)
+        """
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            if entry.is_dir() and not entry.name.startswith(".") and entry.name != SESSIONS_DIR:
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+        total = sum(size for _, size, _ in entries)
+        limit = self.limit(total)
+        for _, size, entry in sorted(entries):
+            if total <= limit:
+                break
+            if entry.name == keep or entry.name in self._pinned:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def journal_path(self, file: str) -> Path:
+        """記録ファイルの手動モードのジャーナルのパス(ファイル内容のハッシュで決まる)
+
+        Args:
+            file (str): 記録ファイル
+
+        Returns:
+            Path: ジャーナルのパス
+        """
+        return self.cache_dir / SESSIONS_DIR / f"{self.file_hash(file)}.journal"
+
+    def read_txt(self, file: str, dtype: type = np.float64, mmap: bool = False,
+                 progress=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """.txtファイルを読み込む(キャッシュがあれば解析しない)
+
+        Args:
+            file (str): ファイルパス
+            dtype (type): 読み込むデータの型(np.float64 | np.float32)
+            mmap (bool): キャッシュに直接書き込み, メモリマップとして返す
+            progress (callable | None): 読み込んだ割合を受け取る関数(dataLoader.txt_loader)
+
+        Returns:
+            np.ndarray: ECGのデータ
+            np.ndarray: BPのデータ
+            np.ndarray: iMSNAのデータ
+        """
+        key = self.key(file, dtype=np.dtype(dtype).name)
+        arrays = self.load(key, RAW_NAMES, mmap)
+        if arrays is not None:
+            self.last_report = "loaded from cache"
+            return tuple(arrays)
+        loader = dataLoader.txt_loader(file, dtype, progress=progress)
+        if not mmap:
+            arrays = loader.read()
+            self.last_report = loader.report()
+            self.save(key, RAW_NAMES, arrays)
+            return arrays
+
+        tmp = self._new_entry()
+        try:
+            arrays = loader.read(out=[tmp / f"{name}.npy" for name in RAW_NAMES])
+            del arrays
+        except Exception:
+            # 読み込みの中止(progressが投げた例外)も含めて, 書きかけのエントリを消す
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.last_report = loader.report()
+        self._commit(tmp, key)
+        return tuple(self.load(key, RAW_NAMES, mmap))
+
+    def read_signals(self, file: str, fs: int | float | None = None, channels: list | None = None, start: float = 0.0,
+                     stop: float | None = None, dtype: type = np.float64, mmap: bool = False, progress=None) -> tuple:
+        """記録ファイル(.txt, .edf, .h5, 生のバイナリ)から選んだチャンネルと範囲を読み込む
+
+        .txtはread_txtで全体を読み込み(キャッシュを使う), 選んだ列と範囲をビューで返す.
+        それ以外の形式は読む範囲だけをファイルから変換する. mmapの場合はキャッシュ上の.npyに書き込み,
+        メモリマップとして返す(次からは変換しない).
+
+        Args:
+            file (str): ファイルパス
+            fs (int | float | None): ファイルにサンプリング周波数がない場合の値
+            channels (list | None): ECG, BP, iMSNAのチャンネル(signalReaders.signal_reader.resolve)
+            start (float): 始点(秒)
+            stop (float | None): 終点(秒, Noneの場合は最後まで)
+            dtype (type): 読み込むデータの型(np.float64 | np.float32)
+            mmap (bool): キャッシュに直接書き込み, メモリマップとして返す
+            progress (callable | None): 読み込んだ割合を受け取る関数
+
+        Returns:
+            np.ndarray: ECGのデータ
+            np.ndarray: BPのデータ
+            np.ndarray: iMSNAのデータ
+            int | float | None: サンプリング周波数(ファイルのメタデータ, なければfs)
+        """
+        with signalReaders.open_reader(file) as reader:
+            index = reader.resolve(channels)
+            fs = reader.fs_of(index, fs)
+            s0, s1 = reader.sample_range(index, start, stop, fs)
+            if isinstance(reader, signalReaders.txt_reader):
+                arrays = self.read_txt(file, dtype, mmap, progress)
+                ECG, BP, iMSNA = (arrays[i][s0:s1] for i in index)
+                if len(ECG) == 0:
+                    raise ValueError("No samples in the selected range")
+                return ECG, BP, iMSNA, fs
+            if not mmap:
+                ECG, BP, iMSNA = reader.read(index, s0, s1, dtype, progress=progress)
+                self.last_report = reader.report()
+                return ECG, BP, iMSNA, fs
+
+            key = self.key(file, dtype=np.dtype(dtype).name, channels=index, start=s0, stop=s1)
+            arrays = self.load(key, RAW_NAMES, mmap)
+            if arrays is not None:
+                self.last_report = "loaded from cache"
+                return (*arrays, fs)
+            tmp = self._new_entry()
+            try:
+                arrays = reader.read(index, s0, s1, dtype, out=[tmp / f"{name}.npy" for name in RAW_NAMES],
+                                     progress=progress)
+                del arrays
+            except Exception:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise
+            self.last_report = reader.report()
+        self._commit(tmp, key)
+        return (*self.load(key, RAW_NAMES, mmap), fs)
+
+    def read_data(self, file: str, dataSet, mmap: bool = False, source: dict | None = None) -> tuple:
+        """data_set.read_dataの結果を返す(キャッシュがあればフィルタとピーク検出をしない)
+
+        Args:
+            file (str): dataSetのデータを読み込んだファイル
+            dataSet (dataProcessing.data_set): 処理するデータ
+            mmap (bool): フィルタ結果をチャンクごとにキャッシュへ書き込み, メモリマップとして返す
+            source (dict | None): ファイルのうち読み込んだ部分(チャンネル, 範囲. 全体の場合はNone)
+
+        Returns:
+            tuple: data_set.read_dataと同じ戻り値
+        """
+        settings = dataSet.settings() if source is None else dict(dataSet.settings(), source=source)
+        key = self.key(file, dtype=np.asarray(dataSet.ECG).dtype.name, **settings)
+        arrays = self.load(key, PROCESSED_NAMES, mmap)
+        if arrays is not None:
+            return tuple(arrays)
+        if not mmap:
+            arrays = dataSet.read_data()
+            self.save(key, PROCESSED_NAMES, arrays)
+            return arrays
+
+        tmp = self._new_entry()
+        try:
+            # フィルタ結果(全長)を一時的にメモリマップへ書き込み, 切り出した範囲だけを保存する
+            (tmp / "full").mkdir()
+            dataSet.out_dir = str(tmp / "full")
+            if dataSet.chunk_size is None:
+                dataSet.chunk_size = CHUNK_SIZE
+            arrays = dataSet.read_data()
+            for name, array in zip(PROCESSED_NAMES, arrays):
+                np.save(tmp / f"{name}.npy", np.asarray(array))
+            del arrays
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        finally:
+            dataSet.out_dir = None
+        shutil.rmtree(tmp / "full", ignore_errors=True)
+        self._commit(tmp, key)
+        return tuple(self.load(key, PROCESSED_NAMES, mmap))
+
+if __name__ == "__main__":
+    pass
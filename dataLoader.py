@@ -0,0 +1,153 @@
+from itertools import islice
+import os
+import time
+
+import numpy as np
+
+class txt_loader:
+    def __init__(self, file: str, dtype: type = np.float64, chunk_lines: int = 1_000_000, progress=None):
+        """3列(ECG, BP, iMSNA)の.txtファイルをNumPy配列に直接読み込む
+
+        Args:
+            file (str): ファイルパス
+            dtype (type): 読み込むデータの型(np.float64 | np.float32)
+            chunk_lines (int): 一度に変換する行数
+            progress (callable | None): チャンクごとに読み込んだ割合(0-1)を受け取る関数.
+                例外を投げると読み込みを中止する
+        """
+        self.file = file
+        self.dtype = np.dtype(dtype)
+        self.chunk_lines = chunk_lines
+        self.progress = progress
+        self.n_samples = 0
+        self.n_bytes = 0
+        self.elapsed = 0.0
+
+    def read(self, out: list | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ファイルをチャンクごとに読み込み, 列ごとに連続した配列を返す
+
+        Args:
+            out (list | None): 3列を書き込む.npyファイルのパス. 指定するとメモリマップに
+                直接書き込むため, 一度にメモリに載るのは1チャンクだけになる
+
+        Returns:
+            np.ndarray: ECGのデータ
+            np.ndarray: BPのデータ
+            np.ndarray: iMSNAのデータ
+        """
+        t0 = time.perf_counter()
+        if out is None:
+            chunks = list(self._iter_chunks())
+
+            # 列ごとに連続したメモリに並べる
+            n = sum(len(chunk) for chunk in chunks)
+            data = np.empty((3, n), dtype=self.dtype)
+            pos = 0
+            for chunk in chunks:
+                data[:, pos:pos + len(chunk)] = chunk.T
+                pos += len(chunk)
+            columns = (data[0], data[1], data[2])
+        else:
+            n = self._count_lines()
+            columns = tuple(np.lib.format.open_memmap(path, mode="w+", dtype=self.dtype, shape=(n,)) for path in out)
+            pos = 0
+            for chunk in self._iter_chunks():
+                for column, values in zip(columns, chunk.T):
+                    column[pos:pos + len(chunk)] = values
+                pos += len(chunk)
+            if pos != n:
+                raise ValueError("Invalid file format")
+            for column in columns:
+                column.flush()
+
+        self.n_samples = n
+        self.n_bytes = os.path.getsize(self.file)
+        self.elapsed = time.perf_counter() - t0
+        return columns
+
+    def _iter_chunks(self):
+        """ファイルをchunk_lines行ずつ(行数, 3)の配列に変換する
+
+        Yields:
+            np.ndarray: 変換したデータ
+        """
+        line_no = 0
+        n_chars = 0
+        size = max(os.path.getsize(self.file), 1)
+        with open(self.file, "r") as f:
+            while True:
+                lines = list(islice(f, self.chunk_lines))
+                if not lines:
+                    break
+                yield self._parse_chunk(lines, line_no)
+                line_no += len(lines)
+                if self.progress is not None:
+                    # 改行コードの違いは無視した目安
+                    n_chars += sum(map(len, lines))
+                    self.progress(min(n_chars / size, 1.0))
+
+    def _count_lines(self) -> int:
+        """ファイルの行数を数える(最後の行に改行がない場合も1行と数える)
+
+        Returns:
+            int: 行数
+        """
+        n = 0
+        last = b"\n"
+        with open(self.file, "rb") as f:
+            for block in iter(lambda: f.read(8 * 1024**2), b""):
+                n += block.count(b"\n")
+                last = block[-1:]
+                if self.progress is not None:
+                    self.progress(0.0)
+        return n if last == b"\n" else n + 1
+
+    def _parse_chunk(self, lines: list, line_no: int) -> np.ndarray:
+        """複数行をまとめて(行数, 3)の配列に変換する
+
+        Args:
+            lines (list): 読み込んだ行
+            line_no (int): チャンクの先頭より前の行数
+
+        Returns:
+            np.ndarray: 変換したデータ
+        """
+        try:
+            chunk = np.loadtxt(lines, dtype=self.dtype, comments=None, ndmin=2)
+        except ValueError:
+            chunk = None
+        # 空行などで行数が合わない場合も不正とする
+        if chunk is None or chunk.shape != (len(lines), 3):
+            self._raise_invalid_line(lines, line_no)
+        return chunk
+
+    def _raise_invalid_line(self, lines: list, line_no: int):
+        """不正な行を探して, 行番号付きでエラーを出す
+
+        Args:
+            lines (list): 読み込んだ行
+            line_no (int): チャンクの先頭より前の行数
+        """
+        for i, line in enumerate(lines):
+            data = line.split()
+            try:
+                if len(data) != 3:
+                    raise ValueError
+                [float(x) for x in data]
+            except ValueError:
+                raise ValueError(f"Invalid file format at line {line_no + i + 1}: {line.strip()!r}") from None
+        raise ValueError("Invalid file format")
+
+    def report(self) -> str:
+        """読み込みの速度を文字列で返す
+
+        Returns:
+            str: サンプル数, ファイルサイズ, 時間, スループット
+        """
+        mb = self.n_bytes / 1e6
+        rate = mb / self.elapsed if self.elapsed > 0 else float("inf")
+        samples_rate = self.n_samples / self.elapsed / 1e6 if self.elapsed > 0 else float("inf")
+        return f"{self.n_samples} samples, {mb:.1f} MB in {self.elapsed:.2f} s ({rate:.1f} MB/s, {samples_rate:.2f} M samples/s)"
+
+if __name__ == "__main__":
+    pass
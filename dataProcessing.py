@@ -1,10 +1,28 @@
-from scipy import signal
 from scipy.signal import find_peaks
 import numpy as np
 import math
+import os
+
+import beatFeatures
+import chunkProcessing
+import filterBank
+import stageProfiler
+
+# read_dataの段階 -> 全体の進み具合での(始め, 終わり)の割合
+PROGRESS_STAGES = {"F_ECG": (0.0, 0.4), "F_BP": (0.4, 0.8), "R peaks": (0.8, 0.9), "BP peaks": (0.9, 1.0)}
 
 class data_set:
-    def __init__(self, ECG: list, BP: list, iMSNA: list, fs: int):
+    # フィルタとピーク検出の設定(次数, カットオフ周波数, 種類)
+    ECG_filter = (2, [0.3, 28], "band")
+    BP_filter = (2, 10, "low")
+    peak_factor = 2.9  # ECGのピーク検出の閾値(正の値の平均の倍率)
+    RR_reject = 0.5  # 平均RRに対してこの割合より短い間隔のピークを削除
+    margin_periods = 6  # チャンク処理で前後に重ねる長さ(最も低いカットオフ周波数の周期の数)
+    peak_window = None  # チャンク処理でピーク検出の閾値を求める直近の時間(秒, Noneの場合は全体)
+    filters = filterBank.filter_bank()  # 設計したフィルタ(全ての記録で共有)
+
+    def __init__(self, ECG: list, BP: list, iMSNA: list, fs: int, chunk_size: int | None = None, out_dir: str | None = None,
+                 progress=None):
         """読み込んだデータにファイルタをかけることやピークを検出することができる
         
         Args:
@@ -12,29 +30,172 @@ class data_set:
             BP (list): BPのデータ
             iMSNA (list): rMSNAのデータ
             fs (int): サンプリング周波数
+            chunk_size (int | None): フィルタとピーク検出を分割して行うサンプル数(Noneの場合は一括)
+            out_dir (str | None): フィルタ結果をメモリマップ(.npy)として書き込むディレクトリ
+            progress (callable | None): 全体の進み具合(0-1)と段階の名前を受け取る関数(PROGRESS_STAGES).
+                例外を投げると処理を中止する(一括のフィルタの途中では呼ばれない)
         """
         self.ECG = ECG
         self.BP = BP
         self.iMSNA = iMSNA
         self.fs = fs
-    def zerofilter_sci(self, n: int, fc: int, Type: str, data: list) -> list:
-        """バターワースフィルタをかける
+        self.chunk_size = chunk_size
+        self.out_dir = out_dir
+        self.progress = progress
+
+    def settings(self) -> dict:
+        """処理結果に影響する設定を返す
+
+        Returns:
+            dict: サンプリング周波数, フィルタ, ピーク検出の設定
+        """
+        return {
+            "fs": self.fs,
+            "ECG_filter": self.ECG_filter,
+            "BP_filter": self.BP_filter,
+            "peak_factor": self.peak_factor,
+            "RR_reject": self.RR_reject,
+            "peak_window": self.peak_window,
+            "filter_form": "sos",
+        }
+
+    def zerofilter_sci(self, n: int, fc: int, Type: str, data: list, name: str = "F") -> list:
+        """バターワースフィルタ(SOS形式, ゼロ位相)をかける
+
+        フィルタはfiltersで一度だけ設計する. chunk_sizeが指定されている場合は, 前後に重なりを持たせた
+        チャンクごとにsosfiltfiltをかけ, 重なり部分を捨てて出力に書き込む.
         
         Args:
             n (int): フィルタ次数
             fc (int): カットオフ周波数
             Type (str): フィルタの種類
             data (list): フィルタをかけるデータ
+            name (str): out_dirに書き込む際のファイル名
         
         Returns:
             list: フィルタをかけたデータ
         """
-        if Type == "band":
-            b, a = signal.butter(n, [fc[0]/(self.fs/2), fc[1]/(self.fs/2)], Type, analog=False)
-        else:
-            b, a = signal.butter(n, fc/(self.fs/2), Type, analog=False)
-        y = signal.filtfilt(b, a, data)
-        return y
+        with stageProfiler.stage("zerofilter_sci", samples=len(data)):
+            self._report(name)
+            if self.chunk_size is None and self.out_dir is None:
+                return self.filters.filtfilt(n, fc, Type, self.fs, data)
+
+            # 分割処理: チャンクごとにかける(誤差はchunkProcessing.zero_phase_filterを参照)
+            sos = self.filters.sos(n, fc, Type, self.fs)
+            data = np.asarray(data)
+            y = self._allocate(name, len(data), np.result_type(data.dtype, np.float32))
+            margin = chunkProcessing.filter_margin(fc, self.fs, self.margin_periods)
+            progress = None if self.progress is None else lambda fraction: self._report(name, fraction)
+            return chunkProcessing.filter_chunked(sos, data, y, self.chunk_size or len(data), margin, progress)
+
+    def _report(self, stage: str, fraction: float = 0.0):
+        """段階stageの中の進み具合を, 全体の進み具合にしてprogressに渡す
+
+        Args:
+            stage (str): 段階の名前(PROGRESS_STAGESにない場合は全体)
+            fraction (float): 段階の中の進み具合(0-1)
+        """
+        if self.progress is not None:
+            start, stop = PROGRESS_STAGES.get(stage, (0.0, 1.0))
+            self.progress(start + (stop - start) * fraction, stage)
+
+    def _allocate(self, name: str, n: int, dtype: type) -> np.ndarray:
+        """出力用の配列を確保する(out_dirが指定されている場合はメモリマップ)
+
+        Args:
+            name (str): ファイル名
+            n (int): サンプル数
+            dtype (type): データの型
+
+        Returns:
+            np.ndarray: 出力用の配列
+        """
+        if self.out_dir is None:
+            return np.empty(n, dtype=dtype)
+        return np.lib.format.open_memmap(os.path.join(self.out_dir, f"{name}.npy"), mode="w+", dtype=dtype, shape=(n,))
+
+    def find_peaks_chunked(self, F_ECG: np.ndarray) -> np.ndarray:
+        """ECGのピークをチャンクごとに検出する
+
+        peak_windowがNoneの場合は一括のfind_peaksと同じ閾値(全体の正の値の平均)を使い,
+        指定されている場合は直近peak_window秒から求めた適応的な閾値を使う.
+
+        Args:
+            F_ECG (np.ndarray): フィルタをかけたECGデータ
+
+        Returns:
+            np.ndarray: ECGのピーク
+        """
+        chunk = self.chunk_size or len(F_ECG)
+        height = None
+        if self.peak_window is None:
+            # 閾値: 正の値の平均をチャンクごとの和と個数から求める
+            total, count = 0.0, 0
+            for start in range(0, len(F_ECG), chunk):
+                x = F_ECG[start:start + chunk]
+                positive = x[x > 0]
+                total += positive.sum(dtype=np.float64)
+                count += len(positive)
+            height = total / count * self.peak_factor
+        return chunkProcessing.find_peaks_chunked(F_ECG, chunk, self.fs, self.peak_factor, height, self.peak_window)
+
+    def filter_signals(self) -> tuple[np.ndarray, np.ndarray]:
+        """ECGとBPにフィルタをかける
+
+        Returns:
+            np.ndarray: フィルタをかけたECGデータ
+            np.ndarray: フィルタをかけたBPデータ
+        """
+        F_ECG = self.zerofilter_sci(*self.ECG_filter, self.ECG, "F_ECG")
+        F_BP = self.zerofilter_sci(*self.BP_filter, self.BP, "F_BP")
+        return F_ECG, F_BP
+
+    def detect_peaks(self, F_ECG: np.ndarray) -> np.ndarray:
+        """ECGのピークを検出し, 間隔が短すぎるピークを削除する
+
+        Args:
+            F_ECG (np.ndarray): フィルタをかけたECGデータ
+
+        Returns:
+            np.ndarray: ECGのピーク
+        """
+        with stageProfiler.stage("find_peaks", samples=len(F_ECG)):
+            self._report("R peaks")
+            if self.chunk_size is None:
+                peaks_ECG, _ = find_peaks(F_ECG, np.mean(F_ECG[F_ECG>0])*self.peak_factor)
+            else:
+                peaks_ECG = self.find_peaks_chunked(F_ECG)
+
+            # Delete error peaks
+            return beatFeatures.reject_short_RR(peaks_ECG, self.RR_reject)
+
+    def beat_peaks(self, F_ECG: np.ndarray, F_BP: np.ndarray, peaks_ECG: np.ndarray) -> tuple:
+        """最初と最後のECGのピークの間にデータを切り詰め, BPのピークを探す
+
+        Args:
+            F_ECG (np.ndarray): フィルタをかけたECGデータ
+            F_BP (np.ndarray): フィルタをかけたBPデータ
+            peaks_ECG (np.ndarray): ECGのピーク
+
+        Returns:
+            np.ndarray: 切り詰めたECGデータ
+            np.ndarray: 切り詰めたBPデータ
+            np.ndarray: 切り詰めたMSNAデータ
+            np.ndarray: ECGのピーク(最初のピークを0とする)
+            np.ndarray: BPのsystolicピーク
+            np.ndarray: BPのdiastolicピーク
+        """
+        with stageProfiler.stage("BP peaks", beats=len(peaks_ECG)):
+            self._report("BP peaks")
+            F_ECG = F_ECG[peaks_ECG[0]:peaks_ECG[-1]+1]
+            F_BP = F_BP[peaks_ECG[0]:peaks_ECG[-1]+1]
+            F_iMSNA = self.iMSNA[peaks_ECG[0]:peaks_ECG[-1]+1]
+        
+            peaks_ECG = peaks_ECG - peaks_ECG[0]
+        
+            sbp_arg, dbp_arg = beatFeatures.bp_peaks(F_BP, peaks_ECG)
+
+            return F_ECG, F_BP, F_iMSNA, peaks_ECG, sbp_arg, dbp_arg
 
     def read_data(self) -> list:
         """データを読み込んで，フィルタをかけるやピークを検出する
@@ -44,37 +205,13 @@ class data_set:
             list: フィルタをかけたBPデータ
             list: フィルタをかけたMSNAデータ
             list: ECGのピーク
-            list: BPのsystolicピーク
-            list: BPのdiastolicピーク
+            np.ndarray: BPのsystolicピーク
+            np.ndarray: BPのdiastolicピーク
         """
-        F_ECG = self.zerofilter_sci(2, [0.3, 28], "band", self.ECG)
-        F_BP = self.zerofilter_sci(2, 10, "low", self.BP)
-
-        # Find peaks
-        peaks_ECG, _ = find_peaks(F_ECG, np.mean(F_ECG[F_ECG>0])*2.9)
-        peaks_ECG_diff = np.diff(peaks_ECG)
-        peaks_ECG_diff_mean = np.mean(peaks_ECG_diff)
-
-        # Delete error peaks
-        del_list = []
-        for i in range(len(peaks_ECG_diff)):
-            if peaks_ECG_diff[i] < 0.5 * peaks_ECG_diff_mean:
-                del_list.append(i+1)
-        peaks_ECG = np.delete(peaks_ECG, del_list)
-
-        F_ECG = F_ECG[peaks_ECG[0]:peaks_ECG[-1]+1]
-        F_BP = F_BP[peaks_ECG[0]:peaks_ECG[-1]+1]
-        F_iMSNA = self.iMSNA[peaks_ECG[0]:peaks_ECG[-1]+1]
-        
-        peaks_ECG = peaks_ECG - peaks_ECG[0]
-        
-        sbp_arg = []
-        dbp_arg = []
-        for i in range(1, len(peaks_ECG)):
-            sbp_arg.append(np.argmax(F_BP[peaks_ECG[i-1]:(peaks_ECG[i-1]+(peaks_ECG[i]-peaks_ECG[i-1])//2)]) + peaks_ECG[i-1])
-            dbp_arg.append(np.argmin(F_BP[peaks_ECG[i-1]:(peaks_ECG[i-1]+(peaks_ECG[i]-peaks_ECG[i-1])//2)]) + peaks_ECG[i-1])
-
-        return F_ECG, F_BP, F_iMSNA, peaks_ECG, sbp_arg, dbp_arg
+        with stageProfiler.stage("read_data", samples=len(self.ECG)):
+            F_ECG, F_BP = self.filter_signals()
+            peaks_ECG = self.detect_peaks(F_ECG)
+            return self.beat_peaks(F_ECG, F_BP, peaks_ECG)
     
 if __name__ == "__main__":
     pass
\ No newline at end of file
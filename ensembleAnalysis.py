@@ -0,0 +1,314 @@
+"""
+msna-ensemble
+R波に揃えたMSNAの加算平均波形、バーストの潜時、拡張期血圧ごとのバースト発生率(交感神経の圧受容器反射)を求めるツールです。
+
+使い方:
+python ensembleAnalysis.py recording1.txt recording2.txt --fs 2000 --baseline 10 --bin-width 2 -o results
+
+各記録の{ファイル名}_ensemble.xlsx(R波からの時間ごとの平均とパーセンタイル)と
+{ファイル名}_baroreflex.xlsx(DBPの区間ごとの拍数、バースト数、発生率)を出力し、
+潜時と圧受容器反射の傾きを標準出力に表示します。
+GUIではEキーで同じ解析を表示します(手動モードの途中の場合はそこまでに判定した拍を使います)。
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import msnaAnalyze
+
+# 圧受容器反射の表の列
+BAROREFLEX_COLUMNS = ["DBP (mmHg)", "beats", "bursts", "burst incidence (/100 beats)"]
+
+
+def aligned_windows(x: np.ndarray, width: int) -> np.ndarray:
+    """全ての位置から始まるwidthサンプルの窓(ストライドによる2次元のビューで, コピーしない)
+
+    行starts(各拍の区間の始点)がR波に揃えた窓になる. ensemble_statsとpeak_latencyは
+    このビューから拍のブロックごとに必要な行だけを取り出して(コピーして)縮約するため, メモリはブロックの分だけで済む.
+
+    Args:
+        x (np.ndarray): データ(メモリマップ可)
+        width (int): 窓のサンプル数
+
+    Returns:
+        np.ndarray: 窓のビュー((len(x) - width + 1, width))
+    """
+    return np.lib.stride_tricks.sliding_window_view(np.asarray(x), width)
+
+
+def valid_windows(starts: np.ndarray, width: int, n: int) -> np.ndarray:
+    """窓が信号の範囲内に収まる拍
+
+    Args:
+        starts (np.ndarray): 各区間の始点
+        width (int): 窓のサンプル数
+        n (int): 信号のサンプル数
+
+    Returns:
+        np.ndarray: 範囲内かどうか
+    """
+    starts = np.asarray(starts, dtype=np.intp)
+    return (starts >= 0) & (starts + width <= n)
+
+
+def ensemble_stats(x: np.ndarray, starts: np.ndarray, width: int, percentiles: tuple = (5, 50, 95),
+                   groups: np.ndarray | None = None, step: int = 1, percentile_beats: int = 2000,
+                   block: int = 64) -> tuple:
+    """R波に揃えた窓の加算平均とパーセンタイルを, 時間(窓の中の位置)ごとに求める
+
+    平均は全ての拍について, 窓のビューからblock拍ずつ取り出して足す(グループごとの和は行列積で求める).
+    全ての拍の窓を読むので, 10万拍, 2001サンプルの窓では0.2-0.3秒かかる(stepで減らせる).
+    パーセンタイルは全ての拍を並べ替えると遅い(10万拍で数十秒)ため, 等間隔に選んだpercentile_beats拍から求める
+    近似値になる(拍数がそれ以下, またはpercentile_beatsが0の場合は全ての拍で正確).
+
+    Args:
+        x (np.ndarray): データ
+        starts (np.ndarray): 各区間の始点(信号内に収まるもの)
+        width (int): 窓のサンプル数
+        percentiles (tuple): 求めるパーセンタイル
+        groups (np.ndarray | None): 拍ごとのグループ(0, 1など). 指定するとグループごとの平均も求める
+        step (int): 窓の中のstepサンプルごとに求める(1の場合は全てのサンプル)
+        percentile_beats (int): パーセンタイルに使う拍数の上限(0の場合は全ての拍)
+        block (int): 一度に取り出す拍の数(キャッシュに収まる大きさ)
+
+    Returns:
+        np.ndarray: 平均(窓の中の位置0, step, 2 * step, ...)
+        np.ndarray: パーセンタイル((len(percentiles), 位置の数))
+        dict: グループ -> 平均(groupsを指定した場合)
+        int: パーセンタイルに使った拍数
+    """
+    starts = np.asarray(starts, dtype=np.intp)
+    n_points = len(range(0, width, step))
+    labels = [] if groups is None else np.unique(groups).tolist()
+    group_index = None if groups is None else np.searchsorted(labels, groups)
+    if len(starts) == 0:
+        nan = np.full(n_points, np.nan)
+        return nan, np.full((len(percentiles), n_points), np.nan), {label: nan.copy() for label in labels}, 0
+
+    windows = aligned_windows(x, width)[:, ::step]
+    sums = np.zeros((max(len(labels), 1), n_points))
+    for b in range(0, len(starts), block):
+        W = windows[starts[b:b + block]]
+        if group_index is None:
+            sums[0] += W.sum(axis=0, dtype=np.float64)
+        else:
+            onehot = np.zeros((len(W), len(labels)))
+            onehot[np.arange(len(W)), group_index[b:b + block]] = 1
+            sums += onehot.T @ W
+    mean = sums.sum(axis=0) / len(starts)
+    group_means = {}
+    if group_index is not None:
+        counts = np.bincount(group_index, minlength=len(labels))
+        group_means = {label: sums[i] / counts[i] for i, label in enumerate(labels)}
+
+    pct = np.full((len(percentiles), n_points), np.nan)
+    n_sample = min(len(starts), percentile_beats or len(starts))
+    if len(percentiles):
+        sample = starts[np.unique(np.linspace(0, len(starts) - 1, n_sample).astype(np.intp))]
+        n_sample = len(sample)
+        pct = np.percentile(windows[sample], percentiles, axis=0)
+    return mean, pct, group_means, n_sample
+
+
+def peak_latency(x: np.ndarray, starts: np.ndarray, width: int, block: int = 256) -> np.ndarray:
+    """各窓の最大値の位置(区間の始点からのサンプル数, 同じ値が複数ある場合は最初)
+
+    信号内に収まる窓では, バースト判定(beatFeatures.window_stats)の最大値の位置と同じになる.
+
+    Args:
+        x (np.ndarray): データ
+        starts (np.ndarray): 各区間の始点(信号内に収まるもの)
+        width (int): 窓のサンプル数
+        block (int): 一度に取り出す拍の数
+
+    Returns:
+        np.ndarray: 最大値の位置
+    """
+    starts = np.asarray(starts, dtype=np.intp)
+    windows = aligned_windows(x, width)
+    arg = np.empty(len(starts), dtype=np.intp)
+    for b in range(0, len(starts), block):
+        arg[b:b + block] = windows[starts[b:b + block]].argmax(axis=1)
+    return arg
+
+
+def baroreflex_table(DBP: np.ndarray, Burst: np.ndarray, bin_width: float = 2.0) -> pd.DataFrame:
+    """拍をDBPの区間(bin_width mmHgごと)に分け, 区間ごとのバースト発生率を求める
+
+    Args:
+        DBP (np.ndarray): 拍ごとのDBP
+        Burst (np.ndarray): 拍ごとのバーストあり(1)・なし(0)
+        bin_width (float): 区間の幅(mmHg)
+
+    Returns:
+        pd.DataFrame: BAROREFLEX_COLUMNSの表(DBPは区間の中央)
+    """
+    DBP = np.asarray(DBP, dtype=np.float64)
+    Burst = np.asarray(Burst)
+    keep = ~np.isnan(DBP)
+    bins, index = np.unique(np.floor(DBP[keep] / bin_width).astype(np.int64), return_inverse=True)
+    beats = np.bincount(index, minlength=len(bins))
+    bursts = np.bincount(index, weights=Burst[keep] == 1, minlength=len(bins)).astype(np.int64)
+    return pd.DataFrame(dict(zip(BAROREFLEX_COLUMNS, [
+        (bins + 0.5) * bin_width,
+        beats,
+        bursts,
+        bursts / np.maximum(beats, 1) * 100,
+    ])))
+
+
+def baroreflex_slope(table: pd.DataFrame, min_beats: int = 5) -> dict:
+    """DBPに対するバースト発生率の, 拍数で重み付けした回帰直線(交感神経の圧受容器反射の感度)
+
+    Args:
+        table (pd.DataFrame): baroreflex_tableの表
+        min_beats (int): 回帰に使う区間の最小の拍数
+
+    Returns:
+        dict: 傾き(/100 beats/mmHg), 切片, 相関係数(重み付き), 使った区間の数
+    """
+    used = table[table["beats"] >= min_beats]
+    result = {"baroreflex slope (/100 beats/mmHg)": np.nan, "baroreflex intercept": np.nan, "baroreflex r": np.nan,
+              "baroreflex bins": len(used)}
+    if len(used) < 2:
+        return result
+    x = used["DBP (mmHg)"].to_numpy()
+    y = used["burst incidence (/100 beats)"].to_numpy()
+    w = used["beats"].to_numpy(dtype=np.float64)
+    slope, intercept = np.polyfit(x, y, 1, w=np.sqrt(w))
+    cov = np.cov(x, y, aweights=w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = cov[0, 1] / np.sqrt(cov[0, 0] * cov[1, 1])
+    result.update({"baroreflex slope (/100 beats/mmHg)": slope, "baroreflex intercept": intercept, "baroreflex r": r})
+    return result
+
+
+def ensemble_analysis(df: pd.DataFrame, F_MSNA: np.ndarray, fs: int, min_val: int, max_val: int,
+                      percentiles: tuple = (5, 50, 95), bin_width: float = 2.0, min_beats: int = 5,
+                      step: int = 1, percentile_beats: int = 2000) -> tuple:
+    """結果表(自動モード, または手動モードで判定した拍)から加算平均, 潜時, 圧受容器反射を求める
+
+    窓は結果表の「iMSNA time」(R波 + min_val)から(max_val - min_val + 1)サンプルで, バースト判定区間と同じ.
+
+    Args:
+        df (pd.DataFrame): 11列の結果表
+        F_MSNA (np.ndarray): 補正したMSNAデータ
+        fs (int): サンプリング周波数
+        min_val (int): R波からの区間の始点(サンプル)
+        max_val (int): R波からの区間の終点(サンプル)
+        percentiles (tuple): 加算平均と一緒に求めるパーセンタイル
+        bin_width (float): DBPの区間の幅(mmHg)
+        min_beats (int): 圧受容器反射の回帰に使う区間の最小の拍数
+        step (int): 加算平均をstepサンプルごとに求める(潜時は全てのサンプルから求める)
+        percentile_beats (int): パーセンタイルに使う拍数の上限(0の場合は全ての拍, ensemble_statsを参照)
+
+    Returns:
+        pd.DataFrame: R波からの時間(秒)ごとの平均, バーストあり・なしの拍の平均, パーセンタイル
+            (一部の拍から求めた場合は列名に「(使った拍数 of 全ての拍数 beats)」を付ける)
+        pd.DataFrame: 拍ごとのR波からの潜時(秒, 窓の最大値の位置)とバーストの有無
+        pd.DataFrame: DBPの区間ごとのバースト発生率(BAROREFLEX_COLUMNS)
+        dict: 拍数, パーセンタイルに使った拍数, バースト数, バーストの潜時の平均・中央値・標準偏差(秒), 圧受容器反射の傾き
+    """
+    width = max_val - min_val + 1
+    starts = df["iMSNA time"].to_numpy(dtype=np.intp)
+    Burst = df["Burst"].to_numpy()
+    valid = valid_windows(starts, width, len(F_MSNA))
+    starts, Burst = starts[valid], Burst[valid]
+
+    mean, pct, group_means, n_sample = ensemble_stats(F_MSNA, starts, width, percentiles, Burst, step,
+                                                      percentile_beats)
+    ensemble = pd.DataFrame({"time (s)": (min_val + np.arange(0, width, step)) / fs, "mean": mean})
+    ensemble["mean (bursts)"] = group_means.get(1, np.full(len(mean), np.nan))
+    ensemble["mean (no bursts)"] = group_means.get(0, np.full(len(mean), np.nan))
+    sampled = "" if n_sample == len(starts) else f" ({n_sample} of {len(starts)} beats)"
+    for q, values in zip(percentiles, pct):
+        ensemble[f"p{q:g}{sampled}"] = values
+
+    latency = (min_val + peak_latency(F_MSNA, starts, width)) / fs
+    latencies = pd.DataFrame({"R time": df["R time"].to_numpy()[valid], "Burst": Burst, "latency (s)": latency})
+    burst_latency = latency[Burst == 1]
+
+    baroreflex = baroreflex_table(df["DBP"].to_numpy()[valid], Burst, bin_width)
+    summary = {
+        "beats": len(starts),
+        "percentile beats": n_sample,
+        "bursts": int((Burst == 1).sum()),
+        "mean latency (s)": burst_latency.mean() if len(burst_latency) else np.nan,
+        "median latency (s)": np.median(burst_latency) if len(burst_latency) else np.nan,
+        "SD latency (s)": burst_latency.std() if len(burst_latency) else np.nan,
+        **baroreflex_slope(baroreflex, min_beats),
+    }
+    return ensemble, latencies, baroreflex, summary
+
+
+def main(argv: list | None = None) -> int:
+    """コマンドラインから記録の加算平均波形, 潜時, 圧受容器反射を求める
+
+    Args:
+        argv (list | None): コマンドライン引数
+
+    Returns:
+        int: 終了コード(失敗したファイルがあれば1)
+    """
+    parser = argparse.ArgumentParser(prog="msna-ensemble",
+                                     description="R-peak-aligned MSNA averages, burst latency and baroreflex curves.")
+    parser.add_argument("files", nargs="+", help="recordings (3-column .txt, .edf, .h5/.hdf5, or .bin/.dat/.raw with a .json)")
+    msnaAnalyze.add_analysis_arguments(parser)
+    parser.add_argument("--percentiles", type=float, nargs="*", default=[5, 50, 95], help="percentiles of the average")
+    parser.add_argument("--bin-width", type=float, default=2.0, help="DBP bin width (mmHg)")
+    parser.add_argument("--percentile-beats", type=int, default=2000,
+                        help="compute percentiles from at most this many evenly spaced beats (0: all beats, slow)")
+    parser.add_argument("--step", type=int, default=1, help="average every STEP-th sample of the window")
+    parser.add_argument("--min-beats", type=int, default=5, help="minimum beats per DBP bin in the baroreflex slope")
+    parser.add_argument("--latency", action="store_true", help="also save the per-beat latency table (<name>_latency)")
+    parser.add_argument("--format", choices=msnaAnalyze.EXPORT_CHOICES, default="xlsx", help="output format")
+    parser.add_argument("-o", "--output-dir", default=None, help="output directory (default: next to each input)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="report load throughput")
+    args = parser.parse_args(argv)
+    if args.mmap and args.no_cache:
+        parser.error("--mmap cannot be used with --no-cache")
+    if args.bin_width <= 0:
+        parser.error("--bin-width must be positive")
+    if args.step < 1:
+        parser.error("--step must be at least 1")
+    if args.percentile_beats < 0:
+        parser.error("--percentile-beats must not be negative")
+
+    cache = msnaAnalyze.make_cache(args)
+    rows = []
+    failed = 0
+    for file in args.files:
+        file_path = Path(file)
+        out_dir = Path(args.output_dir) if args.output_dir else file_path.parent
+        out_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            options = msnaAnalyze.recording_options(file, msnaAnalyze.analysis_options(args))
+            F_BP, F_MSNA, peaks_ECG_arg, sbp_arg, dbp_arg = msnaAnalyze.load_recording(
+                file, options["fs"], options["iMSNA_cal"], options["dtype"], args.verbose, cache, options["mmap"],
+                options["channels"], options["start"], options["stop"])
+            min_val, max_val = msnaAnalyze.region_samples(options["region"], options["fs"])
+            df = msnaAnalyze.score_beats(F_BP, F_MSNA, peaks_ECG_arg, sbp_arg, dbp_arg, options["fs"],
+                                         options["baseline"], min_val, max_val)
+            ensemble, latencies, baroreflex, summary = ensemble_analysis(
+                df, F_MSNA, options["fs"], min_val, max_val, tuple(args.percentiles), args.bin_width,
+                args.min_beats, args.step, args.percentile_beats)
+            msnaAnalyze.save_result(ensemble, str(out_dir / f"{file_path.stem}_ensemble.{args.format}"))
+            msnaAnalyze.save_result(baroreflex, str(out_dir / f"{file_path.stem}_baroreflex.{args.format}"))
+            if args.latency:
+                msnaAnalyze.save_result(latencies, str(out_dir / f"{file_path.stem}_latency.{args.format}"))
+        except (OSError, ValueError, IndexError) as e:
+            print(f"{file}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        rows.append({"file": str(file), **summary})
+    if rows:
+        print(pd.DataFrame(rows).to_string(index=False, float_format="%.3f"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import time
+
+from scipy import signal
+import numpy as np
+
+
+class filter_bank:
+    def __init__(self):
+        """バターワースフィルタをSOS形式で設計し, (次数, カットオフ周波数, 種類, サンプリング周波数)ごとに使い回す
+
+        (b, a)形式のfiltfiltは高いfsで低いカットオフ周波数(ECGの0.3 Hz)の場合に係数の丸め誤差の影響を受けやすいため,
+        2次セクションに分けたsosfiltfiltを使う. 同じ設定の記録を続けて解析する場合(バッチ処理, GUIで開き直す場合)は
+        設計をやり直さない.
+        """
+        self.filters = {}  # (次数, カットオフ周波数, 種類, サンプリング周波数) -> SOS形式の係数
+        self.designed = 0  # 設計した回数
+        self.reused = 0  # 設計済みの係数を使った回数
+        self.samples = 0  # filtfiltをかけたサンプル数
+        self.elapsed = 0.0  # filtfiltにかかった時間(秒)
+
+    def sos(self, n: int, fc, Type: str, fs: int) -> np.ndarray:
+        """バターワースフィルタの係数(SOS形式)
+
+        Args:
+            n (int): フィルタ次数
+            fc (float | list): カットオフ周波数(bandの場合は[低域, 高域])
+            Type (str): フィルタの種類
+            fs (int): サンプリング周波数
+
+        Returns:
+            np.ndarray: フィルタ係数((セクション数, 6), 書き換えないこと)
+        """
+        key = (n, tuple(np.atleast_1d(fc).tolist()), Type, fs)
+        sos = self.filters.get(key)
+        if sos is None:
+            sos = signal.butter(n, np.asarray(fc) / (fs / 2), Type, analog=False, output="sos")
+            self.filters[key] = sos
+            self.designed += 1
+        else:
+            self.reused += 1
+        return sos
+
+    def filtfilt(self, n: int, fc, Type: str, fs: int, data: np.ndarray) -> np.ndarray:
+        """ゼロ位相のバターワースフィルタ(sosfiltfilt)をかける
+
+        計算はfloat64で行い, 結果はデータと同じ型(float32またはfloat64, それ以外はfloat64)で返す.
+        sosfiltfiltは端を延長した作業用の配列を内部で確保するため, 上書きはできない
+        (メモリを抑える場合はdata_setのchunk_size, out_dirでチャンクごとに出力先へ書き込む).
+
+        Args:
+            n (int): フィルタ次数
+            fc (float | list): カットオフ周波数
+            Type (str): フィルタの種類
+            fs (int): サンプリング周波数
+            data (np.ndarray): フィルタをかけるデータ
+
+        Returns:
+            np.ndarray: フィルタをかけたデータ
+        """
+        sos = self.sos(n, fc, Type, fs)
+        t0 = time.perf_counter()
+        x = np.asarray(data)
+        if x.dtype not in (np.float32, np.float64):
+            x = x.astype(np.float64)
+        y = signal.sosfiltfilt(sos, x).astype(x.dtype, copy=False)
+        self.samples += len(x)
+        self.elapsed += time.perf_counter() - t0
+        return y
+
+    def report(self) -> str:
+        """設計と使い回しの回数, filtfiltのスループットを文字列で返す
+
+        Returns:
+            str: 設計した回数, 使い回した回数, サンプル数, 時間, スループット
+        """
+        rate = self.samples / self.elapsed / 1e6 if self.elapsed > 0 else float("inf")
+        return (f"{self.designed} filters designed, {self.reused} reused; "
+                f"{self.samples / 1e6:.1f} M samples in {self.elapsed:.2f} s ({rate:.1f} M samples/s)")
+
+if __name__ == "__main__":
+    pass
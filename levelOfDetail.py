@@ -0,0 +1,135 @@
+import math
+
+import numpy as np
+
+
+def _reduce_blocks(x: np.ndarray, block: int) -> tuple[np.ndarray, np.ndarray]:
+    """xをblockサンプルずつの最小値と最大値にする(最後の半端なブロックも含む)
+
+    Args:
+        x (np.ndarray): データ
+        block (int): ブロックのサンプル数
+
+    Returns:
+        np.ndarray: ブロックごとの最小値
+        np.ndarray: ブロックごとの最大値
+    """
+    x = np.asarray(x)
+    if len(x) == 0:
+        return x.copy(), x.copy()
+    starts = np.arange(0, len(x), block)
+    return np.minimum.reduceat(x, starts), np.maximum.reduceat(x, starts)
+
+
+class minmax_pyramid:
+    def __init__(self, data: np.ndarray, factor: int = 4, min_block: int = 16, max_level_size: int = 1 << 20,
+                 chunk_size: int = 1 << 23):
+        """信号の最小値・最大値の包絡線を, 複数の間引き率(factor倍ずつ)で前もって求めておく
+
+        表示範囲に合った間引き率の包絡線を返すので, 記録の長さによらず描画する点の数は画面の幅程度になる.
+        包絡線は最小値と最大値を交互に並べるので, ピーク(R波, 収縮期血圧, バースト)は間引いても消えない.
+        min_block未満, またはブロック数がmax_level_sizeを超える細かい段は保存せず,
+        必要になったときに表示範囲の生データから求める.
+
+        Args:
+            data (np.ndarray): 信号(メモリマップ可)
+            factor (int): 段ごとの間引き率
+            min_block (int): 保存する段のブロックのサンプル数の下限
+            max_level_size (int): 保存する段のブロック数の上限
+            chunk_size (int): 最初の段を求めるときに一度に読むサンプル数
+        """
+        self.data = data
+        self.factor = factor
+        self.levels = {}  # ブロックのサンプル数 -> (最小値, 最大値)
+
+        # 保存する最も細かい段: min_block以上で, ブロック数がmax_level_size以下になる最小のブロック
+        block = factor
+        while block < min_block or math.ceil(len(data) / block) > max_level_size:
+            block *= factor
+        self.first_block = block
+
+        # 最初の段はデータをchunk_sizeずつ縮約する(メモリマップの全体を一度に読まない)
+        chunk_size = max(chunk_size // block, 1) * block
+        parts = [_reduce_blocks(data[start:start + chunk_size], block) for start in range(0, len(data), chunk_size)]
+        mins = np.concatenate([p[0] for p in parts]) if parts else np.empty(0, dtype=np.asarray(data[:0]).dtype)
+        maxs = np.concatenate([p[1] for p in parts]) if parts else mins
+        self.levels[block] = (mins, maxs)
+        # 以降の段は1つ前の段から求める
+        while len(mins) > 1:
+            mins = _reduce_blocks(mins, factor)[0]
+            maxs = _reduce_blocks(maxs, factor)[1]
+            block *= factor
+            self.levels[block] = (mins, maxs)
+
+    def range(self) -> tuple[float, float]:
+        """信号全体の最小値と最大値(最も粗い段から求める)
+
+        Returns:
+            float: 最小値
+            float: 最大値
+        """
+        mins, maxs = self.levels[max(self.levels)]
+        if len(mins) == 0:
+            return 0.0, 0.0
+        return float(mins.min()), float(maxs.max())
+
+    def view(self, x0: float, x1: float, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+        """表示範囲[x0, x1](サンプル)のデータを, 点の数がmax_points程度になる解像度で返す
+
+        範囲内のサンプル数がmax_points以下の場合は間引かずに返す.
+
+        Args:
+            x0 (float): 表示範囲の始点
+            x1 (float): 表示範囲の終点
+            max_points (int): 点の数の上限(画面の幅のピクセル数の2倍程度)
+
+        Returns:
+            np.ndarray: x座標(サンプル)
+            np.ndarray: y座標
+        """
+        n = len(self.data)
+        i0 = min(max(math.floor(x0), 0), n)
+        i1 = min(max(math.ceil(x1) + 1, i0), n)
+        if i1 - i0 <= max_points:
+            return np.arange(i0, i1), np.asarray(self.data[i0:i1])
+
+        # 包絡線は1ブロックにつき2点なので, ブロック数がmax_points // 2以下になる最も細かい段を使う
+        block = self.factor
+        while math.ceil((i1 - i0) / block) + 1 > max(max_points // 2, 1):
+            block *= self.factor
+        b0 = i0 // block
+        b1 = math.ceil(i1 / block)
+        if block in self.levels:
+            mins, maxs = self.levels[block]
+            mins, maxs = mins[b0:b1], maxs[b0:b1]
+        else:
+            # 保存していない細かい段: 表示範囲の生データから求める
+            mins, maxs = _reduce_blocks(self.data[b0 * block:min(b1 * block, n)], block)
+
+        x = np.repeat((np.arange(b0, b0 + len(mins)) + 0.5) * block, 2)
+        y = np.empty(2 * len(mins), dtype=np.result_type(mins.dtype, maxs.dtype))
+        y[0::2] = mins
+        y[1::2] = maxs
+        return x, y
+
+
+def decimate_markers(x: np.ndarray, y: np.ndarray, x0: float, x1: float, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """位置xの昇順に並んだマーカー(ピークなど)のうち, 表示範囲内のものを最大max_points個に間引いて返す
+
+    Args:
+        x (np.ndarray): マーカーの位置(昇順)
+        y (np.ndarray): マーカーの値
+        x0 (float): 表示範囲の始点
+        x1 (float): 表示範囲の終点
+        max_points (int): マーカーの数の上限
+
+    Returns:
+        np.ndarray: 表示するマーカーの位置
+        np.ndarray: 表示するマーカーの値
+    """
+    i0, i1 = np.searchsorted(x, [x0, x1], side="left")
+    step = max(math.ceil((i1 - i0) / max(max_points, 1)), 1)
+    return x[i0:i1:step], y[i0:i1:step]
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,474 @@
+"""
+MSNA live mode
+実験中に受信したECG、BP、iMSNAのサンプルから、拍ごとにR波、SBP/DBP、バーストをリアルタイムで検出します。
+
+使い方:
+python liveMode.py --replay recording.txt --fs 2000          (記録ファイルを実時間で再生)
+python liveMode.py --port 5000 --fs 2000                       (TCPで「ECG BP iMSNA」の行を受信)
+acquisition_program | python liveMode.py --stdin --fs 2000     (パイプから受信)
+
+フィルタは因果的(前方向のみ)なので, オフライン解析と比べてR波などの位置は群遅延の分だけ遅れます.
+拍の時刻は受信開始からのサンプル数で表します.
+"""
+
+import argparse
+import queue
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import autoCheck
+import chunkProcessing
+import dataProcessing
+import msnaAnalyze
+
+
+class ring_buffer:
+    def __init__(self, capacity: int):
+        """直近capacityサンプルを連続したメモリに保持するバッファ
+
+        Args:
+            capacity (int): 保持するサンプル数
+        """
+        self.capacity = capacity
+        self.data = np.empty(2 * capacity, dtype=np.float64)
+        self.size = 0
+        self.start = 0  # data[0]の絶対位置
+
+    @property
+    def end(self) -> int:
+        """受け取ったサンプル数(最後のサンプルの絶対位置 + 1)"""
+        return self.start + self.size
+
+    def append(self, x: np.ndarray):
+        """データを追加する(古いデータは捨てる)
+
+        Args:
+            x (np.ndarray): 追加するデータ
+        """
+        if len(x) >= self.capacity:
+            self.start = self.end + len(x) - self.capacity
+            self.data[:self.capacity] = x[-self.capacity:]
+            self.size = self.capacity
+            return
+        if self.size + len(x) > len(self.data):
+            # 直近capacityサンプルを先頭に移す
+            keep = min(self.size, self.capacity - len(x))
+            self.data[:keep] = self.data[self.size - keep:self.size]
+            self.start += self.size - keep
+            self.size = keep
+        self.data[self.size:self.size + len(x)] = x
+        self.size += len(x)
+
+    def get(self, lo: int, hi: int) -> np.ndarray:
+        """絶対位置[lo, hi)のデータ(保持している範囲だけ)
+
+        Args:
+            lo (int): 始点
+            hi (int): 終点
+
+        Returns:
+            np.ndarray: データのビュー
+        """
+        lo = max(lo, self.start)
+        hi = min(hi, self.end)
+        return self.data[lo - self.start:max(lo, hi) - self.start]
+
+
+class live_analyzer:
+    def __init__(self, fs: int, baseline: float = 10.0, iMSNA_cal: float = 1.0, region: tuple[float, float] = (0.5, 1.5),
+                 history: float = 60.0, peak_window: float = 10.0):
+        """受信したサンプルを少しずつ処理し, 拍ごとに結果表の1行を作る
+
+        Args:
+            fs (int): サンプリング周波数
+            baseline (float): ベースライン(%)
+            iMSNA_cal (float): MSNAの補正値
+            region (tuple[float, float]): R波からのバースト判定区間(秒)
+            history (float): 保持する信号の長さ(秒)
+            peak_window (float): R波検出の閾値を求める直近の時間(秒)
+        """
+        self.fs = fs
+        self.baseline = baseline
+        self.iMSNA_cal = iMSNA_cal
+        self.min_val = round(region[0] * fs)
+        self.max_val = round(region[1] * fs)
+
+        settings = dataProcessing.data_set
+        self.ECG_filter = chunkProcessing.causal_filter(self._design(*settings.ECG_filter))
+        self.BP_filter = chunkProcessing.causal_filter(self._design(*settings.BP_filter))
+        self.detector = chunkProcessing.peak_detector(fs, settings.peak_factor, window=peak_window,
+                                                      RR_reject=settings.RR_reject)
+
+        capacity = round(history * fs)
+        self.F_ECG = ring_buffer(capacity)
+        self.F_BP = ring_buffer(capacity)
+        self.F_MSNA = ring_buffer(capacity)
+        self.peaks = deque(maxlen=1000)  # 直近のR波(表示用)
+        self.pending = deque()  # 判定待ちの拍(R波, 次のR波)
+        self.rows = []  # 結果表の行
+        self.latency = deque(maxlen=1000)  # 拍ごとの遅延(秒)
+        self.dropped = 0  # 捨てたサンプル数(不正な行)
+        self.dropped_beats = 0  # 保持範囲を超えて判定できなかった拍の数
+
+    def _design(self, n: int, fc, Type: str) -> np.ndarray:
+        """data_setと同じ設定のバターワースフィルタ(SOS形式)
+
+        Args:
+            n (int): フィルタ次数
+            fc (int | list): カットオフ周波数
+            Type (str): フィルタの種類
+
+        Returns:
+            np.ndarray: フィルタ係数
+        """
+        return dataProcessing.data_set.filters.sos(n, fc, Type, self.fs)
+
+    def push(self, block: np.ndarray, arrival: float | None = None) -> list:
+        """(サンプル数, 3)のデータを追加し, 新たに判定した拍の行を返す
+
+        Args:
+            block (np.ndarray): ECG, BP, iMSNAの3列
+            arrival (float | None): ブロックを受信した時刻(time.perf_counter())
+
+        Returns:
+            list: 新しい行(msnaAnalyze.RESULT_COLUMNSの順)
+        """
+        arrival = time.perf_counter() if arrival is None else arrival
+        F_ECG = self.ECG_filter.push(block[:, 0])
+        self.F_ECG.append(F_ECG)
+        self.F_BP.append(self.BP_filter.push(block[:, 1]))
+        self.F_MSNA.append(np.asarray(block[:, 2], dtype=np.float64) / self.iMSNA_cal)
+
+        for p in self.detector.push(F_ECG):
+            if self.peaks:
+                self.pending.append((self.peaks[-1], p))
+            self.peaks.append(p)
+
+        rows = []
+        # バースト判定区間の最後のサンプルまで受信した拍を判定する
+        while self.pending and self.pending[0][0] + self.max_val + 1 <= self.F_MSNA.end:
+            R0, R1 = self.pending.popleft()
+            if R0 < self.F_MSNA.start:
+                self.dropped_beats += 1
+                continue
+            rows.append(self._score(R0, R1))
+            self.latency.append(time.perf_counter() - arrival)
+        self.rows.extend(rows)
+        return rows
+
+    def _score(self, R0: int, R1: int) -> list:
+        """1拍分の結果(MSNAApp.startと同じ計算)
+
+        Args:
+            R0 (int): R波
+            R1 (int): 次のR波
+
+        Returns:
+            list: 結果表の1行
+        """
+        half = self.F_BP.get(R0, R0 + (R1 - R0) // 2)
+        sbp = int(np.argmax(half)) + R0
+        dbp = int(np.argmin(half)) + R0
+        r_lift = R0 + self.min_val
+        r_right = R0 + self.max_val
+        window = self.F_MSNA.get(r_lift, r_right + 1)
+        Burst = autoCheck.auto_check(window, self.fs, self.baseline).burst_SNR(0, len(window))
+        RRI = (R1 - R0) / self.fs
+        return [
+            R0 / self.fs,
+            RRI,
+            60 / RRI,
+            dbp / self.fs,
+            self.F_BP.get(dbp, dbp + 1)[0],
+            sbp / self.fs,
+            self.F_BP.get(sbp, sbp + 1)[0],
+            r_lift,
+            np.max(window),
+            np.sum(window),
+            Burst,
+        ]
+
+    def status(self) -> str:
+        """遅延と捨てたサンプル数
+
+        Returns:
+            str: 状態
+        """
+        if self.latency:
+            lat = np.asarray(self.latency) * 1000
+            latency = f"latency {lat[-1]:.1f} ms (mean {lat.mean():.1f}, max {lat.max():.1f})"
+        else:
+            latency = "latency -"
+        return f"{len(self.rows)} beats, {latency}, dropped {self.dropped} samples / {self.dropped_beats} beats"
+
+    def result(self) -> pd.DataFrame:
+        """これまでの結果表
+
+        Returns:
+            pd.DataFrame: 11列の結果表
+        """
+        return pd.DataFrame(self.rows, columns=msnaAnalyze.RESULT_COLUMNS)
+
+
+class stream_source:
+    def __init__(self, f, block: int = 100):
+        """テキストのストリーム(パイプ, ソケット)から「ECG BP iMSNA」の行を読む
+
+        Args:
+            f: テキストのファイルオブジェクト
+            block (int): 一度に返す行数
+        """
+        self.f = f
+        self.block = block
+        self.dropped = 0  # 不正な行の数
+        self.analyzer = None  # 不正な行をその都度droppedに数えるlive_analyzer(start_readerで設定する)
+
+    def __iter__(self):
+        rows = []
+        for line in self.f:
+            data = line.split()
+            try:
+                if len(data) != 3:
+                    raise ValueError
+                rows.append([float(x) for x in data])
+            except ValueError:
+                self.dropped += 1
+                if self.analyzer is not None:
+                    self.analyzer.dropped += 1
+                continue
+            if len(rows) >= self.block:
+                yield np.asarray(rows)
+                rows = []
+        if rows:
+            yield np.asarray(rows)
+
+
+class replay_source(stream_source):
+    def __init__(self, file: str, fs: int, block: int = 100, speed: float = 1.0):
+        """記録ファイルを実時間(speed倍)で再生する
+
+        Args:
+            file (str): 3列(ECG, BP, iMSNA)の.txtファイル
+            fs (int): サンプリング周波数
+            block (int): 一度に返す行数
+            speed (float): 再生速度
+        """
+        super().__init__(open(file, "r"), block)
+        self.fs = fs
+        self.speed = speed
+
+    def __iter__(self):
+        t0 = time.perf_counter()
+        n = 0
+        for rows in super().__iter__():
+            n += len(rows)
+            wait = t0 + n / self.fs / self.speed - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            yield rows
+        self.f.close()
+
+
+def open_socket(port: int, host: str = "127.0.0.1"):
+    """TCPの接続を1つ待ち受け, テキストのファイルオブジェクトを返す
+
+    Args:
+        port (int): ポート番号
+        host (str): 待ち受けるアドレス
+
+    Returns:
+        テキストのファイルオブジェクト
+    """
+    server = socket.create_server((host, port))
+    print(f"Waiting for a connection on {host}:{port}", file=sys.stderr)
+    conn, _ = server.accept()
+    server.close()
+    return conn.makefile("r")
+
+
+def start_reader(source: stream_source, analyzer: live_analyzer, maxsize: int = 100) -> queue.Queue:
+    """別スレッドでsourceを読み, (受信時刻, ブロック)をキューに入れる. 最後にNoneを入れる
+
+    キューが一杯(処理が追いつかない)の場合は空くまで読むのを待つ. ブロックを捨てると拍の位置(受信開始からの
+    サンプル数)がずれるため, 捨てずに入力側(パイプ, TCP)で待たせる. 不正な行は読んだ時点でanalyzer.droppedに数える
+    (受信中もstatus()に表示される).
+
+    Args:
+        source (stream_source): 入力
+        analyzer (live_analyzer): 不正な行の数を数える先
+        maxsize (int): キューの長さ
+
+    Returns:
+        queue.Queue: ブロックのキュー
+    """
+    q = queue.Queue(maxsize)
+    source.analyzer = analyzer
+
+    def run():
+        for block in source:
+            q.put((time.perf_counter(), block))
+        q.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    return q
+
+
+class live_view:
+    def __init__(self, msna_app, analyzer: live_analyzer, blocks: queue.Queue, window: float = 10.0,
+                 interval: int = 50, on_finished=None):
+        """MSNAAppの3つのプロットを, 受信したデータでスクロール表示する
+
+        Args:
+            msna_app (main.MSNAApp): 表示先のアプリケーション
+            analyzer (live_analyzer): 処理するオブジェクト
+            blocks (queue.Queue): start_readerのキュー
+            window (float): 表示する時間(秒)
+            interval (int): 更新間隔(ms)
+            on_finished: 入力が終わったときに呼ぶ関数
+        """
+        from PyQt5 import QtCore
+        import pyqtgraph as pg
+
+        self.pg = pg
+        self.app = msna_app
+        self.analyzer = analyzer
+        self.blocks = blocks
+        self.window = round(window * analyzer.fs)
+        self.on_finished = on_finished
+        self.finished = False
+        self.times = 0
+
+        win = self.app.win
+        for widget in (win.toolButton, win.pushButton, win.pushButton_2, win.pushButton_3, win.pushButton_4,
+                       win.pushButton_5, win.spinBox, win.doubleSpinBox_2, win.doubleSpinBox_3, win.doubleSpinBox_4):
+            widget.setEnabled(False)
+        win.lineEdit_5.setText("Live mode: waiting for data")
+        self.app.win.keyPressEvent = lambda event: None
+
+        self.curve_peaks = pg.ScatterPlotItem(pen=None, size=5, brush=(255, 0, 0))
+        self.app.ECG_plot.addItem(self.curve_peaks)
+        self.burst_overlay = pg.BarGraphItem(x0=[], x1=[], y0=0, height=0, pen=pg.mkPen(None))
+        self.app.MSNA_plot.addItem(self.burst_overlay)
+        self.brushes = {0: pg.mkBrush(color=(255, 0, 0, 70)), 1: pg.mkBrush(color=(0, 161, 71, 70))}
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.update)
+        self.timer.start(interval)
+
+    def update(self):
+        """キューのデータを処理し, 表示を更新する"""
+        rows = []
+        while True:
+            try:
+                item = self.blocks.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.finished = True
+                break
+            arrival, block = item
+            rows += self.analyzer.push(block, arrival)
+
+        a = self.analyzer
+        if a.F_ECG.size:
+            lo = max(a.F_ECG.end - self.window, a.F_ECG.start)
+            x = np.arange(lo, a.F_ECG.end)
+            self.app.curve_ECG.setData(x, a.F_ECG.get(lo, a.F_ECG.end))
+            self.app.curve_BP.setData(x, a.F_BP.get(lo, a.F_BP.end))
+            MSNA = a.F_MSNA.get(lo, a.F_MSNA.end)
+            self.app.curve_MSNA.setData(x, MSNA)
+            self.app.ECG_plot.setXRange(lo, lo + self.window, padding=0)
+
+            peaks = np.asarray([p for p in a.peaks if p >= lo], dtype=int)
+            self.curve_peaks.setData(peaks, a.F_ECG.get(lo, a.F_ECG.end)[peaks - lo] if len(peaks) else [])
+            shown = [r for r in a.rows[-200:] if r[7] + self.region_width() >= lo]
+            if shown:
+                self.burst_overlay.setOpts(
+                    x0=[r[7] for r in shown], x1=[r[7] + self.region_width() for r in shown],
+                    y0=float(np.min(MSNA)), height=float(np.ptp(MSNA)) or 1.0,
+                    brushes=[self.brushes[r[10]] for r in shown]
+                )
+
+        win = self.app.win
+        if rows:
+            self.times += sum(r[10] for r in rows)
+            last = rows[-1]
+            win.lineEdit.setText(str(len(a.rows)))
+            win.lineEdit_2.setText(str(self.times))
+            win.lineEdit_6.setText(str(round(last[2], 2)))
+            win.lineEdit_7.setText(str(round(last[4], 2)))
+            win.lineEdit_8.setText(str(round(last[6], 2)))
+            win.lineEdit_3.setText(str(round(last[8], 2)))
+            win.lineEdit_4.setText(str(round(last[9], 2)))
+        win.lineEdit_5.setText(("Live mode (finished): " if self.finished else "Live mode: ") + a.status())
+
+        if self.finished:
+            self.timer.stop()
+            if self.on_finished:
+                self.on_finished()
+
+    def region_width(self) -> int:
+        """バースト判定区間の幅(サンプル)"""
+        return self.analyzer.max_val - self.analyzer.min_val
+
+
+def main(argv: list | None = None) -> int:
+    """ライブモードを起動する
+
+    Args:
+        argv (list | None): コマンドライン引数
+
+    Returns:
+        int: 終了コード
+    """
+    parser = argparse.ArgumentParser(prog="msna-live", description="Score MSNA bursts beat by beat from a live sample stream.")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--replay", metavar="FILE", help="replay a 3-column .txt file at real-time rate")
+    src.add_argument("--port", type=int, help="accept one TCP connection sending 'ECG BP iMSNA' lines")
+    src.add_argument("--stdin", action="store_true", help="read 'ECG BP iMSNA' lines from standard input")
+    parser.add_argument("--fs", type=int, default=2000, help="sample frequency (Hz)")
+    parser.add_argument("--baseline", type=float, default=10.0, help="burst SNR baseline (%%)")
+    parser.add_argument("--cal", type=float, default=1.0, help="MSNA calibration")
+    parser.add_argument("--region", type=float, nargs=2, default=(0.5, 1.5), metavar=("LEFT", "RIGHT"),
+                        help="burst window after each R peak (s)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor")
+    parser.add_argument("--no-gui", action="store_true", help="print beats instead of showing the plots")
+    parser.add_argument("-o", "--output", default=None, help="save the result table (.xlsx or .txt) at the end")
+    args = parser.parse_args(argv)
+
+    analyzer = live_analyzer(args.fs, args.baseline, args.cal, tuple(args.region))
+    block = max(1, args.fs // 20)  # 50 ms
+    if args.replay:
+        source = replay_source(args.replay, args.fs, block, args.speed)
+    elif args.port is not None:
+        source = stream_source(open_socket(args.port), block)
+    else:
+        source = stream_source(sys.stdin, block)
+    if args.no_gui:
+        blocks = start_reader(source, analyzer)
+        while True:
+            item = blocks.get()
+            if item is None:
+                break
+            for row in analyzer.push(item[1], item[0]):
+                print("\t".join(str(round(v, 4)) for v in row))
+        print(analyzer.status(), file=sys.stderr)
+    else:
+        import main as gui
+        msna_app = gui.MSNAApp()
+        view = live_view(msna_app, analyzer, start_reader(source, analyzer))
+        msna_app.run()
+
+    if args.output:
+        msnaAnalyze.save_result(analyzer.result(), args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
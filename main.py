@@ -18,19 +18,76 @@ MSNAApp
 バージョン1.0.5: アイコンの円角化処理; Restartした際に記録データされたデータリセットしない問題の修正
 
 exe化:
-pyinstaller --onefile --windowed --icon=image/icon.ico --add-data "main.ui;." --add-data "image/icon.ico;image" --hidden-import openpyxl.cell._writer --name MSNAAnalyzer main.py
+pyinstaller MSNAAnalyzer.spec
+(main.uiを編集した場合は先に pyuic5 main.ui -o mainUi.py でmainUi.pyを生成し直す)
+
+起動時間の計測:
+python main.py --startup-time
 
 """
 
-from PyQt5 import QtWidgets, uic, QtGui
+import time
+STARTUP = time.perf_counter()  # 起動時間の計測(--startup-time)の基準
+
+from PyQt5 import QtWidgets, QtGui, QtCore
 import pyqtgraph as pg
-import dataProcessing
-import autoCheck
+import backgroundJob
+import dataCache
+import levelOfDetail
+import stageProfiler
 import numpy as np
-import pandas as pd
 from pathlib import Path
+import json
 import os
 import sys
+import threading
+# scipy(dataProcessing)とpandas(beatFeatures, msnaAnalyze, resultExport, scoringSession)は
+# 起動を速くするため, ファイルを開くときや保存するときに各メソッドの中でimportする
+
+LARGE_FILE = 512 * 1024**2  # このサイズ(バイト)を超えるファイルはメモリマップで扱う
+REGION_POOL = 64  # 手動モードで判定済みの区間を表示するアイテムの数(カーソルの前後の拍に使い回す)
+OVERLAY_CHUNK = 1024  # 判定が終わった後の区間を1つのアイテムで描画する拍数(書き換えた拍のアイテムだけ描き直す)
+ENSEMBLE_DELAY = 500  # ラベルを書き換えてから加算平均を計算し直すまでの時間(ms)
+# 判定ごとの区間の色(0: バーストなし, 1: バーストあり, 2: エラー)
+REGION_BRUSHES = {
+    0: pg.mkBrush(color=(255, 0, 0, 70)),
+    1: pg.mkBrush(color=(0, 161, 71, 70)),
+    2: pg.mkBrush(color=(255, 255, 255, 70)),
+}
+
+def load_ui(ui_file: str) -> QtWidgets.QWidget:
+    """メインウィンドウを作る
+
+    pyuic5でmain.uiから生成したmainUi.pyがあればそれを使う(起動のたびに.uiを解析しない).
+    main.uiを編集したら pyuic5 main.ui -o mainUi.py で生成し直す.
+
+    Args:
+        ui_file (str): mainUi.pyがない場合に読み込む.uiファイル
+
+    Returns:
+        QtWidgets.QWidget: ウィンドウ(ウィジェットは属性として参照できる)
+    """
+    try:
+        import mainUi
+    except ImportError:
+        from PyQt5 import uic
+        return uic.loadUi(ui_file)
+
+    class main_window(QtWidgets.QWidget, mainUi.Ui_Form):
+        def __init__(self):
+            super().__init__()
+            self.setupUi(self)
+
+    return main_window()
+
+
+def preload_modules():
+    """ファイル選択中に, 解析で使うモジュール(scipy, pandas)をバックグラウンドで読み込んでおく"""
+    def target():
+        import dataProcessing
+        import msnaAnalyze
+    threading.Thread(target=target, daemon=True).start()
+
 
 class MSNAApp:
     def __init__(self, ui_file="main.ui"):
@@ -47,7 +104,7 @@ class MSNAApp:
         ui_file = os.path.join(base_path, "main.ui")
         icon_file = os.path.join(base_path, "image", "icon.ico")
 
-        self.win = uic.loadUi(ui_file)
+        self.win = load_ui(ui_file)
         self.win.setWindowTitle("MSNAAnalyzer v1.0.4")
         self.win.setWindowIcon(QtGui.QIcon(icon_file))
 
@@ -58,6 +115,30 @@ class MSNAApp:
         self.curve_dbp = None  # DBP（拡張期血圧）のデータ
         self.is_updating = False  # 更新中フラグ
         self.start_check = False  # スタート状態をチェックするフラグ
+        self.cache = dataCache.data_cache()  # 読み込みと処理結果のキャッシュ
+        self.mmap = False  # 信号をメモリマップとして扱うかどうか
+        self.source = None  # ファイルのうち読み込んだチャンネルと範囲(signalReaders.source_settings, .txtの全体はNone)
+        self.file_fs = None  # ファイルのメタデータのサンプリング周波数(ない場合はNoneでspinBoxの値を使う)
+        self.lod = []  # (カーブ, 包絡線のピラミッド)
+        self.session = None  # 手動・自動モードの判定結果(scoringSession.session_table)
+        self.markers = []  # (マーカー, 位置, 値)
+        self.burst_overlays = []  # OVERLAY_CHUNK拍ごとの判定済みの区間のアイテム
+        self.beat_index = None  # 時刻から拍を引く索引(beatIndex.beat_index, 見直しで使う)
+        self.review = None  # 見直し中の拍
+        self.review_filter = "all"  # 見直す拍の絞り込み(beatIndex.REVIEW_FILTERS)
+        self.review_selection = None  # 絞り込んだ拍の番号
+        self.profiler = stageProfiler.stage_profiler()  # 読み込み, 描画, 判定, 保存の段階ごとの時間とメモリ
+        self.profile_panel = None  # 計測結果を表示するウィンドウ(Pキーで表示)
+        self.ensemble_panel = None  # 加算平均, 潜時, 圧受容器反射を表示するウィンドウ(Eキーで表示)
+        self.ensemble_result = None  # ensembleAnalysis.ensemble_analysisの結果(保存に使う)
+        # ラベルを書き換えたときは, キーを押すたびに計算し直さず, 書き換えが止まってから計算し直す
+        self.ensemble_timer = QtCore.QTimer()
+        self.ensemble_timer.setSingleShot(True)
+        self.ensemble_timer.setInterval(ENSEMBLE_DELAY)
+        self.ensemble_timer.timeout.connect(self.show_ensemble)
+        self.background = True  # 読み込みと前処理を別のスレッドで行う(Falseの場合はその場で行う)
+        self.jobs = {}  # 種類("load", "process") -> 実行中のジョブ
+        self.running = set()  # 取り消した後も終わるまで参照を持っておくジョブ
 
         # プロットの初期化
         pg.setConfigOptions(antialias=True) # アンチエイリアスを有効にする
@@ -72,6 +153,8 @@ class MSNAApp:
         self.win.pushButton_5.clicked.connect(self.button5_clicked)
         self.win.progressBar.setMinimum(0)
         self.win.progressBar.setMaximum(100)
+        # 見直しでは, ダブルクリックした位置の拍に移動する(シーンはプロットを作り直しても変わらないので一度だけ接続する)
+        self.win.graphicsView_3.scene().sigMouseClicked.connect(self.plot_clicked)
 
         # キーイベントのハンドラを接続
         self.win.keyPressEvent = self.handle_key_press
@@ -84,6 +167,20 @@ class MSNAApp:
         min_range, max_range = viewbox.viewRange()[0]
         self.min_range = min_range
         self.max_range = max_range
+        self.update_lod()
+
+    def update_lod(self):
+        """表示範囲のデータだけを, 画面の幅に合った解像度で描画する(拡大したときだけ全ての点を描く)"""
+        if not self.lod and not self.markers:
+            return
+        # 少しのパンでは描き直さなくて済むよう, 表示範囲の前後も含める
+        width = self.max_range - self.min_range
+        x0, x1 = self.min_range - width / 2, self.max_range + width / 2
+        pixels = max(int(self.ECG_plot.getViewBox().width()), 100)
+        for curve, pyramid in self.lod:
+            curve.setData(*pyramid.view(x0, x1, 4 * pixels))
+        for marker, x, y in self.markers:
+            marker.setData(*levelOfDetail.decimate_markers(x, y, x0, x1, pixels))
 
     def handle_key_press(self, event):
         """キーボードイベントに基づいて処理を開始する
@@ -96,6 +193,274 @@ class MSNAApp:
             self.button2_clicked()
         elif event.key() == 16777236 and self.count > 0 and self.count < len(self.peaks_ECG_arg) - 1: # 右矢印キー（エラー）
             self.button5_clicked()
+        elif event.key() == 16777235 and self.count > 1: # 上矢印キー（取り消し）
+            self.undo()
+        elif event.key() == 74 and self.count > 0: # Jキー（指定した拍に移動）
+            self.jump()
+        elif event.key() in (78, 66) and self.can_review(): # N, Bキー（見直し: 絞り込んだ次, 前の拍）
+            self.review_step(1 if event.key() == 78 else -1)
+        elif event.key() == 70 and self.can_review(): # Fキー（見直し: 絞り込み）
+            self.choose_review_filter()
+        elif event.key() == 84 and self.can_review(): # Tキー（見直し: 時刻で移動）
+            self.review_time()
+        elif event.key() in (48, 49, 50) and self.can_review() and self.review is not None: # 0, 1, 2キー（見直し: 書き換え）
+            self.relabel(event.key() - 48)
+        elif event.key() == 80: # Pキー（計測結果の表示/非表示）
+            self.toggle_profile_panel()
+        elif event.key() == 69: # Eキー（加算平均, 潜時, 圧受容器反射の表示/非表示）
+            self.toggle_ensemble_panel()
+        elif event.key() == 16777216: # Escキー（読み込み, 前処理の中止）
+            self.cancel_clicked()
+
+    def start_job(self, kind: str, func, *args, on_done=None):
+        """読み込み, 前処理をバックグラウンドのジョブとして実行する
+
+        同じ種類の実行中のジョブは取り消し, その結果は捨てる(読み込みが終わるまでは前のファイルの前処理を続け,
+        新しいファイルの前処理を始めたときに取り消す).
+        進み具合はプログレスバーに表示し, 終わったらon_done(funcの戻り値)をメインスレッドで呼ぶ.
+
+        Args:
+            kind (str): "load"(ファイルの読み込み)または"process"(フィルタ, ピーク検出)
+            func: ジョブで実行する関数(最初の引数にジョブを受け取る)
+            *args: funcに渡す引数
+            on_done (callable | None): 結果を受け取る関数
+        """
+        self.cancel_job(kind)
+        job = backgroundJob.background_job(func, *args)
+        job.progress.connect(lambda percent, stage, job=job: self.job_progress(job, percent, stage))
+        job.done.connect(lambda result, job=job: self.job_done(job, kind, result, on_done))
+        job.failed.connect(lambda error, job=job: self.job_failed(job, kind, error))
+        job.finished.connect(lambda job=job: self.running.discard(job))
+        self.jobs[kind] = job
+        self.running.add(job)
+        if self.background:
+            job.start()
+        else:
+            job.run()
+            self.running.discard(job)
+
+    def cancel_job(self, kind: str) -> bool:
+        """種類kindの実行中のジョブを取り消す
+
+        Args:
+            kind (str): ジョブの種類
+
+        Returns:
+            bool: 取り消したかどうか
+        """
+        job = self.jobs.pop(kind, None)
+        if job is None:
+            return False
+        job.cancel()
+        self.reset_progress()
+        return True
+
+    def cancel_clicked(self):
+        """読み込みと前処理を中止する(Escキー)"""
+        loading = self.cancel_job("load")
+        if self.cancel_job("process"):
+            # 設定を変えてやり直せるようにする
+            self.back()
+        if loading:
+            self.win.lineEdit_5.setText("Loading canceled")
+
+    def job_progress(self, job: backgroundJob.background_job, percent: int, stage: str):
+        """ジョブの進み具合をプログレスバーに表示する
+
+        Args:
+            job (backgroundJob.background_job): ジョブ
+            percent (int): 進み具合(%)
+            stage (str): 段階の名前
+        """
+        if job not in self.jobs.values():
+            return
+        self.win.progressBar.setFormat(f"{stage} %p%" if stage else "%p%")
+        self.win.progressBar.setValue(percent)
+
+    def job_done(self, job: backgroundJob.background_job, kind: str, result, on_done):
+        """ジョブの結果を受け取る(取り消されたジョブ, 置き換えられたジョブの結果は捨てる)
+
+        Args:
+            job (backgroundJob.background_job): ジョブ
+            kind (str): ジョブの種類
+            result: funcの戻り値
+            on_done (callable | None): 結果を受け取る関数
+        """
+        if self.jobs.get(kind) is not job:
+            return
+        del self.jobs[kind]
+        self.reset_progress()
+        if on_done is not None:
+            on_done(result)
+
+    def job_failed(self, job: backgroundJob.background_job, kind: str, error: Exception):
+        """ジョブのエラーを表示する
+
+        Args:
+            job (backgroundJob.background_job): ジョブ
+            kind (str): ジョブの種類
+            error (Exception): funcが投げた例外
+        """
+        if self.jobs.get(kind) is not job:
+            return
+        del self.jobs[kind]
+        self.reset_progress()
+        if kind == "process":
+            self.back()
+        msg_box = QtWidgets.QMessageBox(self.win)
+        msg_box.setWindowTitle("Error")
+        if isinstance(error, ValueError):
+            msg_box.setText(f"File format error: {error}")
+        else:
+            msg_box.setText(f"Could not {'load' if kind == 'load' else 'process'} the file: {error}")
+        msg_box.exec_()
+
+    def reset_progress(self):
+        """プログレスバーを空に戻す"""
+        self.win.progressBar.setFormat("%p%")
+        self.win.progressBar.setValue(0)
+
+    def toggle_profile_panel(self):
+        """段階ごとの時間, スループット, メモリを表示するウィンドウを開閉する"""
+        if self.profile_panel is None:
+            self.profile_panel = QtWidgets.QWidget(self.win, QtCore.Qt.Tool)
+            self.profile_panel.setWindowTitle("Profile")
+            self.profile_text = QtWidgets.QPlainTextEdit(self.profile_panel)
+            self.profile_text.setReadOnly(True)
+            self.profile_text.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+            save_button = QtWidgets.QPushButton("Save JSON", self.profile_panel)
+            save_button.clicked.connect(self.save_profile)
+            layout = QtWidgets.QVBoxLayout(self.profile_panel)
+            layout.addWidget(self.profile_text)
+            layout.addWidget(save_button)
+            self.profile_panel.resize(640, 320)
+        self.profile_panel.setVisible(not self.profile_panel.isVisible())
+        self.show_profile()
+
+    def show_profile(self):
+        """計測結果のウィンドウが開いていれば表示を更新する"""
+        if self.profile_panel is not None and self.profile_panel.isVisible():
+            self.profile_text.setPlainText(self.profiler.text() or "No stages recorded yet.")
+
+    def save_profile(self):
+        """計測結果をJSONファイルに保存する"""
+        default = f"{Path(self.file).stem}_profile.json" if self.file else "profile.json"
+        file_name, _ = QtWidgets.QFileDialog.getSaveFileName(self.win, "Save Profile", default, "JSON Files (*.json)")
+        if file_name:
+            self.profiler.save(file_name, file=self.file)
+
+    def toggle_ensemble_panel(self):
+        """判定した拍のR波に揃えた加算平均, バーストの潜時, 圧受容器反射を表示するウィンドウを開閉する"""
+        if self.ensemble_panel is None:
+            self.ensemble_panel = QtWidgets.QWidget(self.win, QtCore.Qt.Tool)
+            self.ensemble_panel.setWindowTitle("Ensemble")
+            graphics = pg.GraphicsLayoutWidget(self.ensemble_panel)
+            self.ensemble_plot = graphics.addPlot(row=0, col=0, colspan=2, title="R-peak-aligned MSNA")
+            self.ensemble_plot.setLabel("bottom", "Time from R peak", units="s")
+            self.ensemble_plot.addLegend()
+            self.baroreflex_plot = graphics.addPlot(row=1, col=0, title="Baroreflex")
+            self.baroreflex_plot.setLabel("bottom", "DBP", units="mmHg")
+            self.baroreflex_plot.setLabel("left", "Bursts / 100 beats")
+            self.latency_plot = graphics.addPlot(row=1, col=1, title="Burst latency")
+            self.latency_plot.setLabel("bottom", "Latency", units="s")
+            self.ensemble_text = QtWidgets.QLabel(self.ensemble_panel)
+            save_button = QtWidgets.QPushButton("Save", self.ensemble_panel)
+            save_button.clicked.connect(self.save_ensemble)
+            layout = QtWidgets.QVBoxLayout(self.ensemble_panel)
+            layout.addWidget(graphics)
+            layout.addWidget(self.ensemble_text)
+            layout.addWidget(save_button)
+            self.ensemble_panel.resize(720, 560)
+        self.ensemble_panel.setVisible(not self.ensemble_panel.isVisible())
+        self.show_ensemble()
+
+    def ensemble_stale(self):
+        """加算平均のウィンドウが開いていれば, ENSEMBLE_DELAY(ms)後に計算し直す(その前に呼ばれると延ばす)"""
+        if self.ensemble_panel is None or not self.ensemble_panel.isVisible():
+            return
+        self.ensemble_text.setText("Updating...")
+        self.ensemble_timer.start()
+
+    def show_ensemble(self):
+        """加算平均のウィンドウが開いていれば, 判定した拍(手動モードの途中の場合はそこまで)から計算し直して表示する"""
+        self.ensemble_timer.stop()
+        if self.ensemble_panel is None or not self.ensemble_panel.isVisible():
+            return
+        for plot in (self.ensemble_plot, self.baroreflex_plot, self.latency_plot):
+            plot.clear()
+        self.ensemble_result = None
+        if self.session is None:
+            self.ensemble_text.setText("No scored beats yet.")
+            return
+
+        import ensembleAnalysis
+        import msnaAnalyze
+        df = self.session.result(msnaAnalyze.RESULT_COLUMNS)
+        if len(df) == 0:
+            self.ensemble_text.setText("No scored beats yet.")
+            return
+        with self.profiler, stageProfiler.stage("ensemble", beats=len(df)):
+            self.ensemble_result = ensembleAnalysis.ensemble_analysis(df, self.F_MSNA, self.fs, self.min_val,
+                                                                      self.max_val)
+        ensemble, latencies, baroreflex, summary = self.ensemble_result
+
+        t = ensemble["time (s)"].to_numpy()
+        percentiles = [name for name in ensemble.columns if name.startswith("p")]
+        if len(percentiles) >= 2:
+            low = self.ensemble_plot.plot(t, ensemble[percentiles[0]].to_numpy(), pen=None)
+            high = self.ensemble_plot.plot(t, ensemble[percentiles[-1]].to_numpy(), pen=None)
+            band = pg.FillBetweenItem(low, high, brush=(128, 128, 128, 60))
+            self.ensemble_plot.addItem(band)
+        self.ensemble_plot.plot(t, ensemble["mean"].to_numpy(), pen=pg.mkPen("w", width=2), name="all")
+        self.ensemble_plot.plot(t, ensemble["mean (bursts)"].to_numpy(), pen="g", name="bursts")
+        self.ensemble_plot.plot(t, ensemble["mean (no bursts)"].to_numpy(), pen="r", name="no bursts")
+
+        DBP = baroreflex["DBP (mmHg)"].to_numpy()
+        self.baroreflex_plot.plot(DBP, baroreflex["burst incidence (/100 beats)"].to_numpy(), pen=None,
+                                  symbol="o", symbolBrush="c")
+        slope = summary["baroreflex slope (/100 beats/mmHg)"]
+        if np.isfinite(slope) and len(DBP):
+            x = np.array([DBP.min(), DBP.max()])
+            self.baroreflex_plot.plot(x, summary["baroreflex intercept"] + slope * x, pen="y")
+
+        burst_latency = latencies["latency (s)"].to_numpy()[latencies["Burst"].to_numpy() == 1]
+        if len(burst_latency):
+            counts, edges = np.histogram(burst_latency, bins=min(max(len(burst_latency) // 5, 1), 50))
+            self.latency_plot.plot(edges, counts, stepMode="center", fillLevel=0, brush=(0, 200, 0, 120))
+
+        self.ensemble_text.setText(
+            f"{summary['beats']} beats, {summary['bursts']} bursts; "
+            f"latency {summary['mean latency (s)']:.3f} ± {summary['SD latency (s)']:.3f} s; "
+            f"baroreflex slope {slope:.2f} /100 beats/mmHg (r = {summary['baroreflex r']:.2f}, "
+            f"{summary['baroreflex bins']} bins)"
+            + (f"; percentile band from {summary['percentile beats']} beats"
+               if summary["percentile beats"] < summary["beats"] else ""))
+        self.show_profile()
+
+    def save_ensemble(self):
+        """加算平均を{ファイル名}_ensemble, 圧受容器反射の表を{ファイル名}_baroreflexとして保存する"""
+        if self.ensemble_timer.isActive():
+            self.show_ensemble()
+        if self.ensemble_result is None:
+            return
+        import msnaAnalyze
+        import resultExport
+        default = f"{Path(self.file).stem}_ensemble.xlsx"
+        file_name, _ = QtWidgets.QFileDialog.getSaveFileName(self.win, "Save Ensemble", default, "All Files (*)")
+        if not file_name:
+            return
+        path = Path(file_name)
+        if path.suffix not in resultExport.EXPORT_FORMATS:
+            path = path.with_name(path.name + ".xlsx")
+        baroreflex_path = path.with_name(f"{path.stem.removesuffix('_ensemble')}_baroreflex{path.suffix}")
+        ensemble, _, baroreflex, _ = self.ensemble_result
+        try:
+            msnaAnalyze.save_result(ensemble, str(path))
+            msnaAnalyze.save_result(baroreflex, str(baroreflex_path))
+        except (OSError, ValueError) as e:
+            self.ensemble_text.setText(str(e))
+            return
+        self.ensemble_text.setText(f"Saved to {path} and {baroreflex_path}")
 
     def initialize_plots(self):
         """プロットの初期化"""
@@ -121,6 +486,18 @@ class MSNAApp:
         self.curve_ECG = self.ECG_plot.plot(pen='y')
         self.curve_BP = self.BP_plot.plot(pen='g')
         self.curve_MSNA = self.MSNA_plot.plot(pen='r')
+        # 表示範囲のデータだけを間引いて描画する
+        for curve in (self.curve_ECG, self.curve_BP, self.curve_MSNA):
+            curve.setClipToView(True)
+            curve.setDownsampling(auto=True, method='peak')
+
+        # 判定済みの区間を表示するアイテム(拍の番号 % REGION_POOLの位置を使い回す)
+        self.region_pool = []
+        for _ in range(REGION_POOL):
+            item = pg.LinearRegionItem(movable=False)
+            item.hide()
+            self.MSNA_plot.addItem(item)
+            self.region_pool.append(item)
 
         self.is_updating = False
 
@@ -132,11 +509,16 @@ class MSNAApp:
         self.win.lineEdit_9.setText(str(self.min_val))
         self.win.lineEdit_10.setText(str(self.max_val))
 
-    def drawCalculation(self, select):
+    def drawCalculation(self, select, on_done=None):
         """グラフのデータを計算して描画
+
+        フィルタとピーク検出はバックグラウンドのジョブ(process_signals)で行い, 終わったら描画する.
         Args:
             select (int): 0: ファイルを選択する前, 1: ファイルを選択した後
+            on_done (callable | None): 描画した後に呼ぶ関数
         """
+        self.lod = []
+        self.markers = []
         if self.curve_ECGpeaks:
             if select == 0:
                 self.ECG_plot.deleteLater()
@@ -148,75 +530,132 @@ class MSNAApp:
                 self.curve_BP.clear()
                 self.curve_MSNA.clear()
                 self.ECG_plot.removeItem(self.curve_ECGpeaks)
+                self.BP_plot.removeItem(self.curve_sbp)
                 self.BP_plot.removeItem(self.curve_dbp)
                 self.on_xrange_changed(self.ECG_plot.getViewBox())
 
-        # UIから値を取得
-        self.fs = self.win.spinBox.value()
+        # UIから値を取得(サンプリング周波数はファイルにあればそちらを使う)
+        self.fs = self.file_fs if self.file_fs is not None else self.win.spinBox.value()
         self.ECGTrig = self.win.doubleSpinBox_2.value()
         self.Baseline = self.win.doubleSpinBox_3.value()
         self.iMSNA_cal = self.win.doubleSpinBox_4.value()
 
-        # MSNAの補正
-        dataSet = dataProcessing.data_set(self.ECG, self.BP, self.iMSNA_, self.fs)
-        self.F_ECG, self.F_BP, self.F_iMSNA_, self.peaks_ECG_arg, self.sbp_arg, self.dbp_arg = dataSet.read_data()
-        self.F_MSNA = [x / self.iMSNA_cal for x in self.F_iMSNA_]
-        self.peaks_ECG_arg_diff = np.diff(self.peaks_ECG_arg)
-
-        # データをプロット
-        self.curve_ECG.setData(self.F_ECG)
-        self.curve_ECGpeaks = pg.PlotDataItem(
-            x=self.peaks_ECG_arg, y=self.F_ECG[self.peaks_ECG_arg],
-            pen=None, symbol='o', symbolPen=None, symbolSize=5, symbolBrush=(255, 0, 0)
-        )
-        self.ECG_plot.addItem(self.curve_ECGpeaks)
-        self.ECG_plot.setRange(xRange=[0, (self.max_range-self.min_range)], yRange=[min(self.F_ECG), max(self.F_ECG)], padding=0)
+        self.start_job("process", self.process_signals, self.file, self.ECG, self.BP, self.iMSNA_, self.fs,
+                       self.iMSNA_cal, self.mmap, self.source, on_done=lambda result: self.signals_processed(result, on_done))
 
-        self.curve_BP.setData(self.F_BP)
-        self.curve_sbp = pg.PlotDataItem(
-            x=self.sbp_arg, y=self.F_BP[self.sbp_arg],
-            pen=None, symbol='o', symbolPen=None, symbolSize=5, symbolBrush=(255, 0, 0)
-        )
+    def process_signals(self, job: backgroundJob.background_job, file: str, ECG: np.ndarray, BP: np.ndarray,
+                        iMSNA: np.ndarray, fs: int, iMSNA_cal: float, mmap: bool, source: dict | None = None) -> tuple:
+        """フィルタ, ピーク検出, MSNAの補正と描画用の包絡線のピラミッドを求める(バックグラウンドのジョブ)
+
+        Args:
+            job (backgroundJob.background_job): ジョブ(進み具合と取り消し)
+            file (str): 記録ファイル(キャッシュのキー)
+            ECG (np.ndarray): ECGのデータ
+            BP (np.ndarray): BPのデータ
+            iMSNA (np.ndarray): iMSNAのデータ
+            fs (int): サンプリング周波数
+            iMSNA_cal (float): MSNAの補正
+            mmap (bool): メモリマップとして扱う
+            source (dict | None): 読み込んだチャンネルと範囲(キャッシュのキー)
+
+        Returns:
+            tuple: data_set.read_dataの戻り値, 補正したMSNA, 包絡線のピラミッド(ECG, BP, MSNA)
+        """
+        with self.profiler, stageProfiler.stage("drawCalculation", samples=len(ECG)):
+            # scipyは最初のファイルで読み込まれる
+            with stageProfiler.stage("import"):
+                import dataProcessing
+            dataSet = dataProcessing.data_set(ECG, BP, iMSNA, fs, progress=lambda fraction, stage: job.report(0.9 * fraction, stage))
+            processed = self.cache.read_data(file, dataSet, mmap, source)
+            # MSNAの補正
+            F_MSNA = processed[2] if iMSNA_cal == 1 else np.asarray(processed[2]) / iMSNA_cal
+            job.report(0.9, "levels")
+            with stageProfiler.stage("levels", samples=len(processed[0])):
+                pyramids = [levelOfDetail.minmax_pyramid(data) for data in (processed[0], processed[1], F_MSNA)]
+        return (*processed, F_MSNA, pyramids)
+
+    def signals_processed(self, result: tuple, on_done=None):
+        """process_signalsの結果を受け取って描画する
+
+        Args:
+            result (tuple): process_signalsの戻り値
+            on_done (callable | None): 描画した後に呼ぶ関数
+        """
+        self.F_ECG, self.F_BP, self.F_iMSNA_, self.peaks_ECG_arg, self.sbp_arg, self.dbp_arg, self.F_MSNA, pyramids = result
+        with self.profiler:
+            self.plot_signals(pyramids)
+        self.show_profile()
+        if on_done is not None:
+            on_done()
+
+    def plot_signals(self, pyramids: list):
+        """フィルタ後の信号とピークを描画する(drawCalculation)
+
+        Args:
+            pyramids (list): ECG, BP, MSNAの包絡線のピラミッド(levelOfDetail.minmax_pyramid)
+        """
+        # データをプロット(表示範囲の分だけupdate_lodで描画する)
+        (ECG_min, ECG_max), (BP_min, BP_max), self.MSNA_range = [pyramid.range() for pyramid in pyramids]
+        self.curve_ECGpeaks = pg.PlotDataItem(pen=None, symbol='o', symbolPen=None, symbolSize=5, symbolBrush=(255, 0, 0))
+        self.ECG_plot.addItem(self.curve_ECGpeaks)
+        self.curve_sbp = pg.PlotDataItem(pen=None, symbol='o', symbolPen=None, symbolSize=5, symbolBrush=(255, 0, 0))
         self.BP_plot.addItem(self.curve_sbp)
-        self.curve_dbp = pg.PlotDataItem(
-            x=self.dbp_arg, y=self.F_BP[self.dbp_arg],
-            pen=None, symbol='o', symbolPen=None, symbolSize=5, symbolBrush=(255, 0, 0)
-        )
+        self.curve_dbp = pg.PlotDataItem(pen=None, symbol='o', symbolPen=None, symbolSize=5, symbolBrush=(255, 0, 0))
         self.BP_plot.addItem(self.curve_dbp)
-        self.BP_plot.setRange(yRange=[min(self.F_BP), max(self.F_BP)], padding=0)
 
-        self.curve_MSNA.setData(self.F_MSNA)
-        self.MSNA_plot.setRange(yRange=[min(self.F_MSNA), max(self.F_MSNA)], padding=0)
+        self.lod = list(zip((self.curve_ECG, self.curve_BP, self.curve_MSNA), pyramids))
+        self.markers = []
+        for marker, arg, data in ((self.curve_ECGpeaks, self.peaks_ECG_arg, self.F_ECG),
+                                  (self.curve_sbp, self.sbp_arg, self.F_BP), (self.curve_dbp, self.dbp_arg, self.F_BP)):
+            arg = np.asarray(arg, dtype=np.intp)
+            self.markers.append((marker, arg, np.asarray(data[arg])))
+        self.ECG_plot.setRange(xRange=[0, (self.max_range-self.min_range)], yRange=[ECG_min, ECG_max], padding=0)
+        self.BP_plot.setRange(yRange=[BP_min, BP_max], padding=0)
+        self.MSNA_plot.setRange(yRange=list(self.MSNA_range), padding=0)
+        with stageProfiler.stage("render"):
+            self.update_lod()
+            # Qtの描画も計測に含める
+            for view in (self.win.graphicsView, self.win.graphicsView_2, self.win.graphicsView_3):
+                view.viewport().repaint()
+
+    def config(self, on_done=None):
+        """設定ボタンが押されたときの処理
 
-    def config(self):
-        """設定ボタンが押されたときの処理"""
+        Args:
+            on_done (callable | None): 新しい設定で処理して描画した後に呼ぶ関数
+        """
         self.win.spinBox.setEnabled(False)
         self.win.doubleSpinBox_2.setEnabled(False)
         self.win.doubleSpinBox_3.setEnabled(False)
         self.win.doubleSpinBox_4.setEnabled(False)
         self.win.pushButton_3.setEnabled(False)
+        self.drawCalculation(1, lambda: self.configured(on_done))
+
+    def configured(self, on_done=None):
+        """設定した値での処理が終わったら, 判定のボタンを有効にする
+
+        Args:
+            on_done (callable | None): その後に呼ぶ関数
+        """
         self.win.pushButton_4.setEnabled(True)
         self.win.pushButton.setEnabled(True)
         self.win.pushButton_2.setEnabled(True)
         self.win.pushButton_5.setEnabled(True)
-        self.drawCalculation(1)
+        if on_done is not None:
+            on_done()
 
     def restart(self):
         """ファイル選択ときの処理"""
-        # 出力データを格納するリスト
-        self.Rtime_output = []
-        self.RRI_output = []
-        self.HR_output = []
-        self.DBP_output = []
-        self.DBPtime_output = []
-        self.SBP_output = []
-        self.SBPtime_output = []
-        self.MSNAtime_output = []
-        self.MSNAheight_output = []
-        self.MSNAAera_output = []
-        self.Burst_output = []
+        self.close_journal()
+        self.session = None
+        self.burst_overlays = []
+        self.beat_index = None
+        self.review = None
+        self.review_selection = None
         self.count = 0
         self.drawCalculation(0)
+        for item in self.region_pool:
+            item.hide()
         self.region = pg.LinearRegionItem([0.5 * self.fs, 1.5 * self.fs])
         self.region.sigRegionChanged.connect(self.update_region) # regionnの選択範囲の変更を監視
         self.region.setBrush(pg.mkBrush(color=(0, 0, 0, 0)))
@@ -245,52 +684,233 @@ class MSNAApp:
         self.win.pushButton_5.setText("Close")
 
     def open_file_dialog(self):
-        """ファイル選択ダイアログ"""
-        self.file, _ = QtWidgets.QFileDialog.getOpenFileName(self.win, "Select a file", "", "Text Files (*.txt)")
-        if self.file:
-            ECG, BP, iMSNA = [], [], []
+        """ファイル選択ダイアログ
+
+        読み込みはバックグラウンドのジョブ(load_signals)で行い, その間も前のファイルはそのまま使える.
+        """
+        preload_modules()
+        file, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self.win, "Select a file", "",
+            "Recordings (*.txt *.edf *.h5 *.hdf5 *.bin *.dat *.raw);;Text Files (*.txt);;All Files (*)")
+        if file:
+            channels, start, stop = None, 0.0, None
+            if Path(file).suffix.lower() != ".txt":
+                # .txt以外はECG, BP, iMSNAのチャンネルと読み込む範囲を選ぶ
+                try:
+                    selected = self.choose_channels(file)
+                except (OSError, ValueError) as e:
+                    self.win.lineEdit_5.setText(f"{file}: {e}")
+                    return
+                if selected is None:
+                    return
+                channels, start, stop = selected
+            # 大きなファイルはキャッシュ上のメモリマップとして扱う
+            mmap = os.path.getsize(file) > LARGE_FILE
+            self.win.lineEdit_5.setText(f"Loading {file} (Esc to cancel)")
+            self.start_job("load", self.load_signals, file, mmap, channels, start, stop, self.win.spinBox.value(),
+                           on_done=self.signals_loaded)
+
+    def choose_channels(self, file: str) -> tuple | None:
+        """ECG, BP, iMSNAに使うチャンネルと, 読み込む範囲(秒)を選ぶダイアログ(ファイルはヘッダだけを読む)
+
+        Args:
+            file (str): 記録ファイル
+
+        Returns:
+            tuple | None: チャンネルの番号(3つ), 始点, 終点(Noneは最後まで). キャンセルした場合はNone
+        """
+        import signalReaders
+        with signalReaders.open_reader(file) as reader:
+            names = list(reader.channels)
+            index = reader.resolve(None)
             try:
-                with open(self.file, "r") as f:
-                    for line in f:
-                        data = line.split()
-                        if len(data) != 3:
-                            raise ValueError("Invalid file format")
-                        ECG.append(float(data[0]))
-                        BP.append(float(data[1]))
-                        iMSNA.append(float(data[2]))
-                self.ECG = ECG
-                self.BP = BP
-                self.iMSNA_ = iMSNA
-                self.restart()
-                self.update_region()
-            except ValueError as e:
-                msg_box = QtWidgets.QMessageBox(self.win)
-                msg_box.setWindowTitle("Error")
-                msg_box.setText(f"File format error: {e}")
-                msg_box.exec_()
-
-    def Burst_check(self, select):
-        """バーストのチェック
+                fs = reader.fs_of(index, None)
+            except ValueError:
+                # 既定のチャンネルのサンプリング周波数が違う場合(選び直したチャンネルは読み込むときに確かめる)
+                fs = None
+            lengths = [reader.channel_length(i) for i in index]
+        dialog = QtWidgets.QDialog(self.win)
+        dialog.setWindowTitle("Channels")
+        layout = QtWidgets.QFormLayout(dialog)
+        boxes = []
+        for signal, i in zip(signalReaders.SIGNAL_NAMES, index):
+            box = QtWidgets.QComboBox(dialog)
+            box.addItems(names)
+            box.setCurrentIndex(i)
+            layout.addRow(signal, box)
+            boxes.append(box)
+        duration = min(lengths) / fs if fs and None not in lengths else 1e9
+        start_box = QtWidgets.QDoubleSpinBox(dialog)
+        stop_box = QtWidgets.QDoubleSpinBox(dialog)
+        for box in (start_box, stop_box):
+            box.setRange(0, duration)
+            box.setDecimals(1)
+            box.setSuffix(" s")
+            box.setEnabled(fs is not None)
+        stop_box.setValue(duration)
+        layout.addRow("Start", start_box)
+        layout.addRow("Stop", stop_box)
+        layout.addRow("Sampling rate", QtWidgets.QLabel(f"{fs} Hz (from file)" if fs else "from the settings"))
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel, dialog)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addRow(buttons)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return None
+        stop = stop_box.value()
+        return [box.currentIndex() for box in boxes], start_box.value(), None if stop >= duration else stop
+
+    def load_signals(self, job: backgroundJob.background_job, file: str, mmap: bool, channels: list | None = None,
+                     start: float = 0.0, stop: float | None = None, fs: int | None = None) -> tuple:
+        """ファイルを読み込む(バックグラウンドのジョブ)
+
         Args:
-            select (int): 0: バーストなし, 1: バーストあり, 2: エラー
+            job (backgroundJob.background_job): ジョブ(進み具合と取り消し)
+            file (str): 記録ファイル
+            mmap (bool): メモリマップとして扱う
+            channels (list | None): ECG, BP, iMSNAのチャンネルの番号(.txtの場合はNone)
+            start (float): 読み込む範囲の始点(秒)
+            stop (float | None): 読み込む範囲の終点(秒)
+            fs (int | None): ファイルにサンプリング周波数がない場合の値(spinBox)
+
+        Returns:
+            tuple: ファイル, メモリマップかどうか, ECG, BP, iMSNAのデータ, 読み込みの速度,
+                ファイルのサンプリング周波数(ない場合はNone), 読み込んだチャンネルと範囲
         """
-        self.win.lineEdit.setText(str(self.count))
-        self.region = pg.LinearRegionItem([self.r_lift, self.r_right])
-        if select == 0:
-            self.region.setBrush(pg.mkBrush(color=(255, 0, 0, 70)))
-            self.Burst_output.append(0)
-        elif select == 1:
-            self.times+=1
-            self.win.lineEdit_2.setText(str(self.times))
-            self.region.setBrush(pg.mkBrush(color=(0, 161, 71, 70)))
-            self.Burst_output.append(1)
-        elif select == 2:
-            self.region.setBrush(pg.mkBrush(color=(255, 255, 255, 70)))
-        self.MSNA_plot.addItem(self.region)
-        self.region.setMovable(False)
-        self.win.progressBar.setValue(round(self.count/(len(self.peaks_ECG_arg)-2)*100))
+        import signalReaders
+        with self.profiler, stageProfiler.stage("open_file_dialog"):
+            with stageProfiler.stage("load") as counts:
+                # 範囲(秒)はメタデータのサンプリング周波数, なければspinBoxの値でサンプルにする
+                ECG, BP, iMSNA, _ = self.cache.read_signals(
+                    file, fs, channels, start, stop, mmap=mmap, progress=lambda fraction: job.report(fraction, "load"))
+                counts["samples"] = len(ECG)
+            # メタデータにない場合はNone(spinBoxを書き換えずに, 後で変えた値も使えるようにする)
+            file_fs = signalReaders.recording_fs(file, None, channels)
+        return (file, mmap, ECG, BP, iMSNA, self.cache.last_report, file_fs,
+                signalReaders.source_settings(channels, start, stop))
+
+    def signals_loaded(self, result: tuple):
+        """load_signalsの結果を受け取り, 新しいファイルとして処理を始める
+
+        Args:
+            result (tuple): load_signalsの戻り値
+        """
+        self.file, self.mmap, self.ECG, self.BP, self.iMSNA_, report, self.file_fs, self.source = result
+        if self.file_fs is not None:
+            self.win.spinBox.setValue(round(self.file_fs))
+        self.restart()
+        self.update_region()
+        self.win.lineEdit_5.setText(f"{self.file} ({report})")
+        self.check_journal()
+
+    def Burst_check(self, i):
+        """判定した拍の区間を表示し, 拍数とバースト数を更新
+        Args:
+            i (int): 判定した拍の番号
+        """
+        self.draw_region(i)
+        # カーソルの後ろ側に入ってくる拍(ジャンプ後に判定済みの場合)
+        if i + REGION_POOL // 2 < len(self.session):
+            self.draw_region(i + REGION_POOL // 2)
+        self.show_counts()
         QtWidgets.QApplication.processEvents()
 
+    def show_counts(self):
+        """拍数, バースト数, 進捗を表示"""
+        self.win.lineEdit.setText(str(self.session.cursor))
+        self.win.lineEdit_2.setText(str(self.session.n_bursts))
+        self.win.progressBar.setValue(round(self.session.cursor / len(self.session) * 100))
+
+    def show_values(self, row):
+        """拍の特徴量を表示
+        Args:
+            row (dict): session_table.rowの戻り値
+        """
+        self.win.lineEdit_6.setText(str(round(row["HR"], 2)))
+        self.win.lineEdit_7.setText(str(round(row["DBP"], 2)))
+        self.win.lineEdit_8.setText(str(round(row["SBP"], 2)))
+        self.win.lineEdit_3.setText(str(round(row["iMSNA height"], 2)))
+        self.win.lineEdit_4.setText(str(round(row["iMSNA area"], 2)))
+
+    def draw_region(self, i):
+        """i番目の拍の判定済みの区間を, 使い回しのアイテムで表示(未判定の場合は隠す)
+        Args:
+            i (int): 拍の番号
+        """
+        import scoringSession
+        item = self.region_pool[i % REGION_POOL]
+        label = self.session.label[i]
+        if label == scoringSession.UNSCORED:
+            item.hide()
+            return
+        r_lift = self.session.columns["iMSNA time"][i]
+        item.setRegion([r_lift, r_lift + self.max_val - self.min_val])
+        item.setBrush(REGION_BRUSHES[label])
+        item.show()
+
+    def draw_regions(self):
+        """カーソルの前後REGION_POOL拍の区間を全て描き直す(取り消しやジャンプの後)"""
+        lo = max(self.session.cursor - REGION_POOL // 2, 0)
+        for i in range(lo, lo + REGION_POOL):
+            if i < len(self.session):
+                self.draw_region(i)
+            else:
+                self.region_pool[i % REGION_POOL].hide()
+
+    def draw_session_overlay(self):
+        """判定済みの全ての拍の区間をOVERLAY_CHUNK拍ずつのアイテムで描画(使い回しのアイテムは隠す)"""
+        for item in self.region_pool:
+            item.hide()
+        self.burst_overlays = [self.draw_overlay_chunk(lo) for lo in range(0, len(self.session), OVERLAY_CHUNK)]
+
+    def draw_overlay_chunk(self, lo: int) -> pg.BarGraphItem:
+        """lo番目の拍からOVERLAY_CHUNK拍のうち, 判定済みの拍の区間を描画
+        Args:
+            lo (int): 最初の拍の番号
+
+        Returns:
+            pg.BarGraphItem: 描画したアイテム
+        """
+        import scoringSession
+        label = self.session.label[lo:lo + OVERLAY_CHUNK]
+        scored = label != scoringSession.UNSCORED
+        r_lift = self.session.columns["iMSNA time"][lo:lo + OVERLAY_CHUNK][scored]
+        return self.draw_burst_overlay(r_lift, r_lift + self.max_val - self.min_val, label[scored])
+
+    def redraw_overlay(self, i: int):
+        """i番目の拍を含むアイテムだけを描き直す(見直しでラベルを書き換えた後)
+        Args:
+            i (int): 拍の番号
+        """
+        k = i // OVERLAY_CHUNK
+        self.MSNA_plot.removeItem(self.burst_overlays[k])
+        self.burst_overlays[k] = self.draw_overlay_chunk(k * OVERLAY_CHUNK)
+
+    def show_cursor(self):
+        """カーソルの拍に区間を移し, その1拍前のR波から表示"""
+        i = self.session.cursor
+        self.region.setRegion([self.min_val + self.peaks_ECG_arg[i], self.max_val + self.peaks_ECG_arg[i]])
+        R = self.peaks_ECG_arg[max(i - 1, 0)]
+        self.ECG_plot.setRange(xRange=[R, (self.max_range-self.min_range) + R], padding=0)
+
+    def draw_burst_overlay(self, r_lift: np.ndarray, r_right: np.ndarray, Burst: np.ndarray) -> pg.BarGraphItem:
+        """複数の拍の判定区間を1つのアイテムでまとめて描画
+        Args:
+            r_lift (np.ndarray): 各区間の始点
+            r_right (np.ndarray): 各区間の終点
+            Burst (np.ndarray): 0: バーストなし, 1: バーストあり, 2: エラー
+
+        Returns:
+            pg.BarGraphItem: 描画したアイテム
+        """
+        y0, y1 = self.MSNA_range
+        burst_overlay = pg.BarGraphItem(
+            x0=r_lift, x1=r_right, y0=y0, height=y1 - y0,
+            pen=pg.mkPen(None), brushes=[REGION_BRUSHES[b] for b in Burst]
+        )
+        self.MSNA_plot.addItem(burst_overlay)
+        return burst_overlay
+
     def start(self, select):
         """スタートボタンが押されたときの処理
         Args:
@@ -304,53 +924,331 @@ class MSNAApp:
             pass
         else:
             if self.count == 0:
-                self.win.pushButton.setText("Burst(Left Key)")
-                self.win.pushButton_2.setText("No Burst(Down Key)")
-                self.win.pushButton_5.setText("Error(Right Key)")
-                self.win.pushButton_4.setEnabled(False)
-                self.update_region()
-                self.region.setMovable(False)
-                self.times = 0
+                self.begin_session()
+                self.session.journal = self.new_journal()
             else:
-                self.r_lift = self.min_val + self.peaks_ECG_arg[self.count - 1]
-                self.r_right = self.max_val + self.peaks_ECG_arg[self.count - 1]
-                xRange = [self.peaks_ECG_arg[self.count - 1], (self.max_range-self.min_range) + self.peaks_ECG_arg[self.count - 1]]
-
+                i = self.session.mark(select)
                 if select != 2:
-                    self.Rtime_output.append(self.peaks_ECG_arg[self.count - 1]/self.fs)
-                    self.RRI_output.append(self.peaks_ECG_arg_diff[self.count - 1]/self.fs)
-                    self.HR_output.append(60 / (self.peaks_ECG_arg_diff[self.count - 1] / self.fs))
-                    self.DBPtime_output.append(self.dbp_arg[self.count - 1]/self.fs)
-                    self.DBP_output.append(self.F_BP[self.dbp_arg[self.count - 1]])
-                    self.SBPtime_output.append(self.sbp_arg[self.count - 1]/self.fs)
-                    self.SBP_output.append(self.F_BP[self.sbp_arg[self.count - 1]])
-                    self.MSNAtime_output.append(self.r_lift)
-                    self.MSNAheight_output.append(max(self.F_MSNA[self.r_lift:self.r_right + 1]))
-                    self.MSNAAera_output.append(sum(self.F_MSNA[self.r_lift:self.r_right + 1]))
-                
-                    self.win.lineEdit_6.setText(str(round(self.HR_output[-1], 2)))
-                    self.win.lineEdit_7.setText(str(round(self.DBP_output[-1], 2)))
-                    self.win.lineEdit_8.setText(str(round(self.SBP_output[-1], 2)))
-                    self.win.lineEdit_3.setText(str(round(self.MSNAheight_output[-1], 2)))
-                    self.win.lineEdit_4.setText(str(round(self.MSNAAera_output[-1], 2)))
-
-                self.Burst_check(select)
-                if self.count < len(self.peaks_ECG_arg) - 2:
-                    self.ECG_plot.setRange(xRange=xRange, padding=0)
-                    self.region = pg.LinearRegionItem([self.min_val + self.peaks_ECG_arg[self.count], self.max_val + self.peaks_ECG_arg[self.count]])
-                    self.region.setBrush(pg.mkBrush(color=(0, 0, 0, 0)))
-                    self.MSNA_plot.addItem(self.region)
-                    self.region.setMovable(False)
+                    self.show_values(self.session.row(i))
+                self.Burst_check(i)
+                if self.session.cursor < len(self.session):
+                    self.show_cursor()
                 else:
-                    self.win.lineEdit_5.setText("Save the file as .xlsx or .txt (if no extension is entered, .xlsx will be added automatically).")
-                    self.win.pushButton.setText("Save or not")
-                    self.win.pushButton_2.setText("Restart(Save to enable)")
-                    self.win.pushButton_5.setText("Close(Save to enable)")
-                    self.win.pushButton_2.setEnabled(False)
-                    self.win.pushButton_5.setEnabled(False)
-            self.count += 1
+                    self.draw_session_overlay()
+                    self.finish()
+            self.count = self.session.cursor + 1
+        self.start_check = False
+
+    def begin_session(self):
+        """区間を固定し, 手動モードの判定を始める"""
+        self.scoring_buttons()
+        self.win.pushButton_4.setEnabled(False)
+        self.update_region()
+        self.region.setMovable(False)
+        # 以降は区間を拍ごとに移動するだけなので, 設定値の更新を止める
+        self.region.sigRegionChanged.disconnect(self.update_region)
+        # 区間は固定されたので, 全ての拍の特徴量を先にまとめて求めておく
+        import beatFeatures
+        import scoringSession
+        with self.profiler:
+            beats = beatFeatures.beat_table(self.F_BP, self.F_MSNA, self.peaks_ECG_arg, self.sbp_arg, self.dbp_arg,
+                                            self.fs, self.min_val, self.max_val)
+        self.session = scoringSession.session_table(beats)
+        self.show_profile()
+
+    def journal_header(self) -> dict:
+        """ジャーナルのヘッダ(再開時に同じ設定と区間に戻すための値)
+
+        Returns:
+            dict: ヘッダ
+        """
+        import dataProcessing
+        settings = dataProcessing.data_set(None, None, None, self.fs).settings()
+        return {
+            "file": str(self.file),
+            "settings": json.loads(json.dumps(settings)),
+            "fs": self.fs,
+            "source": self.source,
+            "baseline": self.Baseline,
+            "iMSNA_cal": self.iMSNA_cal,
+            "min_val": self.min_val,
+            "max_val": self.max_val,
+            "n_beats": len(self.session),
+        }
+
+    def new_journal(self):
+        """手動モードの操作を記録するジャーナルを作る(作れない場合は記録しない)
+
+        Returns:
+            scoringSession.session_journal | None: ジャーナル
+        """
+        import scoringSession
+        try:
+            return scoringSession.session_journal(self.cache.journal_path(self.file), self.journal_header())
+        except OSError:
+            return None
+
+    def close_journal(self):
+        """ジャーナルを閉じる(ファイルは次に開いたときの再開用に残す)"""
+        if self.session is not None and self.session.journal is not None:
+            self.session.journal.close()
+            self.session.journal = None
+
+    def check_journal(self):
+        """中断した手動モードのジャーナルがあれば, 続きから再開するか確認する"""
+        import scoringSession
+        path = self.cache.journal_path(self.file)
+        journal = scoringSession.session_journal.read(path)
+        if journal is None:
+            return
+        header, records = journal
+        saved = time.strftime("%Y-%m-%d %H:%M", time.localtime(header.get("created", 0)))
+        answer = QtWidgets.QMessageBox.question(
+            self.win, "Resume", f"Resume the scoring session started {saved} ({len(records)} steps)?",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No
+        )
+        if answer != QtWidgets.QMessageBox.Yes:
+            os.remove(path)
+            return
+        try:
+            self.resume_session(header, records, path)
+        except (KeyError, ValueError) as e:
+            self.resume_failed(e)
+
+    def resume_failed(self, e: Exception):
+        """再開できなかったことを表示し, 最初からやり直す
+
+        Args:
+            e (Exception): 再開できなかった理由
+        """
+        self.restart()
+        msg_box = QtWidgets.QMessageBox(self.win)
+        msg_box.setWindowTitle("Error")
+        msg_box.setText(f"Could not resume the session: {e}")
+        msg_box.exec_()
+
+    def resume_session(self, header: dict, records, path):
+        """ジャーナルの設定と区間に戻し, 処理が終わったら操作をやり直して続きから判定する
+        Args:
+            header (dict): ジャーナルのヘッダ
+            records (np.ndarray): ジャーナルの操作
+            path (Path): ジャーナルのパス
+        """
+        self.win.spinBox.setValue(round(header["fs"]))
+        self.win.doubleSpinBox_3.setValue(header["baseline"])
+        self.win.doubleSpinBox_4.setValue(header["iMSNA_cal"])
+        self.config(lambda: self.replay_session(header, records, path))  # 処理結果はキャッシュから読む
+
+    def replay_session(self, header: dict, records, path):
+        """ジャーナルの区間に戻して操作をやり直し, 続きから判定する(resume_session)
+        Args:
+            header (dict): ジャーナルのヘッダ
+            records (np.ndarray): ジャーナルの操作
+            path (Path): ジャーナルのパス
+        """
+        import dataProcessing
+        import scoringSession
+        try:
+            if json.loads(json.dumps(dataProcessing.data_set(None, None, None, self.fs).settings())) != header["settings"]:
+                raise ValueError("the processing settings have changed")
+            if header.get("source") != self.source:
+                raise ValueError("the channels or time range have changed")
+            self.region.setRegion([header["min_val"], header["max_val"]])
+            self.begin_session()
+            if len(self.session) != header["n_beats"]:
+                raise ValueError("the number of beats does not match")
+            self.session.replay(records)
+            self.session.journal = scoringSession.session_journal(path)
+        except (KeyError, ValueError) as e:
+            self.resume_failed(e)
+            return
+
+        self.count = self.session.cursor + 1
+        self.draw_regions()
+        self.show_counts()
+        if self.session.cursor < len(self.session):
+            self.show_cursor()
+        else:
+            self.draw_session_overlay()
+            self.finish()
+        self.win.lineEdit_5.setText(f"{self.file} (resumed at beat {self.session.cursor + 1})")
+
+    def undo(self):
+        """直前の判定(またはジャンプ, 見直しでの書き換え)を取り消す"""
+        if self.start_check or self.session is None or not self.session.history:
+            return
+        if self.session.last_is_relabel():
+            i = self.session.undo()
+            self.relabeled(i)
+            return
+        self.start_check = True
+        if self.count >= len(self.peaks_ECG_arg) - 1:
+            self.resume()
+        self.session.undo()
+        self.draw_regions()
+        self.show_counts()
+        if self.session.cursor < len(self.session):
+            self.show_cursor()
+        else:
+            # 最後の拍からのジャンプを取り消した場合
+            self.draw_session_overlay()
+            self.finish()
+        self.count = self.session.cursor + 1
         self.start_check = False
 
+    def jump(self):
+        """指定した拍に移動する(判定済みの拍を選ぶと上書きできる)"""
+        if self.start_check or self.session is None or len(self.session) == 0:
+            return
+        n = len(self.session)
+        beat, ok = QtWidgets.QInputDialog.getInt(self.win, "Jump", f"Beat (1-{n}):", min(self.session.cursor + 1, n), 1, n)
+        if not ok:
+            return
+        if self.count >= len(self.peaks_ECG_arg) - 1:
+            self.resume()
+        self.session.jump(beat - 1)
+        self.draw_regions()
+        self.show_counts()
+        self.show_cursor()
+        self.count = self.session.cursor + 1
+
+    def can_review(self) -> bool:
+        """判定が終わっていて(手動モードの最後の拍まで, または自動モード), 見直しができるかどうか"""
+        return (not self.start_check and self.session is not None and len(self.session) > 0
+                and self.session.cursor >= len(self.session) and len(self.burst_overlays) > 0)
+
+    def review_index(self):
+        """判定した拍のR波の索引(拍数が変わったときに作り直す)
+
+        Returns:
+            beatIndex.beat_index: 索引
+        """
+        import beatIndex
+        if self.beat_index is None or len(self.beat_index) != len(self.session):
+            self.beat_index = beatIndex.beat_index(self.peaks_ECG_arg[:len(self.session)], self.fs)
+        return self.beat_index
+
+    def review_beat(self, i: int):
+        """i番目の拍を見直す(区間を移して表示し, 特徴量とラベルを表示する)
+        Args:
+            i (int): 拍の番号
+        """
+        import beatIndex
+        self.review = i
+        R = self.peaks_ECG_arg[i]
+        self.region.setRegion([self.min_val + R, self.max_val + R])
+        width = self.max_range - self.min_range
+        self.ECG_plot.setRange(xRange=[R - width / 2, R + width / 2], padding=0)
+        row = self.session.row(i)
+        if self.session.label[i] != 2:
+            self.show_values(row)
+        text = (f"Review: beat {i + 1}/{len(self.session)} at {self.review_index().time_of(i):.1f} s, "
+                f"{beatIndex.LABEL_NAMES[int(self.session.label[i])]} (SNR {row['SNR']:.2f})")
+        if self.review_selection is not None:
+            k = np.searchsorted(self.review_selection, i)
+            position = k + 1 if k < len(self.review_selection) and self.review_selection[k] == i else "-"
+            text += f"; {self.review_filter} {position}/{len(self.review_selection)}"
+        self.win.lineEdit_5.setText(text + "  [N/B: next/previous, 1/0/2: burst/no burst/error, F: filter, T: time]")
+
+    def review_step(self, direction: int):
+        """絞り込んだ拍の次(direction=-1の場合は前)の拍に移動する
+        Args:
+            direction (int): 1: 次, -1: 前
+        """
+        if self.review_selection is None:
+            self.review_selection = np.arange(len(self.session))
+        if self.review is None:
+            i = self.review_index().neighbor(self.review_selection, -1, 1)
+        else:
+            i = self.review_index().neighbor(self.review_selection, self.review, direction)
+        if i is not None:
+            self.review_beat(i)
+
+    def choose_review_filter(self):
+        """見直す拍を絞り込み(ラベル, 閾値に近いSN比), 今の拍の後の最初の拍に移動する"""
+        import beatIndex
+        current = beatIndex.REVIEW_FILTERS.index(self.review_filter)
+        name, ok = QtWidgets.QInputDialog.getItem(self.win, "Review", "Beats to review:", beatIndex.REVIEW_FILTERS,
+                                                  current, False)
+        if not ok:
+            return
+        self.review_filter = name
+        self.review_selection = beatIndex.review_selection(self.session.label, self.session.columns["SNR"], name,
+                                                           1 + self.Baseline * 0.01)
+        if len(self.review_selection) == 0:
+            self.win.lineEdit_5.setText(f"Review: no {name} beats")
+            return
+        start = -1 if self.review is None else self.review - 1
+        i = self.review_index().neighbor(self.review_selection, start, 1)
+        self.review_beat(int(self.review_selection[0]) if i is None else i)
+
+    def review_time(self):
+        """指定した時刻(秒)を含む拍に移動する"""
+        index = self.review_index()
+        end = index.time_of(len(index) - 1)
+        t, ok = QtWidgets.QInputDialog.getDouble(self.win, "Review", f"Time (0-{end:.1f} s):",
+                                                 index.time_of(self.review or 0), 0, end, 1)
+        if ok:
+            self.review_beat(index.beat_at_time(t))
+
+    def plot_clicked(self, event):
+        """見直しでは, MSNAのプロットをダブルクリックした位置を区間に含む拍に移動する
+        Args:
+            event (MouseClickEvent): クリックのイベント
+        """
+        if not event.double() or not self.can_review():
+            return
+        x = self.MSNA_plot.getViewBox().mapSceneToView(event.scenePos()).x()
+        self.review_beat(self.review_index().beat_at(x - self.min_val))
+
+    def relabel(self, label: int):
+        """見直し中の拍のラベルを書き換える
+        Args:
+            label (int): 0: バーストなし, 1: バーストあり, 2: エラー
+        """
+        i = self.review
+        if self.session.label[i] == label:
+            return
+        self.session.relabel(i, label)
+        self.relabeled(i)
+
+    def relabeled(self, i: int):
+        """ラベルを書き換えた(または書き換えを取り消した)拍の区間とバースト数だけを更新する(加算平均は後で計算し直す)
+        Args:
+            i (int): 拍の番号
+        """
+        self.redraw_overlay(i)
+        self.win.lineEdit_2.setText(str(self.session.n_bursts))
+        self.review_beat(i)
+        self.ensemble_stale()
+
+    def scoring_buttons(self):
+        """手動モードで判定中のボタンの表示"""
+        self.win.pushButton.setText("Burst(Left Key)")
+        self.win.pushButton_2.setText("No Burst(Down Key)")
+        self.win.pushButton_5.setText("Error(Right Key)")
+
+    def finish(self):
+        """全ての拍のチェックが終わったときの処理"""
+        self.win.lineEdit_5.setText("Save the file as .xlsx or .txt (if no extension is entered, .xlsx will be added automatically).")
+        self.win.pushButton.setText("Save or not")
+        self.win.pushButton_2.setText("Restart(Save to enable)")
+        self.win.pushButton_5.setText("Close(Save to enable)")
+        self.win.pushButton_2.setEnabled(False)
+        self.win.pushButton_5.setEnabled(False)
+        self.show_ensemble()
+
+    def resume(self):
+        """チェックが終わった後に取り消しやジャンプをしたとき, 判定中の表示に戻す"""
+        for item in self.burst_overlays:
+            self.MSNA_plot.removeItem(item)
+        self.burst_overlays = []
+        self.review = None
+        self.scoring_buttons()
+        self.win.lineEdit_5.setText(self.file)
+        self.win.pushButton_2.setEnabled(True)
+        self.win.pushButton_5.setEnabled(True)
+
     def autoBurst_check(self):
         """自動バーストチェック"""
         self.win.toolButton.setEnabled(False)
@@ -361,21 +1259,37 @@ class MSNAApp:
         self.win.lineEdit_5.setText("Auto Burst Check")
         self.update_region()
         self.region.setMovable(False)
+        self.region.sigRegionChanged.disconnect(self.update_region)
         self.on_xrange_changed(self.ECG_plot.getViewBox())
-        self.times = 0
-        self.count = 1
-        autoCheck_ = autoCheck.auto_check(self.F_MSNA, self.fs, self.Baseline)
-        for i in range(len(self.peaks_ECG_arg) - 1):
-            # プロットの範囲を設定
-            xRange = [self.peaks_ECG_arg[i], (self.max_range-self.min_range) + self.peaks_ECG_arg[i]]
-            self.ECG_plot.setRange(xRange=xRange, padding=0)
-            # バーストのチェック
-            self.r_lift = self.peaks_ECG_arg[i]
-            self.r_right = self.peaks_ECG_arg[i + 1]
-            Burst_result = autoCheck_.burst_SNR(self.min_val + self.r_lift, self.max_val + self.r_lift + 1)
-            self.start(Burst_result)
+        self.win.progressBar.setValue(0)
+        QtWidgets.QApplication.processEvents()
+
+        # 全ての拍を一括で解析してから，まとめて描画する
+        import msnaAnalyze
+        import scoringSession
+        with self.profiler:
+            beats = msnaAnalyze.score_beats(self.F_BP, self.F_MSNA, self.peaks_ECG_arg, self.sbp_arg, self.dbp_arg,
+                                            self.fs, self.Baseline, self.min_val, self.max_val,
+                                            msnaAnalyze.RESULT_COLUMNS + ["SNR"])
+        self.session = scoringSession.session_table(beats)
+        self.session.set_all(beats["Burst"])
+        self.count = len(self.peaks_ECG_arg)
+        self.win.progressBar.setValue(50)
+        QtWidgets.QApplication.processEvents()
+
+        with self.profiler, stageProfiler.stage("overlay", beats=len(beats)):
+            self.draw_session_overlay()
+        if len(beats):
+            self.win.lineEdit.setText(str(len(beats)))
+            self.win.lineEdit_2.setText(str(self.session.n_bursts))
+            self.show_values(self.session.row(len(beats) - 1))
+        last_R = self.peaks_ECG_arg[-2]
+        self.ECG_plot.setRange(xRange=[last_R, (self.max_range-self.min_range) + last_R], padding=0)
+        self.win.progressBar.setValue(100)
+        self.finish()
         self.win.toolButton.setEnabled(True)
         self.win.pushButton.setEnabled(True)
+        self.show_profile()
 
     def back(self):
         """戻るボタンが押されたときの処理"""
@@ -395,38 +1309,38 @@ class MSNAApp:
         file_name, _ = QtWidgets.QFileDialog.getSaveFileName(self.win, "Save File",  f"{file_path.stem}_result", "All Files (*)")
         
         if file_name:
+            # pandasと書き出しのライブラリは保存するときに読み込む
+            import msnaAnalyze
+            import resultExport
             # 拡張子がない場合は.xlsxを追加
-            if not any(file_name.endswith(ext) for ext in [".xlsx", ".txt"]):
+            if not any(file_name.endswith(ext) for ext in resultExport.EXPORT_FORMATS):
                 # 拡張子が指定されていないか、不正な場合
-                if '.' not in file_name:
+                if '.' not in Path(file_name).name:
                     file_name += ".xlsx"  # 拡張子が無ければ.xlsxを追加
                 else:
                     # 拡張子が不正な場合
-                    self.win.lineEdit_5.setText("Invalid file extension. Please use .xlsx or .txt.")
+                    self.win.lineEdit_5.setText(f"Invalid file extension. Please use {', '.join(resultExport.EXPORT_FORMATS[:-1])} or {resultExport.EXPORT_FORMATS[-1]}.")
                     self.win.lineEdit_5.setStyleSheet("color: red;")
                     return
 
-            # 拡張子が.xlsxまたは.txtの場合のみ保存
-            df = pd.DataFrame({
-                "R time": self.Rtime_output,
-                "RRI": self.RRI_output,
-                "HR": self.HR_output,
-                "DBP time": self.DBPtime_output,
-                "DBP": self.DBP_output,
-                "SBP time": self.SBPtime_output,
-                "SBP": self.SBP_output,
-                "iMSNA time": self.MSNAtime_output,
-                "iMSNA height": self.MSNAheight_output,
-                "iMSNA area": self.MSNAAera_output,
-                "Burst": self.Burst_output,
-            })
-            
-            if file_name.endswith(".xlsx"):
-                df.to_excel(file_name, index=False)
-            elif file_name.endswith(".txt"):
-                df.to_csv(file_name, sep='\t', index=False)
+            # 対応する拡張子の場合のみ保存
+            df = self.session.result(msnaAnalyze.RESULT_COLUMNS)
+
+            try:
+                with self.profiler, stageProfiler.stage("saveExcel", beats=len(df)):
+                    exporter = msnaAnalyze.save_result(df, file_name)
+            except (OSError, ValueError) as e:
+                # pyarrow, h5pyがない場合など
+                self.win.lineEdit_5.setText(str(e))
+                self.win.lineEdit_5.setStyleSheet("color: red;")
+                return
+            # 結果を保存したのでジャーナルは不要
+            if self.session.journal is not None:
+                self.session.journal.remove()
+                self.session.journal = None
 
-            self.win.lineEdit_5.setText(f"Saved to {file_name}")
+            self.win.lineEdit_5.setText(f"Saved to {file_name} ({exporter.report()})")
+            self.show_profile()
         else:
             self.win.lineEdit_5.setText("Save canceled")
 
@@ -459,11 +1373,41 @@ class MSNAApp:
         else:
             self.start(2)
 
-    def run(self):
-        """アプリケーションを実行"""
+    def run(self, startup: dict | None = None):
+        """アプリケーションを実行
+
+        Args:
+            startup (dict | None): 起動時間の計測モード(--startup-time)で, ここまでの段階 -> STARTUPからの時間(秒).
+                ウィンドウが表示されるまでの時間を表示して終了する
+        """
         self.win.show()
+        if startup is not None:
+            # イベントループが始まり, 最初の描画が終わった時点で計測する
+            QtCore.QTimer.singleShot(0, lambda: self.report_startup(startup))
         self.app.exec_()
+        # 実行中のジョブを止め, スレッドが終わるのを待つ
+        for kind in list(self.jobs):
+            self.cancel_job(kind)
+        for job in list(self.running):
+            job.wait()
+
+    def report_startup(self, startup: dict):
+        """起動時間の内訳を標準エラーに出力して終了する
+
+        Args:
+            startup (dict): 段階 -> STARTUPからの時間(秒)
+        """
+        startup["window shown"] = time.perf_counter() - STARTUP
+        previous = 0.0
+        for stage, t in startup.items():
+            print(f"{stage:>14}: {t:6.3f} s (+{t - previous:.3f} s)", file=sys.stderr)
+            previous = t
+        heavy = [name for name in ("scipy", "pandas", "openpyxl") if name in sys.modules]
+        print(f"loaded at startup: {', '.join(heavy) or 'none of scipy, pandas, openpyxl'}", file=sys.stderr)
+        self.app.quit()
 
 if __name__ == "__main__":
+    startup = {"imports": time.perf_counter() - STARTUP}
     msna_app = MSNAApp()
-    msna_app.run()
+    startup["window built"] = time.perf_counter() - STARTUP
+    msna_app.run(startup if "--startup-time" in sys.argv else None)
@@ -0,0 +1,513 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'main.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_Form(object):
+    def setupUi(self, Form):
+        Form.setObjectName("Form")
+        Form.setWindowModality(QtCore.Qt.NonModal)
+        Form.setEnabled(True)
+        Form.resize(1100, 700)
+        Form.setMinimumSize(QtCore.QSize(1100, 700))
+        Form.setSizeIncrement(QtCore.QSize(0, 0))
+        Form.setBaseSize(QtCore.QSize(0, 0))
+        font = QtGui.QFont()
+        font.setPointSize(9)
+        Form.setFont(font)
+        self.verticalLayout = QtWidgets.QVBoxLayout(Form)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.gridLayout_4 = QtWidgets.QGridLayout()
+        self.gridLayout_4.setObjectName("gridLayout_4")
+        self.graphicsView_2 = GraphicsLayoutWidget(Form)
+        self.graphicsView_2.setMinimumSize(QtCore.QSize(0, 100))
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setBold(False)
+        font.setWeight(50)
+        self.graphicsView_2.setFont(font)
+        self.graphicsView_2.setObjectName("graphicsView_2")
+        self.gridLayout_4.addWidget(self.graphicsView_2, 3, 0, 1, 1)
+        self.graphicsView = GraphicsLayoutWidget(Form)
+        self.graphicsView.setMinimumSize(QtCore.QSize(800, 100))
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setBold(False)
+        font.setWeight(50)
+        self.graphicsView.setFont(font)
+        self.graphicsView.setObjectName("graphicsView")
+        self.gridLayout_4.addWidget(self.graphicsView, 1, 0, 1, 1)
+        self.graphicsView_3 = GraphicsLayoutWidget(Form)
+        self.graphicsView_3.setMinimumSize(QtCore.QSize(0, 100))
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setBold(False)
+        font.setWeight(50)
+        self.graphicsView_3.setFont(font)
+        self.graphicsView_3.setObjectName("graphicsView_3")
+        self.gridLayout_4.addWidget(self.graphicsView_3, 5, 0, 1, 1)
+        self.label_14 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(15)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_14.setFont(font)
+        self.label_14.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_14.setObjectName("label_14")
+        self.gridLayout_4.addWidget(self.label_14, 2, 0, 1, 1)
+        self.label_2 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(15)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_2.setFont(font)
+        self.label_2.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_2.setObjectName("label_2")
+        self.gridLayout_4.addWidget(self.label_2, 0, 0, 1, 1)
+        self.label_15 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(15)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_15.setFont(font)
+        self.label_15.setLayoutDirection(QtCore.Qt.LeftToRight)
+        self.label_15.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_15.setObjectName("label_15")
+        self.gridLayout_4.addWidget(self.label_15, 4, 0, 1, 1)
+        self.verticalLayout.addLayout(self.gridLayout_4)
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.toolButton = QtWidgets.QToolButton(Form)
+        self.toolButton.setEnabled(True)
+        self.toolButton.setMinimumSize(QtCore.QSize(300, 0))
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setItalic(False)
+        font.setWeight(50)
+        font.setStrikeOut(False)
+        font.setKerning(True)
+        self.toolButton.setFont(font)
+        self.toolButton.setObjectName("toolButton")
+        self.horizontalLayout.addWidget(self.toolButton)
+        self.lineEdit_5 = QtWidgets.QLineEdit(Form)
+        self.lineEdit_5.setEnabled(True)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit_5.setFont(font)
+        self.lineEdit_5.setReadOnly(True)
+        self.lineEdit_5.setObjectName("lineEdit_5")
+        self.horizontalLayout.addWidget(self.lineEdit_5)
+        self.verticalLayout.addLayout(self.horizontalLayout)
+        self.gridLayout = QtWidgets.QGridLayout()
+        self.gridLayout.setObjectName("gridLayout")
+        self.label_5 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_5.setFont(font)
+        self.label_5.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_5.setObjectName("label_5")
+        self.gridLayout.addWidget(self.label_5, 0, 3, 1, 1)
+        self.label = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label.setFont(font)
+        self.label.setStyleSheet("")
+        self.label.setAlignment(QtCore.Qt.AlignCenter)
+        self.label.setObjectName("label")
+        self.gridLayout.addWidget(self.label, 0, 0, 1, 1)
+        self.label_4 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_4.setFont(font)
+        self.label_4.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_4.setObjectName("label_4")
+        self.gridLayout.addWidget(self.label_4, 0, 2, 1, 1)
+        self.doubleSpinBox_4 = QtWidgets.QDoubleSpinBox(Form)
+        self.doubleSpinBox_4.setEnabled(False)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.doubleSpinBox_4.setFont(font)
+        self.doubleSpinBox_4.setLayoutDirection(QtCore.Qt.LeftToRight)
+        self.doubleSpinBox_4.setAlignment(QtCore.Qt.AlignCenter)
+        self.doubleSpinBox_4.setDecimals(7)
+        self.doubleSpinBox_4.setMinimum(0.0001)
+        self.doubleSpinBox_4.setMaximum(100.0)
+        self.doubleSpinBox_4.setSingleStep(1.0)
+        self.doubleSpinBox_4.setProperty("value", 1.0)
+        self.doubleSpinBox_4.setObjectName("doubleSpinBox_4")
+        self.gridLayout.addWidget(self.doubleSpinBox_4, 1, 3, 1, 1)
+        self.spinBox = QtWidgets.QSpinBox(Form)
+        self.spinBox.setEnabled(False)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.spinBox.setFont(font)
+        self.spinBox.setAlignment(QtCore.Qt.AlignCenter)
+        self.spinBox.setMinimum(56)
+        self.spinBox.setMaximum(10000)
+        self.spinBox.setProperty("value", 2000)
+        self.spinBox.setObjectName("spinBox")
+        self.gridLayout.addWidget(self.spinBox, 1, 0, 1, 1)
+        self.label_3 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_3.setFont(font)
+        self.label_3.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_3.setObjectName("label_3")
+        self.gridLayout.addWidget(self.label_3, 0, 1, 1, 1)
+        self.doubleSpinBox_2 = QtWidgets.QDoubleSpinBox(Form)
+        self.doubleSpinBox_2.setEnabled(False)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.doubleSpinBox_2.setFont(font)
+        self.doubleSpinBox_2.setAlignment(QtCore.Qt.AlignCenter)
+        self.doubleSpinBox_2.setDecimals(2)
+        self.doubleSpinBox_2.setMaximum(100.0)
+        self.doubleSpinBox_2.setObjectName("doubleSpinBox_2")
+        self.gridLayout.addWidget(self.doubleSpinBox_2, 1, 1, 1, 1)
+        self.doubleSpinBox_3 = QtWidgets.QDoubleSpinBox(Form)
+        self.doubleSpinBox_3.setEnabled(False)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.doubleSpinBox_3.setFont(font)
+        self.doubleSpinBox_3.setAlignment(QtCore.Qt.AlignCenter)
+        self.doubleSpinBox_3.setDecimals(1)
+        self.doubleSpinBox_3.setMinimum(10.0)
+        self.doubleSpinBox_3.setMaximum(100.0)
+        self.doubleSpinBox_3.setObjectName("doubleSpinBox_3")
+        self.gridLayout.addWidget(self.doubleSpinBox_3, 1, 2, 1, 1)
+        self.pushButton_3 = QtWidgets.QPushButton(Form)
+        self.pushButton_3.setEnabled(False)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(20)
+        self.pushButton_3.setFont(font)
+        self.pushButton_3.setStyleSheet("")
+        self.pushButton_3.setObjectName("pushButton_3")
+        self.gridLayout.addWidget(self.pushButton_3, 0, 4, 2, 1)
+        self.verticalLayout.addLayout(self.gridLayout)
+        self.gridLayout_2 = QtWidgets.QGridLayout()
+        self.gridLayout_2.setObjectName("gridLayout_2")
+        self.lineEdit_6 = QtWidgets.QLineEdit(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit_6.setFont(font)
+        self.lineEdit_6.setAlignment(QtCore.Qt.AlignCenter)
+        self.lineEdit_6.setReadOnly(True)
+        self.lineEdit_6.setObjectName("lineEdit_6")
+        self.gridLayout_2.addWidget(self.lineEdit_6, 4, 4, 1, 1)
+        self.label_12 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_12.setFont(font)
+        self.label_12.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_12.setObjectName("label_12")
+        self.gridLayout_2.addWidget(self.label_12, 0, 6, 1, 1)
+        self.lineEdit_8 = QtWidgets.QLineEdit(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit_8.setFont(font)
+        self.lineEdit_8.setAlignment(QtCore.Qt.AlignCenter)
+        self.lineEdit_8.setReadOnly(True)
+        self.lineEdit_8.setObjectName("lineEdit_8")
+        self.gridLayout_2.addWidget(self.lineEdit_8, 4, 6, 1, 1)
+        self.label_7 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_7.setFont(font)
+        self.label_7.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_7.setObjectName("label_7")
+        self.gridLayout_2.addWidget(self.label_7, 0, 3, 1, 1)
+        self.label_6 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_6.setFont(font)
+        self.label_6.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_6.setObjectName("label_6")
+        self.gridLayout_2.addWidget(self.label_6, 0, 2, 1, 1)
+        self.label_9 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_9.setFont(font)
+        self.label_9.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_9.setObjectName("label_9")
+        self.gridLayout_2.addWidget(self.label_9, 0, 8, 1, 1)
+        self.lineEdit_3 = QtWidgets.QLineEdit(Form)
+        self.lineEdit_3.setSizeIncrement(QtCore.QSize(0, 0))
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit_3.setFont(font)
+        self.lineEdit_3.setAlignment(QtCore.Qt.AlignCenter)
+        self.lineEdit_3.setReadOnly(True)
+        self.lineEdit_3.setObjectName("lineEdit_3")
+        self.gridLayout_2.addWidget(self.lineEdit_3, 4, 7, 1, 1)
+        self.lineEdit_4 = QtWidgets.QLineEdit(Form)
+        self.lineEdit_4.setMinimumSize(QtCore.QSize(0, 0))
+        self.lineEdit_4.setSizeIncrement(QtCore.QSize(0, 0))
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit_4.setFont(font)
+        self.lineEdit_4.setAlignment(QtCore.Qt.AlignCenter)
+        self.lineEdit_4.setReadOnly(True)
+        self.lineEdit_4.setObjectName("lineEdit_4")
+        self.gridLayout_2.addWidget(self.lineEdit_4, 4, 8, 1, 1)
+        self.lineEdit_2 = QtWidgets.QLineEdit(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit_2.setFont(font)
+        self.lineEdit_2.setAlignment(QtCore.Qt.AlignCenter)
+        self.lineEdit_2.setReadOnly(True)
+        self.lineEdit_2.setObjectName("lineEdit_2")
+        self.gridLayout_2.addWidget(self.lineEdit_2, 4, 3, 1, 1)
+        self.label_8 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_8.setFont(font)
+        self.label_8.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_8.setObjectName("label_8")
+        self.gridLayout_2.addWidget(self.label_8, 0, 7, 1, 1)
+        self.label_11 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_11.setFont(font)
+        self.label_11.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_11.setObjectName("label_11")
+        self.gridLayout_2.addWidget(self.label_11, 0, 5, 1, 1)
+        self.label_10 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_10.setFont(font)
+        self.label_10.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_10.setObjectName("label_10")
+        self.gridLayout_2.addWidget(self.label_10, 0, 4, 1, 1)
+        self.lineEdit_7 = QtWidgets.QLineEdit(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit_7.setFont(font)
+        self.lineEdit_7.setAlignment(QtCore.Qt.AlignCenter)
+        self.lineEdit_7.setReadOnly(True)
+        self.lineEdit_7.setObjectName("lineEdit_7")
+        self.gridLayout_2.addWidget(self.lineEdit_7, 4, 5, 1, 1)
+        self.lineEdit = QtWidgets.QLineEdit(Form)
+        self.lineEdit.setEnabled(True)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit.setFont(font)
+        self.lineEdit.setAlignment(QtCore.Qt.AlignCenter)
+        self.lineEdit.setReadOnly(True)
+        self.lineEdit.setObjectName("lineEdit")
+        self.gridLayout_2.addWidget(self.lineEdit, 4, 2, 1, 1)
+        self.label_13 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_13.setFont(font)
+        self.label_13.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_13.setObjectName("label_13")
+        self.gridLayout_2.addWidget(self.label_13, 0, 0, 1, 1)
+        self.lineEdit_9 = QtWidgets.QLineEdit(Form)
+        self.lineEdit_9.setEnabled(True)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit_9.setFont(font)
+        self.lineEdit_9.setAlignment(QtCore.Qt.AlignCenter)
+        self.lineEdit_9.setReadOnly(True)
+        self.lineEdit_9.setObjectName("lineEdit_9")
+        self.gridLayout_2.addWidget(self.lineEdit_9, 4, 0, 1, 1)
+        self.lineEdit_10 = QtWidgets.QLineEdit(Form)
+        self.lineEdit_10.setEnabled(True)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.lineEdit_10.setFont(font)
+        self.lineEdit_10.setAlignment(QtCore.Qt.AlignCenter)
+        self.lineEdit_10.setReadOnly(True)
+        self.lineEdit_10.setObjectName("lineEdit_10")
+        self.gridLayout_2.addWidget(self.lineEdit_10, 4, 1, 1, 1)
+        self.label_16 = QtWidgets.QLabel(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.label_16.setFont(font)
+        self.label_16.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_16.setObjectName("label_16")
+        self.gridLayout_2.addWidget(self.label_16, 0, 1, 1, 1)
+        self.verticalLayout.addLayout(self.gridLayout_2)
+        self.horizontalLayout_2 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_2.setObjectName("horizontalLayout_2")
+        self.progressBar = QtWidgets.QProgressBar(Form)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(12)
+        font.setBold(False)
+        font.setWeight(50)
+        self.progressBar.setFont(font)
+        self.progressBar.setProperty("value", 0)
+        self.progressBar.setObjectName("progressBar")
+        self.horizontalLayout_2.addWidget(self.progressBar)
+        self.pushButton_4 = QtWidgets.QPushButton(Form)
+        self.pushButton_4.setEnabled(False)
+        self.pushButton_4.setMinimumSize(QtCore.QSize(150, 0))
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(14)
+        font.setBold(False)
+        font.setWeight(50)
+        self.pushButton_4.setFont(font)
+        self.pushButton_4.setObjectName("pushButton_4")
+        self.horizontalLayout_2.addWidget(self.pushButton_4)
+        self.verticalLayout.addLayout(self.horizontalLayout_2)
+        self.horizontalLayout_3 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_3.setObjectName("horizontalLayout_3")
+        self.pushButton = QtWidgets.QPushButton(Form)
+        self.pushButton.setEnabled(False)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(20)
+        font.setBold(False)
+        font.setWeight(50)
+        self.pushButton.setFont(font)
+        self.pushButton.setObjectName("pushButton")
+        self.horizontalLayout_3.addWidget(self.pushButton)
+        self.pushButton_2 = QtWidgets.QPushButton(Form)
+        self.pushButton_2.setEnabled(False)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(20)
+        font.setBold(False)
+        font.setWeight(50)
+        self.pushButton_2.setFont(font)
+        self.pushButton_2.setObjectName("pushButton_2")
+        self.horizontalLayout_3.addWidget(self.pushButton_2)
+        self.pushButton_5 = QtWidgets.QPushButton(Form)
+        self.pushButton_5.setEnabled(False)
+        font = QtGui.QFont()
+        font.setFamily("HGP創英角ｺﾞｼｯｸUB")
+        font.setPointSize(20)
+        font.setBold(False)
+        font.setWeight(50)
+        self.pushButton_5.setFont(font)
+        self.pushButton_5.setObjectName("pushButton_5")
+        self.horizontalLayout_3.addWidget(self.pushButton_5)
+        self.verticalLayout.addLayout(self.horizontalLayout_3)
+
+        self.retranslateUi(Form)
+        QtCore.QMetaObject.connectSlotsByName(Form)
+
+    def retranslateUi(self, Form):
+        _translate = QtCore.QCoreApplication.translate
+        Form.setWindowTitle(_translate("Form", "Form"))
+        self.label_14.setText(_translate("Form", "BP"))
+        self.label_2.setText(_translate("Form", "ECG"))
+        self.label_15.setText(_translate("Form", "iMSNA"))
+        self.toolButton.setText(_translate("Form", "Select File"))
+        self.lineEdit_5.setText(_translate("Form", "Only the .txt file of the 3-column data (ECG, BP, iMSNA)."))
+        self.label_5.setText(_translate("Form", "MSNA Cal"))
+        self.label.setText(_translate("Form", "Sample frequency"))
+        self.label_4.setText(_translate("Form", "Baseline％"))
+        self.label_3.setText(_translate("Form", "ECGTrig"))
+        self.pushButton_3.setText(_translate("Form", "Confirmed"))
+        self.label_12.setText(_translate("Form", "SBP"))
+        self.label_7.setText(_translate("Form", "Burst times"))
+        self.label_6.setText(_translate("Form", "R times"))
+        self.label_9.setText(_translate("Form", "MSNA Aera"))
+        self.label_8.setText(_translate("Form", "MSNA Height"))
+        self.label_11.setText(_translate("Form", "DBP"))
+        self.label_10.setText(_translate("Form", "HR"))
+        self.label_13.setText(_translate("Form", "Cur left"))
+        self.label_16.setText(_translate("Form", "Cur right"))
+        self.pushButton_4.setText(_translate("Form", "Auto"))
+        self.pushButton.setText(_translate("Form", "Start"))
+        self.pushButton_2.setText(_translate("Form", "Back"))
+        self.pushButton_5.setText(_translate("Form", "Exit"))
+from pyqtgraph import GraphicsLayoutWidget
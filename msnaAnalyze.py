@@ -0,0 +1,377 @@
+"""
+msna-analyze
+GUIを使わずにECG、BP、iMSNAの記録を解析するためのコマンドラインツールです。
+
+使い方:
+python msnaAnalyze.py recording1.txt recording2.txt --fs 2000 --baseline 10 --cal 1.0 -o results
+python msnaAnalyze.py recording.edf --channels ECG "Finger BP" MSNA --start 600 --stop 4200
+
+MSNAAppの自動モードと同じフィルタ、ピーク検出、バースト判定を行い、
+「保存」と同じ11列の結果表を{ファイル名}_result.xlsx(または.txt, .csv, .parquet, .feather, .h5)として出力します。
+.edf, .h5, 生のバイナリ(.bin, .dat, .rawと形式を書いた.json)は必要なチャンネルと範囲だけを読み込み、
+サンプリング周波数はファイルのメタデータから取ります(ない場合は--fs)。
+--segmentsを付けると各拍のバースト判定区間のMSNAの波形も出力します。
+--profileを付けると段階ごとの時間、スループット、メモリを{ファイル名}_result_profile.jsonに、
+--cprofileを付けるとcProfileの結果を{ファイル名}_result.profに出力します。
+"""
+
+import argparse
+import contextlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import autoCheck
+import beatFeatures
+import dataCache
+import dataProcessing
+import resultExport
+import signalReaders
+import stageProfiler
+
+# 結果表の列（MSNAApp.saveExcelと同じ順序）
+RESULT_COLUMNS = [
+    "R time",
+    "RRI",
+    "HR",
+    "DBP time",
+    "DBP",
+    "SBP time",
+    "SBP",
+    "iMSNA time",
+    "iMSNA height",
+    "iMSNA area",
+    "Burst",
+]
+# --formatの選択肢
+EXPORT_CHOICES = [ext[1:] for ext in resultExport.EXPORT_FORMATS]
+
+
+def analyze_recording(file: str, fs: int = 2000, baseline: float = 10.0, iMSNA_cal: float = 1.0,
+                      region: tuple[float, float] = (0.5, 1.5), dtype: type = np.float64,
+                      verbose: bool = False, cache: dataCache.data_cache | None = None,
+                      mmap: bool = False, channels: list | None = None, start: float = 0.0,
+                      stop: float | None = None) -> pd.DataFrame:
+    """記録ファイルを自動モードで解析し，結果表を返す
+
+    Args:
+        file (str): 記録ファイル(.txt, .edf, .h5, 生のバイナリ)
+        fs (int): サンプリング周波数(ファイルのメタデータにある場合はそちらを使う)
+        baseline (float): ベースライン(%)
+        iMSNA_cal (float): MSNAの補正値
+        region (tuple[float, float]): R波からのバースト判定区間(秒)
+        dtype (type): 読み込むデータの型(np.float64 | np.float32)
+        verbose (bool): 読み込みの速度を表示する
+        cache (dataCache.data_cache | None): 読み込みと処理結果のキャッシュ(Noneの場合は使わない)
+        mmap (bool): 信号をキャッシュ上のメモリマップとして扱い, フィルタとピーク検出を分割して行う(cacheが必要)
+        channels (list | None): ECG, BP, iMSNAのチャンネル(名前または番号, Noneの場合は名前から探す)
+        start (float): 読み込む範囲の始点(秒)
+        stop (float | None): 読み込む範囲の終点(秒, Noneの場合は最後まで)
+
+    Returns:
+        pd.DataFrame: 11列の結果表(時刻は読み込んだ範囲の始点から)
+    """
+    fs = signalReaders.recording_fs(file, fs, channels)
+    F_BP, F_MSNA, peaks_ECG_arg, sbp_arg, dbp_arg = load_recording(file, fs, iMSNA_cal, dtype, verbose, cache, mmap,
+                                                                   channels, start, stop)
+    min_val, max_val = region_samples(region, fs)
+    return score_beats(F_BP, F_MSNA, peaks_ECG_arg, sbp_arg, dbp_arg, fs, baseline, min_val, max_val)
+
+
+def load_recording(file: str, fs: int = 2000, iMSNA_cal: float = 1.0, dtype: type = np.float64,
+                   verbose: bool = False, cache: dataCache.data_cache | None = None, mmap: bool = False,
+                   channels: list | None = None, start: float = 0.0, stop: float | None = None) -> tuple:
+    """記録ファイルを読み込み, フィルタとピーク検出を行う(バースト判定の前まで)
+
+    Args:
+        file (str): 記録ファイル(.txt, .edf, .h5, 生のバイナリ)
+        fs (int): サンプリング周波数(ファイルのメタデータにある場合はそちらを使う)
+        iMSNA_cal (float): MSNAの補正値
+        dtype (type): 読み込むデータの型(np.float64 | np.float32)
+        verbose (bool): 読み込みの速度を表示する
+        cache (dataCache.data_cache | None): 読み込みと処理結果のキャッシュ(Noneの場合は使わない)
+        mmap (bool): 信号をキャッシュ上のメモリマップとして扱う(cacheが必要)
+        channels (list | None): ECG, BP, iMSNAのチャンネル
+        start (float): 読み込む範囲の始点(秒)
+        stop (float | None): 読み込む範囲の終点(秒)
+
+    Returns:
+        np.ndarray: フィルタをかけたBPデータ
+        np.ndarray: 補正したMSNAデータ
+        np.ndarray: ECGのピーク
+        list: BPのsystolicピーク
+        list: BPのdiastolicピーク
+    """
+    if mmap and cache is None:
+        raise ValueError("mmap requires a cache directory")
+    with stageProfiler.stage("load") as counts:
+        if cache is None:
+            ECG, BP, iMSNA, fs, report = signalReaders.read_recording(file, fs, channels, start, stop, dtype)
+        else:
+            ECG, BP, iMSNA, fs = cache.read_signals(file, fs, channels, start, stop, dtype, mmap)
+            report = cache.last_report
+        counts["samples"] = len(ECG)
+    dataSet = dataProcessing.data_set(ECG, BP, iMSNA, fs)
+    with stageProfiler.stage("processing", samples=len(ECG)):
+        if cache is None:
+            F_ECG, F_BP, F_iMSNA, peaks_ECG_arg, sbp_arg, dbp_arg = dataSet.read_data()
+        else:
+            F_ECG, F_BP, F_iMSNA, peaks_ECG_arg, sbp_arg, dbp_arg = cache.read_data(
+                file, dataSet, mmap, signalReaders.source_settings(channels, start, stop))
+    if verbose:
+        print(f"{file}: {report}", file=sys.stderr)
+    # 補正値が1の場合はコピーしない(メモリマップのまま使う)
+    F_MSNA = F_iMSNA if iMSNA_cal == 1 else np.asarray(F_iMSNA) / iMSNA_cal
+    return F_BP, F_MSNA, peaks_ECG_arg, sbp_arg, dbp_arg
+
+
+def region_samples(region: tuple[float, float], fs: int) -> tuple[int, int]:
+    """バースト判定区間(秒)を, GUIの初期区間と同じくサンプル単位に丸める
+
+    Args:
+        region (tuple[float, float]): R波からのバースト判定区間(秒)
+        fs (int): サンプリング周波数
+
+    Returns:
+        int: R波からの区間の始点(サンプル)
+        int: R波からの区間の終点(サンプル)
+    """
+    return round(region[0] * fs), round(region[1] * fs)
+
+
+def score_beats(F_BP: np.ndarray, F_MSNA: np.ndarray, peaks_ECG_arg: np.ndarray, sbp_arg: list, dbp_arg: list,
+                fs: int, baseline: float, min_val: int, max_val: int, columns: list | None = None) -> pd.DataFrame:
+    """全ての拍を一括で自動判定し，結果表を作成する
+
+    Args:
+        F_BP (np.ndarray): フィルタをかけたBPデータ
+        F_MSNA (np.ndarray): 補正したMSNAデータ
+        peaks_ECG_arg (np.ndarray): ECGのピーク
+        sbp_arg (list): BPのsystolicピーク
+        dbp_arg (list): BPのdiastolicピーク
+        fs (int): サンプリング周波数
+        baseline (float): ベースライン(%)
+        min_val (int): R波からの区間の始点(サンプル)
+        max_val (int): R波からの区間の終点(サンプル)
+        columns (list | None): 返す列(Noneの場合はRESULT_COLUMNS, GUIの見直しでは"SNR"も使う)
+
+    Returns:
+        pd.DataFrame: 11列の結果表
+    """
+    with stageProfiler.stage("scoring", beats=max(len(peaks_ECG_arg) - 2, 0)):
+        beats = beatFeatures.beat_table(F_BP, F_MSNA, peaks_ECG_arg, sbp_arg, dbp_arg, fs, min_val, max_val)
+        beats["Burst"] = autoCheck.auto_check(F_MSNA, fs, baseline).is_burst(beats["SNR"])
+        return beats[RESULT_COLUMNS if columns is None else columns]
+
+
+def save_result(df: pd.DataFrame, file_name: str, F_MSNA: np.ndarray | None = None,
+                width: int | None = None) -> resultExport.result_exporter:
+    """結果表を拡張子に応じた形式(.xlsx, .txt(タブ区切り), .csv, .parquet, .feather, .h5)で保存
+
+    Args:
+        df (pd.DataFrame): 結果表
+        file_name (str): 保存先のファイル名
+        F_MSNA (np.ndarray | None): 補正したMSNAデータ(指定すると各拍の波形も保存する)
+        width (int | None): 波形のサンプル数
+
+    Returns:
+        resultExport.result_exporter: 書き出しの行数と速度(report)
+    """
+    with stageProfiler.stage("export", beats=len(df)):
+        exporter = resultExport.result_exporter(file_name)
+        exporter.write(df, F_MSNA, width)
+        return exporter
+
+
+def summarize(df: pd.DataFrame) -> dict:
+    """結果表を1行の要約にする
+
+    Args:
+        df (pd.DataFrame): 11列の結果表
+
+    Returns:
+        dict: 拍数, バースト数, バースト頻度(/分), バースト発生率(/100拍), 平均HR, SBP, DBP
+    """
+    beats = len(df)
+    bursts = int(df["Burst"].sum())
+    minutes = df["RRI"].sum() / 60
+    return {
+        "beats": beats,
+        "bursts": bursts,
+        "burst frequency (/min)": bursts / minutes if minutes else float("nan"),
+        "burst incidence (/100 beats)": bursts / beats * 100 if beats else float("nan"),
+        "mean HR": df["HR"].mean(),
+        "mean SBP": df["SBP"].mean(),
+        "mean DBP": df["DBP"].mean(),
+    }
+
+
+def add_analysis_arguments(parser: argparse.ArgumentParser):
+    """解析の設定とキャッシュの引数を追加する(msna-analyzeとバッチ処理で共通)
+
+    Args:
+        parser (argparse.ArgumentParser): 追加先
+    """
+    parser.add_argument("--fs", type=int, default=2000, help="sample frequency (Hz) of files without it in their metadata")
+    parser.add_argument("--channels", nargs=3, default=None, metavar=("ECG", "BP", "iMSNA"),
+                        help="channel names or 0-based indices to use (default: matched by name, else the first three)")
+    parser.add_argument("--start", type=float, default=0.0, help="read from this time (s)")
+    parser.add_argument("--stop", type=float, default=None, help="read up to this time (s)")
+    parser.add_argument("--baseline", type=float, default=10.0, help="burst SNR baseline (%%)")
+    parser.add_argument("--cal", type=float, default=1.0, help="MSNA calibration")
+    parser.add_argument("--region", type=float, nargs=2, default=(0.5, 1.5), metavar=("LEFT", "RIGHT"),
+                        help="burst window after each R peak (s)")
+    parser.add_argument("--float32", action="store_true", help="load signals as float32 to halve memory")
+    parser.add_argument("--mmap", action="store_true",
+                        help="keep signals as memory-mapped files in the cache and filter in chunks (for very long recordings)")
+    parser.add_argument("--cache-dir", default=None, help="cache directory (default: $MSNA_CACHE_DIR or ~/.cache/MSNAAnalyzer)")
+    parser.add_argument("--cache-size", type=float, default=None,
+                        help="maximum cache size (GB, default: MSNA_CACHE_SIZE, else a quarter of the free disk space "
+                             "and at least 2 GB)")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the cache")
+
+
+def analysis_options(args: argparse.Namespace) -> dict:
+    """add_analysis_argumentsの引数をanalyze_recordingのキーワード引数にする(cacheを除く)
+
+    Args:
+        args (argparse.Namespace): 解析した引数
+
+    Returns:
+        dict: キーワード引数
+    """
+    return {
+        "fs": args.fs,
+        "baseline": args.baseline,
+        "iMSNA_cal": args.cal,
+        "region": tuple(args.region),
+        "dtype": np.float32 if args.float32 else np.float64,
+        "mmap": args.mmap,
+        "channels": args.channels,
+        "start": args.start,
+        "stop": args.stop,
+    }
+
+
+def recording_options(file: str, options: dict) -> dict:
+    """analysis_optionsのfsを, 記録ファイルのメタデータのサンプリング周波数で置き換える(ない場合はそのまま)
+
+    Args:
+        file (str): 記録ファイル
+        options (dict): analysis_optionsの戻り値
+
+    Returns:
+        dict: キーワード引数
+    """
+    return dict(options, fs=signalReaders.recording_fs(file, options["fs"], options["channels"]))
+
+
+def cache_bytes(args: argparse.Namespace) -> int | None:
+    """--cache-sizeをバイトにする
+
+    Args:
+        args (argparse.Namespace): 解析した引数
+
+    Returns:
+        int | None: キャッシュの上限(指定がない場合はNoneでdata_cacheが決める)
+    """
+    return None if args.cache_size is None else int(args.cache_size * 1024**3)
+
+
+def make_cache(args: argparse.Namespace) -> dataCache.data_cache | None:
+    """add_analysis_argumentsの引数からキャッシュを作る
+
+    Args:
+        args (argparse.Namespace): 解析した引数
+
+    Returns:
+        dataCache.data_cache | None: キャッシュ(--no-cacheの場合はNone)
+    """
+    return None if args.no_cache else dataCache.data_cache(args.cache_dir, cache_bytes(args))
+
+
+def main(argv: list | None = None) -> int:
+    """コマンドラインから複数の記録を解析する
+
+    Args:
+        argv (list | None): コマンドライン引数
+
+    Returns:
+        int: 終了コード(失敗したファイルがあれば1)
+    """
+    parser = argparse.ArgumentParser(prog="msna-analyze", description="Analyze ECG/BP/iMSNA recordings without the GUI.")
+    parser.add_argument("files", nargs="+", help="recordings (3-column .txt, .edf, .h5/.hdf5, or .bin/.dat/.raw with a .json)")
+    add_analysis_arguments(parser)
+    parser.add_argument("-v", "--verbose", action="store_true", help="report load and export throughput")
+    parser.add_argument("--format", choices=EXPORT_CHOICES, default="xlsx", help="output format")
+    parser.add_argument("--segments", action="store_true",
+                        help="also export the filtered MSNA waveform of each burst window "
+                             "(embedded in parquet/feather/h5, <name>_result_segments.npy otherwise)")
+    parser.add_argument("-o", "--output-dir", default=None, help="output directory (default: next to each input)")
+    parser.add_argument("--profile", action="store_true",
+                        help="write per-stage durations, throughput and memory to <name>_result_profile.json")
+    parser.add_argument("--cprofile", action="store_true", help="write a cProfile dump of each analysis to <name>_result.prof")
+    args = parser.parse_args(argv)
+    if args.mmap and args.no_cache:
+        parser.error("--mmap cannot be used with --no-cache")
+
+    cache = make_cache(args)
+    failed = 0
+    for file in args.files:
+        file_path = Path(file)
+        out_dir = Path(args.output_dir) if args.output_dir else file_path.parent
+        out_dir.mkdir(parents=True, exist_ok=True)
+        file_name = str(out_dir / f"{file_path.stem}_result.{args.format}")
+        profiler = stageProfiler.stage_profiler()
+        try:
+            with (profiler if args.profile else contextlib.nullcontext(),
+                  stageProfiler.cprofile(str(out_dir / f"{file_path.stem}_result.prof")) if args.cprofile
+                  else contextlib.nullcontext()):
+                df, exporter = _analyze_and_save(file, file_name, args, cache)
+            if args.profile:
+                profiler.save(str(out_dir / f"{file_path.stem}_result_profile.json"), file=str(file),
+                              options={k: str(v) for k, v in analysis_options(args).items()})
+                if args.verbose:
+                    print(profiler.text(), file=sys.stderr)
+            if args.verbose:
+                print(f"{file_name}: {exporter.report()}", file=sys.stderr)
+        except (OSError, ValueError, IndexError) as e:
+            print(f"{file}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"{file}: {len(df)} beats, {int(df['Burst'].sum())} bursts -> {file_name}")
+    if args.verbose:
+        print(f"filters: {dataProcessing.data_set.filters.report()}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _analyze_and_save(file: str, file_name: str, args: argparse.Namespace, cache: dataCache.data_cache | None) -> tuple:
+    """1つの記録を解析して結果表を保存する
+
+    Args:
+        file (str): 記録ファイル
+        file_name (str): 結果表の保存先
+        args (argparse.Namespace): 解析した引数
+        cache (dataCache.data_cache | None): キャッシュ
+
+    Returns:
+        pd.DataFrame: 結果表
+        resultExport.result_exporter: 書き出しの行数と速度
+    """
+    if args.segments:
+        options = recording_options(file, analysis_options(args))
+        F_BP, F_MSNA, peaks_ECG_arg, sbp_arg, dbp_arg = load_recording(
+            file, options["fs"], options["iMSNA_cal"], options["dtype"], args.verbose, cache, options["mmap"],
+            options["channels"], options["start"], options["stop"])
+        min_val, max_val = region_samples(options["region"], options["fs"])
+        df = score_beats(F_BP, F_MSNA, peaks_ECG_arg, sbp_arg, dbp_arg, options["fs"], options["baseline"],
+                         min_val, max_val)
+        return df, save_result(df, file_name, F_MSNA, max_val - min_val + 1)
+    df = analyze_recording(file, verbose=args.verbose, cache=cache, **analysis_options(args))
+    return df, save_result(df, file_name)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+msna-sweep
+ベースライン(%)とバースト判定区間を変えたときのバースト発生率を、記録ごとに一度の読み込みで求めるツールです。
+
+使い方:
+python paramSweep.py recording.txt study_folder --baseline-range 0 50 1 --regions 0.5:1.5 0.4:1.4 -o sweep.xlsx
+
+拍ごとのSN比は判定区間ごとに一度だけ求め、全てのベースラインに対する判定は
+SN比を並べ替えた配列の二分探索でまとめて行います。
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import autoCheck
+import batchRunner
+import msnaAnalyze
+import signalReaders
+
+# 出力する表の列
+SWEEP_COLUMNS = [
+    "file",
+    "region left (s)",
+    "region right (s)",
+    "baseline",
+    "beats",
+    "time (min)",
+    "bursts",
+    "burst frequency (/min)",
+    "burst incidence (/100 beats)",
+]
+
+
+def beat_SNRs(F_MSNA: np.ndarray, peaks_ECG_arg: np.ndarray, fs: int, regions: list) -> tuple[np.ndarray, np.ndarray]:
+    """判定区間ごとに全ての拍のSN比を求める
+
+    score_beatsと同じく最後の2拍は使わない. どれかの区間が信号の範囲外から始まる拍は,
+    区間どうしを同じ拍で比べられるように全ての区間で除く.
+
+    Args:
+        F_MSNA (np.ndarray): 補正したMSNAデータ
+        peaks_ECG_arg (np.ndarray): ECGのピーク
+        fs (int): サンプリング周波数
+        regions (list): R波からのバースト判定区間(秒)のリスト
+
+    Returns:
+        np.ndarray: SN比((区間の数, 拍数))
+        np.ndarray: 使った拍のRR間隔(秒)
+    """
+    peaks_ECG_arg = np.asarray(peaks_ECG_arg)
+    R = peaks_ECG_arg[:max(len(peaks_ECG_arg) - 2, 0)]
+    RRI = np.diff(peaks_ECG_arg)[:len(R)] / fs
+    samples = [msnaAnalyze.region_samples(region, fs) for region in regions]
+    first = min(min_val for min_val, _ in samples)
+    last = max(min_val for min_val, _ in samples)
+    keep = (R + first >= 0) & (R + last < len(F_MSNA))
+    R = R[keep]
+
+    autoCheck_ = autoCheck.auto_check(F_MSNA, fs, 0)
+    SNR = np.empty((len(regions), len(R)), dtype=np.float64)
+    for i, (min_val, max_val) in enumerate(samples):
+        if len(R):
+            SNR[i] = autoCheck_.burst_SNR_values(R + min_val, R + max_val + 1)[0]
+    return SNR, RRI[keep]
+
+
+def count_bursts(SNR: np.ndarray, baselines: np.ndarray) -> np.ndarray:
+    """全てのベースラインに対するバーストの数(burst_SNR_allの判定SNR > 1 + baseline * 0.01と同じ)
+
+    Args:
+        SNR (np.ndarray): 1つの判定区間の拍ごとのSN比
+        baselines (np.ndarray): ベースライン(%)
+
+    Returns:
+        np.ndarray: ベースラインごとのバーストの数
+    """
+    SNR = np.sort(SNR[~np.isnan(SNR)])  # 0 / 0はどの閾値でもバーストではない
+    thresholds = 1 + np.asarray(baselines, dtype=np.float64) * 0.01
+    return len(SNR) - np.searchsorted(SNR, thresholds, side="right")
+
+
+def sweep_recording(file: str, baselines: np.ndarray, regions: list, fs: int = 2000, iMSNA_cal: float = 1.0,
+                    dtype: type = np.float64, verbose: bool = False, cache=None, mmap: bool = False,
+                    channels: list | None = None, start: float = 0.0, stop: float | None = None) -> pd.DataFrame:
+    """1つの記録について, ベースラインと判定区間の全ての組み合わせのバースト発生率を求める
+
+    Args:
+        file (str): 記録ファイル(.txt, .edf, .h5, 生のバイナリ)
+        baselines (np.ndarray): ベースライン(%)
+        regions (list): R波からのバースト判定区間(秒)のリスト
+        fs (int): サンプリング周波数(ファイルのメタデータにある場合はそちらを使う)
+        iMSNA_cal (float): MSNAの補正値
+        dtype (type): 読み込むデータの型(np.float64 | np.float32)
+        verbose (bool): 読み込みの速度を表示する
+        cache (dataCache.data_cache | None): 読み込みと処理結果のキャッシュ(Noneの場合は使わない)
+        mmap (bool): 信号をキャッシュ上のメモリマップとして扱う(cacheが必要)
+        channels (list | None): ECG, BP, iMSNAのチャンネル
+        start (float): 読み込む範囲の始点(秒)
+        stop (float | None): 読み込む範囲の終点(秒)
+
+    Returns:
+        pd.DataFrame: 区間とベースラインの組み合わせごとの拍数, 時間, バースト数, バースト頻度, 発生率
+    """
+    fs = signalReaders.recording_fs(file, fs, channels)
+    _, F_MSNA, peaks_ECG_arg, _, _ = msnaAnalyze.load_recording(file, fs, iMSNA_cal, dtype, verbose, cache, mmap,
+                                                                channels, start, stop)
+    SNR, RRI = beat_SNRs(F_MSNA, peaks_ECG_arg, fs, regions)
+    return curves_table(file, SNR, RRI.sum() / 60, baselines, regions)
+
+
+def curves_table(file: str, SNR: np.ndarray, minutes: float, baselines: np.ndarray, regions: list) -> pd.DataFrame:
+    """拍ごとのSN比から, 区間とベースラインの組み合わせごとの表を作る
+
+    Args:
+        file (str): 表のfile列に入れる名前
+        SNR (np.ndarray): SN比((区間の数, 拍数))
+        minutes (float): 使った拍の合計時間(分)
+        baselines (np.ndarray): ベースライン(%)
+        regions (list): R波からのバースト判定区間(秒)のリスト
+
+    Returns:
+        pd.DataFrame: SWEEP_COLUMNSの表
+    """
+    beats = SNR.shape[1]
+    bursts = np.array([count_bursts(row, baselines) for row in SNR]).reshape(len(regions), len(baselines))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frequency = bursts / minutes if minutes else np.full(bursts.shape, np.nan)
+        incidence = bursts / beats * 100 if beats else np.full(bursts.shape, np.nan)
+    return pd.DataFrame(dict(zip(SWEEP_COLUMNS, [
+        file,
+        np.repeat([left for left, _ in regions], len(baselines)),
+        np.repeat([right for _, right in regions], len(baselines)),
+        np.tile(baselines, len(regions)),
+        beats,
+        minutes,
+        bursts.ravel(),
+        np.ravel(frequency),
+        np.ravel(incidence),
+    ])))
+
+
+def pool_tables(tables: list) -> pd.DataFrame:
+    """複数の記録の表を, 区間とベースラインごとに合計した表にする(file列は"all")
+
+    Args:
+        tables (list): sweep_recordingの戻り値のリスト
+
+    Returns:
+        pd.DataFrame: SWEEP_COLUMNSの表
+    """
+    df = pd.concat(tables, ignore_index=True)
+    keys = ["region left (s)", "region right (s)", "baseline"]
+    pooled = df.groupby(keys, sort=False)[["beats", "time (min)", "bursts"]].sum().reset_index()
+    pooled["file"] = "all"
+    pooled["burst frequency (/min)"] = pooled["bursts"] / pooled["time (min)"]
+    pooled["burst incidence (/100 beats)"] = pooled["bursts"] / pooled["beats"] * 100
+    return pooled[SWEEP_COLUMNS]
+
+
+def region_pair(value: str) -> tuple[float, float]:
+    """"LEFT:RIGHT"形式の判定区間を読む(argparseのtype)
+
+    Args:
+        value (str): 判定区間
+
+    Returns:
+        tuple[float, float]: R波からのバースト判定区間(秒)
+    """
+    try:
+        left, right = (float(x) for x in value.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid region {value!r}, expected LEFT:RIGHT in seconds") from None
+    if right <= left:
+        raise argparse.ArgumentTypeError(f"invalid region {value!r}, RIGHT must be larger than LEFT")
+    return left, right
+
+
+def main(argv: list | None = None) -> int:
+    """コマンドラインから記録(またはフォルダ)のバースト発生率の曲線を求める
+
+    Args:
+        argv (list | None): コマンドライン引数
+
+    Returns:
+        int: 終了コード(失敗した記録があれば1)
+    """
+    parser = argparse.ArgumentParser(prog="msna-sweep", description="Burst incidence vs. baseline and burst window.")
+    parser.add_argument("paths", nargs="+", help="recording files or folders (searched recursively)")
+    parser.add_argument("--baselines", type=float, nargs="+", default=None, help="baseline values (%%) to evaluate")
+    parser.add_argument("--baseline-range", type=float, nargs=3, default=(0, 50, 1), metavar=("START", "STOP", "STEP"),
+                        help="baseline grid (%%, inclusive) when --baselines is not given")
+    parser.add_argument("--regions", type=region_pair, nargs="+", default=None, metavar="LEFT:RIGHT",
+                        help="burst windows after each R peak (s) (default: --region)")
+    parser.add_argument("--shift-range", type=float, nargs=3, default=None, metavar=("START", "STOP", "STEP"),
+                        help="also shift every window by these offsets (s, inclusive)")
+    parser.add_argument("--pattern", default="*.txt", help="file pattern when searching folders")
+    parser.add_argument("-o", "--output", default="sweep.xlsx", help="output table (.xlsx or .txt)")
+    msnaAnalyze.add_analysis_arguments(parser)
+    parser.add_argument("-v", "--verbose", action="store_true", help="report load throughput")
+    args = parser.parse_args(argv)
+    if args.mmap and args.no_cache:
+        parser.error("--mmap cannot be used with --no-cache")
+
+    if args.baselines is not None:
+        baselines = np.unique(args.baselines)
+    else:
+        start, stop, step = args.baseline_range
+        baselines = np.round(np.arange(start, stop + step / 2, step), 10)
+    regions = args.regions or [tuple(args.region)]
+    if args.shift_range is not None:
+        start, stop, step = args.shift_range
+        shifts = np.round(np.arange(start, stop + step / 2, step), 10)
+        regions = [(left + d, right + d) for left, right in regions for d in shifts]
+
+    options = msnaAnalyze.analysis_options(args)
+    del options["baseline"], options["region"]
+    cache = msnaAnalyze.make_cache(args)
+    tables = []
+    failed = 0
+    for file, _ in batchRunner.find_recordings(args.paths, args.pattern):
+        try:
+            tables.append(sweep_recording(str(file), baselines, regions, verbose=args.verbose, cache=cache, **options))
+        except (OSError, ValueError, IndexError) as e:
+            print(f"{file}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"{file}: {tables[-1]['beats'].iloc[0]} beats, {len(regions)} windows x {len(baselines)} baselines",
+              file=sys.stderr)
+    if not tables:
+        return 1
+    if len(tables) > 1:
+        tables.append(pool_tables(tables))
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    msnaAnalyze.save_result(pd.concat(tables, ignore_index=True), args.output)
+    print(f"-> {args.output}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import beatFeatures
+
+# 書き出せる拡張子
+EXPORT_FORMATS = (".xlsx", ".txt", ".csv", ".parquet", ".feather", ".h5")
+# 波形を表に含める形式(それ以外は{名前}_segments.npyに別に保存する)
+EMBED_SEGMENTS = (".parquet", ".feather", ".h5")
+SEGMENT_COLUMN = "iMSNA segment"
+
+
+def segments_path(file_name: str) -> str:
+    """表に波形を含めない形式で, 波形を保存する.npyファイルのパス
+
+    Args:
+        file_name (str): 結果表のファイル名
+
+    Returns:
+        str: {名前}_segments.npy
+    """
+    path = Path(file_name)
+    return str(path.with_name(f"{path.stem}_segments.npy"))
+
+
+def _text_column(values: np.ndarray) -> list:
+    """列をpandasのto_csvと同じ文字列にする(NaNは空欄)
+
+    Args:
+        values (np.ndarray): 列
+
+    Returns:
+        list: 文字列
+    """
+    if values.dtype == np.float32:
+        text = values.astype(str).tolist()
+    else:
+        text = list(map(repr, values.tolist()))
+    if values.dtype.kind == "f":
+        for i in np.flatnonzero(np.isnan(values)).tolist():
+            text[i] = ""
+    return text
+
+
+class result_exporter:
+    def __init__(self, file_name: str, chunk_rows: int = 100_000, segment_bytes: int = 1 << 26):
+        """結果表(と各拍のiMSNAの波形)を拡張子に応じた形式でchunk_rows行ずつ書き出す
+
+        .txt(タブ区切り)と.csvは列ごとにまとめて文字列にし, .xlsxはopenpyxlの書き込み専用モードで
+        行を流し込むので, 表全体を文字列やセルのオブジェクトにしない.
+        .parquet, .feather(pyarrow)と.h5(h5py)は列のまま書き出す.
+
+        Args:
+            file_name (str): 保存先のファイル名
+            chunk_rows (int): 一度に書き出す行数
+            segment_bytes (int): 一度に切り出す波形のバイト数の上限
+        """
+        self.file_name = str(file_name)
+        self.ext = os.path.splitext(self.file_name)[1].lower()
+        if self.ext not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid file extension. Please use {', '.join(EXPORT_FORMATS[:-1])} or {EXPORT_FORMATS[-1]}.")
+        self.chunk_rows = chunk_rows
+        self.segment_bytes = segment_bytes
+        self.n_rows = 0
+        self.n_bytes = 0
+        self.elapsed = 0.0
+
+    def write(self, df: pd.DataFrame, F_MSNA: np.ndarray | None = None, width: int | None = None):
+        """結果表を書き出す
+
+        F_MSNAとwidthを指定すると, 各行の「iMSNA time」(サンプル)からwidthサンプルの波形も書き出す.
+        .parquetと.featherは「iMSNA segment」列, .h5は「iMSNA segment」データセット,
+        それ以外は{名前}_segments.npy((行数, width))になる.
+
+        Args:
+            df (pd.DataFrame): 結果表
+            F_MSNA (np.ndarray | None): 補正したMSNAデータ(メモリマップ可)
+            width (int | None): 波形のサンプル数(バースト判定区間の長さ)
+        """
+        t0 = time.perf_counter()
+        with_segments = F_MSNA is not None and width is not None
+        chunk_rows = self.chunk_rows
+        if with_segments:
+            # 波形を含めても1回に持つのがsegment_bytes程度になるようにする
+            chunk_rows = max(min(chunk_rows, self.segment_bytes // (8 * width)), 1)
+            starts = df["iMSNA time"].to_numpy(dtype=np.intp)
+
+        writer = getattr(self, f"_writer_{self.ext[1:]}")(df, width if with_segments else None)
+        next(writer)  # ファイルを開く(必要なライブラリがなければここでValueError)
+        sidecar = None
+        if with_segments and self.ext not in EMBED_SEGMENTS:
+            dtype = np.result_type(np.asarray(F_MSNA[:0]).dtype, np.float32)
+            sidecar = np.lib.format.open_memmap(segments_path(self.file_name), mode="w+", dtype=dtype, shape=(len(df), width))
+        try:
+            for start in range(0, max(len(df), 1), chunk_rows):
+                chunk = df.iloc[start:start + chunk_rows]
+                segments = None
+                if with_segments:
+                    segments = beatFeatures.window_segments(F_MSNA, starts[start:start + chunk_rows], width)
+                    if sidecar is not None:
+                        sidecar[start:start + len(segments)] = segments
+                        segments = None
+                writer.send((chunk, segments))
+        finally:
+            writer.close()
+            if sidecar is not None:
+                sidecar.flush()
+                del sidecar
+
+        self.n_rows = len(df)
+        self.n_bytes = os.path.getsize(self.file_name)
+        if with_segments and self.ext not in EMBED_SEGMENTS:
+            self.n_bytes += os.path.getsize(segments_path(self.file_name))
+        self.elapsed = time.perf_counter() - t0
+
+    def _writer_txt(self, df: pd.DataFrame, width: int | None, sep: str = "\t"):
+        """タブ区切り(to_csvと同じ書式)で書き出すジェネレータ
+
+        Args:
+            df (pd.DataFrame): 結果表(列と型を決める)
+            width (int | None): 使わない(波形は.npyに保存する)
+            sep (str): 区切り文字
+        """
+        numeric = all(dtype.kind in "biuf" for dtype in df.dtypes)
+        with open(self.file_name, "w", newline="") as f:
+            if numeric:
+                f.write(sep.join(map(str, df.columns)) + "\n")
+            first = True
+            while True:
+                chunk, _ = yield
+                if not numeric:
+                    # 文字列の列(バッチ処理の要約など)は引用符の扱いをpandasに任せる
+                    chunk.to_csv(f, sep=sep, index=False, header=first, lineterminator="\n")
+                elif len(chunk):
+                    parts = [_text_column(chunk[name].to_numpy()) for name in chunk.columns]
+                    f.write("\n".join(map(sep.join, zip(*parts))) + "\n")
+                first = False
+
+    def _writer_csv(self, df: pd.DataFrame, width: int | None):
+        """カンマ区切りで書き出すジェネレータ
+
+        Args:
+            df (pd.DataFrame): 結果表(列と型を決める)
+            width (int | None): 使わない(波形は.npyに保存する)
+        """
+        return self._writer_txt(df, width, ",")
+
+    def _writer_xlsx(self, df: pd.DataFrame, width: int | None):
+        """openpyxlの書き込み専用モードで行を流し込むジェネレータ
+
+        Args:
+            df (pd.DataFrame): 結果表(列と型を決める)
+            width (int | None): 使わない(波形は.npyに保存する)
+        """
+        import openpyxl
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Sheet1")
+        sheet.append(list(df.columns))
+        try:
+            while True:
+                chunk, _ = yield
+                columns = []
+                for name in chunk.columns:
+                    values = chunk[name].to_numpy()
+                    # NaNは空のセルにする
+                    columns.append([None if v != v else v for v in values.tolist()] if values.dtype.kind == "f" else values.tolist())
+                for row in zip(*columns):
+                    sheet.append(row)
+        finally:
+            workbook.save(self.file_name)
+
+    def _arrow_batch(self, chunk: pd.DataFrame, segments: np.ndarray | None):
+        """結果表のチャンクをpyarrowのRecordBatchにする
+
+        Args:
+            chunk (pd.DataFrame): 結果表のチャンク
+            segments (np.ndarray | None): 波形((行数, width))
+
+        Returns:
+            pyarrow.RecordBatch: 列と「iMSNA segment」列(固定長のリスト)
+        """
+        import pyarrow as pa
+
+        arrays = [pa.array(chunk[name].to_numpy()) for name in chunk.columns]
+        names = [str(name) for name in chunk.columns]
+        if segments is not None:
+            arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(segments.ravel()), segments.shape[1]))
+            names.append(SEGMENT_COLUMN)
+        return pa.RecordBatch.from_arrays(arrays, names=names)
+
+    def _writer_parquet(self, df: pd.DataFrame, width: int | None):
+        """チャンクごとに1つの行グループとして書き出すジェネレータ
+
+        Args:
+            df (pd.DataFrame): 結果表(列と型を決める)
+            width (int | None): 波形のサンプル数(Noneの場合は波形を含めない)
+        """
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Saving .parquet requires pyarrow") from None
+
+        writer = None
+        try:
+            while True:
+                batch = self._arrow_batch(*(yield))
+                if writer is None:
+                    writer = pq.ParquetWriter(self.file_name, batch.schema)
+                writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _writer_feather(self, df: pd.DataFrame, width: int | None):
+        """Feather(Arrow IPCファイル)にチャンクごとに書き出すジェネレータ
+
+        Args:
+            df (pd.DataFrame): 結果表(列と型を決める)
+            width (int | None): 波形のサンプル数(Noneの場合は波形を含めない)
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ValueError("Saving .feather requires pyarrow") from None
+
+        writer = None
+        try:
+            while True:
+                batch = self._arrow_batch(*(yield))
+                if writer is None:
+                    writer = pa.ipc.new_file(self.file_name, batch.schema)
+                writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _writer_h5(self, df: pd.DataFrame, width: int | None):
+        """列ごとのデータセットにチャンクごとに追記するジェネレータ
+
+        Args:
+            df (pd.DataFrame): 結果表(列と型を決める)
+            width (int | None): 波形のサンプル数(Noneの場合は波形を含めない)
+        """
+        try:
+            import h5py
+        except ImportError:
+            raise ValueError("Saving .h5 requires h5py") from None
+
+        with h5py.File(self.file_name, "w") as f:
+            datasets = {}
+            for name, dtype in df.dtypes.items():
+                dtype = h5py.string_dtype() if dtype.kind not in "biuf" else dtype
+                datasets[name] = f.create_dataset(str(name), shape=(0,), maxshape=(None,), dtype=dtype,
+                                                  chunks=(min(max(len(df), 1), self.chunk_rows),))
+            f.attrs["columns"] = [str(name) for name in df.columns]
+            while True:
+                chunk, segments = yield
+                n = datasets[df.columns[0]].shape[0] if len(df.columns) else 0
+                for name in chunk.columns:
+                    values = chunk[name].to_numpy()
+                    values = values.astype(str) if values.dtype.kind not in "biuf" else values
+                    datasets[name].resize((n + len(chunk),))
+                    datasets[name][n:] = values
+                if segments is not None:
+                    if SEGMENT_COLUMN not in datasets:
+                        datasets[SEGMENT_COLUMN] = f.create_dataset(
+                            SEGMENT_COLUMN, shape=(0, width), maxshape=(None, width), dtype=segments.dtype,
+                            chunks=(max(min(len(df), (1 << 20) // (segments.itemsize * width)), 1), width))
+                    datasets[SEGMENT_COLUMN].resize((n + len(segments), width))
+                    datasets[SEGMENT_COLUMN][n:] = segments
+
+    def report(self) -> str:
+        """書き出しの速度を文字列で返す
+
+        Returns:
+            str: 行数, ファイルサイズ, 時間, スループット
+        """
+        mb = self.n_bytes / 1e6
+        rate = mb / self.elapsed if self.elapsed > 0 else float("inf")
+        rows_rate = self.n_rows / self.elapsed if self.elapsed > 0 else float("inf")
+        return f"{self.n_rows} rows, {mb:.1f} MB in {self.elapsed:.2f} s ({rate:.1f} MB/s, {rows_rate:.0f} rows/s)"
+
+if __name__ == "__main__":
+    pass
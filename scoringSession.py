@@ -0,0 +1,274 @@
+import json
+import os
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+
+# 拍のラベル(-1は未判定)
+UNSCORED = -1
+NO_BURST = 0
+BURST = 1
+ERROR = 2
+
+# ジャーナルの操作の種類
+MARK = 0
+JUMP = 1
+UNDO = 2
+RELABEL = 3
+JOURNAL_MAGIC = b"MSNAJOURNAL1\n"
+RECORD = struct.Struct("<bib")  # (操作, 拍, ラベル)
+RECORD_DTYPE = np.dtype([("kind", "i1"), ("beat", "<i4"), ("label", "i1")])
+
+
+class session_table:
+    def __init__(self, beats: pd.DataFrame, journal=None):
+        """手動モードの判定結果を, 拍ごとの行と判定ラベルの列で持つ
+
+        特徴量の列(beatFeatures.beat_table)は最初にまとめて求めておき, 判定では
+        ラベルを書き込んでカーソルを進めるだけにする. 取り消しやジャンプでは
+        ラベルとカーソルを戻すだけでよい.
+
+        Args:
+            beats (pd.DataFrame): beatFeatures.beat_tableの戻り値
+            journal (session_journal | None): 操作を追記するジャーナル(Noneの場合は記録しない)
+        """
+        self.columns = {name: beats[name].to_numpy() for name in beats.columns}
+        self.n = len(beats)
+        self.label = np.full(self.n, UNSCORED, dtype=np.int8)
+        self.cursor = 0  # 次に判定する拍
+        self.history = []  # 取り消し用の(拍, 元のラベル, 元のカーソル)
+        self.n_bursts = 0
+        self.journal = journal
+
+    def __len__(self) -> int:
+        return self.n
+
+    def row(self, i: int) -> dict:
+        """i番目の拍の特徴量
+
+        Args:
+            i (int): 拍の番号
+
+        Returns:
+            dict: 列名 -> 値
+        """
+        return {name: column[i] for name, column in self.columns.items()}
+
+    def mark(self, select: int) -> int:
+        """カーソルの拍にラベルを書き込み, カーソルを次の拍に進める
+
+        Args:
+            select (int): 0: バーストなし, 1: バーストあり, 2: エラー
+
+        Returns:
+            int: ラベルを書き込んだ拍の番号
+        """
+        i = self.cursor
+        self.history.append((i, self.label[i], self.cursor))
+        self._set(i, select)
+        self.cursor = i + 1
+        self._log(MARK, i, select)
+        return i
+
+    def undo(self) -> int | None:
+        """最後の判定(またはジャンプ)を取り消す
+
+        Returns:
+            int | None: ラベルを戻した拍の番号(ジャンプを取り消した場合や履歴がない場合はNone)
+        """
+        if not self.history:
+            return None
+        self._log(UNDO, -1, 0)
+        i, label, cursor = self.history.pop()
+        self.cursor = cursor
+        if i is None:
+            return None
+        self._set(i, label)
+        return i
+
+    def jump(self, i: int):
+        """カーソルをi番目の拍に移す(ラベルは残し, 再び判定すると上書きする)
+
+        Args:
+            i (int): 拍の番号
+        """
+        if not 0 <= i < self.n:
+            raise ValueError(f"Beat {i + 1} is out of range (1-{self.n})")
+        self.history.append((None, UNSCORED, self.cursor))
+        self.cursor = i
+        self._log(JUMP, i, 0)
+
+    def relabel(self, i: int, label: int):
+        """i番目の拍のラベルだけを書き換える(カーソルは動かさない. 判定が終わった後の見直しで使う)
+
+        Args:
+            i (int): 拍の番号
+            label (int): 0: バーストなし, 1: バーストあり, 2: エラー
+        """
+        if not 0 <= i < self.n:
+            raise ValueError(f"Beat {i + 1} is out of range (1-{self.n})")
+        self.history.append((i, self.label[i], self.cursor))
+        self._set(i, label)
+        self._log(RELABEL, i, label)
+
+    def last_is_relabel(self) -> bool:
+        """次に取り消す操作が, 判定が終わった後のラベルの書き換えかどうか
+
+        Returns:
+            bool: relabelの場合はTrue(判定, ジャンプの場合や履歴がない場合はFalse)
+        """
+        if not self.history:
+            return False
+        i, _, cursor = self.history[-1]
+        return i is not None and cursor == self.n == self.cursor
+
+    def replay(self, records: np.ndarray):
+        """ジャーナルの操作をやり直して, 中断したときの状態に戻す(取り消しの履歴も戻る)
+
+        Args:
+            records (np.ndarray): session_journal.readの操作(RECORD_DTYPE)
+        """
+        journal, self.journal = self.journal, None
+        try:
+            for kind, beat, label in records.tolist():
+                if kind == MARK and beat == self.cursor < self.n:
+                    self.mark(label)
+                elif kind == JUMP:
+                    self.jump(beat)
+                elif kind == UNDO:
+                    self.undo()
+                elif kind == RELABEL:
+                    self.relabel(beat, label)
+                else:
+                    raise ValueError(f"Invalid journal record: {(kind, beat, label)}")
+        finally:
+            self.journal = journal
+
+    def set_all(self, Burst: np.ndarray):
+        """全ての拍にラベルを書き込む(自動モード)
+
+        Args:
+            Burst (np.ndarray): 拍ごとのラベル
+        """
+        self.label[:] = Burst
+        self.n_bursts = int(np.count_nonzero(self.label == BURST))
+        self.cursor = self.n
+        self.history = []
+
+    def _log(self, kind: int, beat: int, label: int):
+        """ジャーナルに操作を追記する
+
+        Args:
+            kind (int): MARK | JUMP | UNDO | RELABEL
+            beat (int): 拍の番号
+            label (int): ラベル
+        """
+        if self.journal is not None:
+            self.journal.append(kind, beat, label)
+
+    def _set(self, i: int, label: int):
+        """i番目の拍のラベルを書き換え, バースト数を更新する
+
+        Args:
+            i (int): 拍の番号
+            label (int): ラベル
+        """
+        self.n_bursts += int(label == BURST) - int(self.label[i] == BURST)
+        self.label[i] = label
+
+    def n_scored(self) -> int:
+        """判定済みの拍の数(エラーを含む)
+
+        Returns:
+            int: 拍の数
+        """
+        return int(np.count_nonzero(self.label != UNSCORED))
+
+    def result(self, columns: list) -> pd.DataFrame:
+        """バーストあり・なしと判定した拍の結果表(エラーと未判定の拍は含まない)
+
+        Args:
+            columns (list): 結果表の列(Burstはラベル)
+
+        Returns:
+            pd.DataFrame: 結果表
+        """
+        keep = (self.label == NO_BURST) | (self.label == BURST)
+        data = {name: (self.label.astype(int) if name == "Burst" else self.columns[name])[keep] for name in columns}
+        return pd.DataFrame(data)
+
+class session_journal:
+    def __init__(self, path: str, header: dict | None = None):
+        """手動モードの操作(判定, ジャンプ, 取り消し, 見直しでの書き換え)を1件6バイトで追記するファイル
+
+        先頭は識別子とJSON1行のヘッダ(記録, 設定, 区間, 拍数), 以降は固定長の操作の列.
+        操作ごとにflushするので, アプリケーションが落ちても最後の操作まで残る.
+        書き込み途中で切れた最後の操作はreadで無視する.
+
+        Args:
+            path (str): ジャーナルのパス
+            header (dict | None): 新しく作る場合のヘッダ(Noneの場合は既存のファイルに追記する)
+        """
+        self.path = str(path)
+        if header is None:
+            # 書き込み途中で切れた最後の操作を切り捨ててから追記する
+            self.f = open(self.path, "r+b")
+            self.f.readline()
+            self.f.readline()
+            start = self.f.tell()
+            self.f.truncate(start + (os.path.getsize(self.path) - start) // RECORD.size * RECORD.size)
+            self.f.seek(0, os.SEEK_END)
+        else:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.f = open(self.path, "wb")
+            self.f.write(JOURNAL_MAGIC + json.dumps(dict(header, created=time.time())).encode() + b"\n")
+            self.f.flush()
+
+    def append(self, kind: int, beat: int, label: int):
+        """操作を追記する
+
+        Args:
+            kind (int): MARK | JUMP | UNDO | RELABEL
+            beat (int): 拍の番号
+            label (int): ラベル
+        """
+        self.f.write(RECORD.pack(kind, beat, label))
+        self.f.flush()
+
+    def close(self):
+        """ファイルを閉じる"""
+        self.f.close()
+
+    def remove(self):
+        """ファイルを閉じて削除する(結果を保存した後)"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def read(path: str) -> tuple[dict, np.ndarray] | None:
+        """ジャーナルを読み込む
+
+        Args:
+            path (str): ジャーナルのパス
+
+        Returns:
+            tuple[dict, np.ndarray] | None: ヘッダと操作(RECORD_DTYPE), 読めない場合はNone
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.readline() != JOURNAL_MAGIC:
+                    return None
+                header = json.loads(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        n = len(data) // RECORD.size
+        return header, np.frombuffer(data[:n * RECORD.size], dtype=RECORD_DTYPE)
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,525 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+import dataLoader
+
+# 解析に使う信号(readの戻り値の順序)
+SIGNAL_NAMES = ["ECG", "BP", "iMSNA"]
+# チャンネルを指定しない場合に, 名前(小文字)にこれを含むチャンネルを使う
+CHANNEL_HINTS = {"ECG": ("ecg", "ekg"), "BP": ("bp", "pressure", "finapres"), "iMSNA": ("msna",)}
+# HDF5でサンプリング周波数を表す属性の名前(データセット, その親のグループの順に探す)
+FS_ATTRIBUTES = ("fs", "sampling_rate", "sample_rate", "sampling_frequency", "samplerate")
+EDF_ANNOTATIONS = "EDF Annotations"
+
+
+def _as_fs(value) -> int | float:
+    """メタデータのサンプリング周波数を, 整数なら整数にする(spinBoxとキャッシュのキーに合わせる)
+
+    Args:
+        value: サンプリング周波数
+
+    Returns:
+        int | float: サンプリング周波数
+    """
+    value = float(value)
+    if not value > 0:
+        raise ValueError(f"Invalid sampling rate: {value}")
+    return int(value) if value.is_integer() else value
+
+
+class signal_reader:
+    def __init__(self, file: str):
+        """記録ファイルのチャンネルを, 必要な範囲だけ読み込む(形式ごとのクラスの共通部分)
+
+        各形式のクラスはchannels, gain, biasを設定し, channel_fs, channel_length, read_rawを実装する.
+        物理量はread_raw(ファイル上の値) * gain + biasで, 読み込みはchunkサンプルずつ行う.
+
+        Args:
+            file (str): ファイルパス
+        """
+        self.file = str(file)
+        self.channels = []  # チャンネルの名前
+        self.gain = []  # チャンネルごとの倍率
+        self.bias = []  # チャンネルごとのオフセット
+        self.n_samples = 0
+        self.n_bytes = 0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """ファイルを閉じる"""
+
+    def channel_fs(self, i: int) -> int | float | None:
+        """i番目のチャンネルのサンプリング周波数(ファイルにない場合はNone)"""
+        return None
+
+    def channel_length(self, i: int) -> int | None:
+        """i番目のチャンネルのサンプル数(読み込むまで分からない場合はNone)"""
+        raise NotImplementedError
+
+    def read_raw(self, i: int, start: int, stop: int) -> np.ndarray:
+        """i番目のチャンネルの[start, stop)をファイル上の値のまま読み込む"""
+        raise NotImplementedError
+
+    def resolve(self, channels: list | None = None) -> list:
+        """ECG, BP, iMSNAに使うチャンネルの番号を決める
+
+        Args:
+            channels (list | None): ECG, BP, iMSNAのチャンネル(名前または0から始まる番号).
+                Noneの場合は名前(CHANNEL_HINTS)で探し, 見つからなければ最初の3チャンネル
+
+        Returns:
+            list: チャンネルの番号(3つ)
+        """
+        if len(self.channels) < 3:
+            raise ValueError(f"{self.file} has {len(self.channels)} channels, 3 are needed (ECG, BP, iMSNA)")
+        if channels is None:
+            lower = [name.lower() for name in self.channels]
+            found = [next((i for i, name in enumerate(lower) if any(hint in name for hint in CHANNEL_HINTS[signal])), None)
+                     for signal in SIGNAL_NAMES]
+            return found if None not in found and len(set(found)) == 3 else [0, 1, 2]
+        if len(channels) != 3:
+            raise ValueError("Specify 3 channels (ECG, BP, iMSNA)")
+        index = []
+        for channel in channels:
+            if channel in self.channels:
+                index.append(self.channels.index(channel))
+            elif str(channel).isdigit() and int(channel) < len(self.channels):
+                index.append(int(channel))
+            else:
+                raise ValueError(f"Unknown channel {channel!r}. Channels: {', '.join(self.channels)}")
+        return index
+
+    def fs_of(self, index: list, default: int | float | None = None) -> int | float | None:
+        """選んだチャンネルのサンプリング周波数(ファイルにない場合はdefault)
+
+        Args:
+            index (list): チャンネルの番号
+            default (int | float | None): ファイルにない場合の値(GUIのspinBox, --fs)
+
+        Returns:
+            int | float | None: サンプリング周波数
+        """
+        rates = {self.channel_fs(i) for i in index} - {None}
+        if len(rates) > 1:
+            raise ValueError("ECG, BP and iMSNA channels have different sampling rates: "
+                             + ", ".join(f"{self.channels[i]} {self.channel_fs(i)} Hz" for i in index))
+        return rates.pop() if rates else default
+
+    def sample_range(self, index: list, start: float = 0.0, stop: float | None = None,
+                     fs: int | float | None = None) -> tuple[int, int | None]:
+        """読み込む範囲(秒)をサンプルにする
+
+        Args:
+            index (list): チャンネルの番号
+            start (float): 始点(秒)
+            stop (float | None): 終点(秒, Noneの場合は最後まで)
+            fs (int | float | None): サンプリング周波数
+
+        Returns:
+            int: 始点(サンプル)
+            int | None: 終点(サンプル, 含まない. 長さが分からない形式で最後までの場合はNone)
+        """
+        lengths = [self.channel_length(i) for i in index]
+        n = None if None in lengths else min(lengths)
+        if (start or stop is not None) and fs is None:
+            raise ValueError("A sampling rate is needed to read a time range")
+        s0 = round(start * fs) if start else 0
+        s1 = n if stop is None else round(stop * fs)
+        if n is not None and s1 is not None:
+            s1 = min(s1, n)
+        if s0 < 0 or (s1 is not None and s1 <= s0):
+            raise ValueError(f"Invalid time range: {start}-{stop} s")
+        return s0, s1
+
+    def read(self, index: list, start: int = 0, stop: int | None = None, dtype: type = np.float64,
+             out: list | None = None, progress=None, chunk: int = 10_000_000) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """選んだチャンネルの[start, stop)をchunkサンプルずつ読み込む
+
+        Args:
+            index (list): ECG, BP, iMSNAのチャンネルの番号
+            start (int): 始点(サンプル)
+            stop (int | None): 終点(サンプル, 含まない. Noneの場合は最後まで)
+            dtype (type): 読み込むデータの型(np.float64 | np.float32)
+            out (list | None): 3つの信号を書き込む.npyファイルのパス(メモリマップに直接書き込む)
+            progress (callable | None): 読み込んだ割合(0-1)を受け取る関数. 例外を投げると読み込みを中止する
+            chunk (int): 一度に読み込むサンプル数
+
+        Returns:
+            np.ndarray: ECGのデータ
+            np.ndarray: BPのデータ
+            np.ndarray: iMSNAのデータ
+        """
+        t0 = time.perf_counter()
+        if stop is None:
+            stop = min(self.channel_length(i) for i in index)
+        n = stop - start
+        if n <= 0:
+            raise ValueError("No samples in the selected range")
+        if out is None:
+            columns = tuple(np.empty(n, dtype=dtype) for _ in index)
+        else:
+            columns = tuple(np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n,)) for path in out)
+        self.n_bytes = 0
+        for k, (i, column) in enumerate(zip(index, columns)):
+            for s in range(0, n, chunk):
+                e = min(s + chunk, n)
+                raw = self.read_raw(i, start + s, start + e)
+                self.n_bytes += raw.nbytes
+                if self.gain[i] == 1 and self.bias[i] == 0:
+                    column[s:e] = raw
+                else:
+                    column[s:e] = raw * self.gain[i] + self.bias[i]
+                if progress is not None:
+                    progress((k * n + e) / (len(index) * n))
+        if out is not None:
+            for column in columns:
+                column.flush()
+        self.n_samples = n
+        self.elapsed = time.perf_counter() - t0
+        return columns
+
+    def report(self) -> str:
+        """読み込みの速度を文字列で返す(dataLoader.txt_loader.reportと同じ形)
+
+        Returns:
+            str: サンプル数, 読み込んだバイト数, 時間, スループット
+        """
+        mb = self.n_bytes / 1e6
+        rate = mb / self.elapsed if self.elapsed > 0 else float("inf")
+        samples_rate = self.n_samples / self.elapsed / 1e6 if self.elapsed > 0 else float("inf")
+        return (f"{self.n_samples} samples, {mb:.1f} MB in {self.elapsed:.2f} s "
+                f"({rate:.1f} MB/s, {samples_rate:.2f} M samples/s)")
+
+
+class txt_reader(signal_reader):
+    def __init__(self, file: str):
+        """3列(ECG, BP, iMSNA)の.txtファイル
+
+        サンプリング周波数の情報はなく, 行の位置も分からないため, 一部のチャンネルや範囲だけを読むことはできない.
+        readはdataLoader.txt_loaderで全体を読み込んでから選ぶ(キャッシュを使う場合はdataCache.read_txt).
+
+        Args:
+            file (str): ファイルパス
+        """
+        super().__init__(file)
+        self.channels = list(SIGNAL_NAMES)
+        self.gain = [1.0] * 3
+        self.bias = [0.0] * 3
+
+    def channel_length(self, i: int) -> int | None:
+        return None
+
+    def read(self, index: list, start: int = 0, stop: int | None = None, dtype: type = np.float64,
+             out: list | None = None, progress=None, chunk: int = 10_000_000) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if out is not None:
+            raise ValueError("Reading .txt into memory-mapped files is done by dataCache.read_txt")
+        loader = dataLoader.txt_loader(self.file, dtype, progress=progress)
+        columns = loader.read()
+        self.n_samples, self.n_bytes, self.elapsed = loader.n_samples, loader.n_bytes, loader.elapsed
+        selected = tuple(columns[i][start:stop] for i in index)
+        if len(selected[0]) == 0:
+            raise ValueError("No samples in the selected range")
+        return selected
+
+
+class edf_reader(signal_reader):
+    def __init__(self, file: str):
+        """EDF/EDF+(連続)ファイル. データレコードをメモリマップし, 読む範囲のレコードだけを変換する
+
+        チャンネルごとのサンプリング周波数は(1レコードのサンプル数 / レコードの長さ).
+        物理量は(デジタル値 - デジタル最小値) * (物理量の幅 / デジタル値の幅) + 物理量の最小値.
+        注釈(EDF Annotations)はチャンネルに含めない.
+
+        Args:
+            file (str): ファイルパス
+        """
+        super().__init__(file)
+        with open(self.file, "rb") as f:
+            header = f.read(256)
+            if len(header) < 256 or header[:8].strip() != b"0":
+                raise ValueError(f"{self.file} is not an EDF file")
+            header_bytes = int(header[184:192])
+            n_records = int(header[236:244])
+            self.duration = float(header[244:252])
+            ns = int(header[252:256])
+            if header[192:197] == b"EDF+D":
+                raise ValueError("Discontinuous EDF+ recordings (EDF+D) are not supported")
+            signals = f.read(ns * 256)
+        if len(signals) < ns * 256 or self.duration <= 0:
+            raise ValueError(f"{self.file} has an invalid EDF header")
+
+        def field(width: int) -> list:
+            nonlocal offset
+            values = [signals[offset + k * width:offset + (k + 1) * width].decode("latin-1").strip() for k in range(ns)]
+            offset += ns * width
+            return values
+
+        offset = 0
+        labels = field(16)
+        field(80)  # トランスデューサ
+        field(8)  # 単位
+        physical_min = np.array(field(8), dtype=np.float64)
+        physical_max = np.array(field(8), dtype=np.float64)
+        digital_min = np.array(field(8), dtype=np.float64)
+        digital_max = np.array(field(8), dtype=np.float64)
+        field(80)  # フィルタ
+        samples = np.array(field(8), dtype=np.int64)
+
+        record = int(samples.sum())
+        available = (os.path.getsize(self.file) - header_bytes) // (2 * record)
+        n_records = available if n_records < 0 else min(n_records, available)
+        if n_records <= 0:
+            raise ValueError(f"{self.file} has no data records")
+        self._data = np.memmap(self.file, dtype="<i2", mode="r", offset=header_bytes, shape=(n_records, record))
+        self.n_records = n_records
+
+        # 注釈以外の信号をチャンネルにする
+        starts = np.concatenate([[0], np.cumsum(samples)[:-1]])
+        self._signals = []  # (レコード内の位置, 1レコードのサンプル数)
+        for k, label in enumerate(labels):
+            if label == EDF_ANNOTATIONS:
+                continue
+            gain = (physical_max[k] - physical_min[k]) / (digital_max[k] - digital_min[k])
+            self.channels.append(label)
+            self.gain.append(gain)
+            self.bias.append(physical_min[k] - digital_min[k] * gain)
+            self._signals.append((int(starts[k]), int(samples[k])))
+
+    def close(self):
+        self._data = None
+
+    def channel_fs(self, i: int) -> int | float:
+        return _as_fs(self._signals[i][1] / self.duration)
+
+    def channel_length(self, i: int) -> int:
+        return self.n_records * self._signals[i][1]
+
+    def read_raw(self, i: int, start: int, stop: int) -> np.ndarray:
+        offset, samples = self._signals[i]
+        r0, r1 = start // samples, -(-stop // samples)
+        block = self._data[r0:r1, offset:offset + samples].reshape(-1)
+        return block[start - r0 * samples:stop - r0 * samples]
+
+
+class hdf5_reader(signal_reader):
+    def __init__(self, file: str):
+        """HDF5ファイル(h5pyが必要). 数値の1次元のデータセットを1チャンネル,
+        2次元のデータセットは短い方の軸の各列を1チャンネル(名前は属性channels/labels, なければ"名前[列]")とする
+
+        サンプリング周波数はデータセット, その親のグループの属性(FS_ATTRIBUTES)から探す.
+        読み込みはh5pyのスライスで, 読む範囲だけをファイルから取り出す.
+
+        Args:
+            file (str): ファイルパス
+        """
+        super().__init__(file)
+        try:
+            import h5py
+        except ImportError:
+            raise ValueError("Reading .h5 requires h5py") from None
+        self.f = h5py.File(self.file, "r")
+        self._sources = []  # (データセット, 列(1次元の場合はNone), 時間の軸)
+
+        def add(name: str, obj):
+            if not isinstance(obj, h5py.Dataset) or obj.dtype.kind not in "iuf" or obj.ndim not in (1, 2):
+                return
+            if obj.ndim == 1:
+                self._add(name, obj, None, 0)
+                return
+            axis = 0 if obj.shape[0] >= obj.shape[1] else 1
+            n = obj.shape[1 - axis]
+            labels = next((list(obj.attrs[key]) for key in ("channels", "labels") if key in obj.attrs), None)
+            if labels is None or len(labels) != n:
+                labels = [f"{name}[{j}]" for j in range(n)]
+            for j, label in enumerate(labels):
+                self._add(label.decode() if isinstance(label, bytes) else str(label), obj, j, axis)
+
+        self.f.visititems(add)
+
+    def _add(self, name: str, dataset, column: int | None, axis: int):
+        """チャンネルを追加する
+
+        Args:
+            name (str): チャンネルの名前
+            dataset (h5py.Dataset): データセット
+            column (int | None): 2次元の場合の列
+            axis (int): 時間の軸
+        """
+        self.channels.append(name)
+        self.gain.append(1.0)
+        self.bias.append(0.0)
+        self._sources.append((dataset, column, axis))
+
+    def close(self):
+        self.f.close()
+
+    def channel_fs(self, i: int) -> int | float | None:
+        obj = self._sources[i][0]
+        while True:
+            for key in FS_ATTRIBUTES:
+                if key in obj.attrs:
+                    return _as_fs(np.asarray(obj.attrs[key]).reshape(-1)[0])
+            if obj.name == "/":
+                return None
+            obj = obj.parent
+
+    def channel_length(self, i: int) -> int:
+        dataset, _, axis = self._sources[i]
+        return dataset.shape[axis]
+
+    def read_raw(self, i: int, start: int, stop: int) -> np.ndarray:
+        dataset, column, axis = self._sources[i]
+        if column is None:
+            return dataset[start:stop]
+        return dataset[start:stop, column] if axis == 0 else dataset[column, start:stop]
+
+
+class binary_reader(signal_reader):
+    def __init__(self, file: str):
+        """チャンネルをサンプルごとに並べた(インターリーブ)生のバイナリファイル. 全体をメモリマップする
+
+        形式は同じ名前の.jsonファイル(recording.bin.jsonまたはrecording.json)に書く:
+        {"dtype": "<i2", "channels": ["ECG", "BP", "iMSNA"], "fs": 2000, "header_bytes": 0, "scale": [1, 1, 1]}
+        channelsはチャンネル数でもよい. fs, header_bytes, scale(1つまたはチャンネルごと)は省略できる.
+
+        Args:
+            file (str): ファイルパス
+        """
+        super().__init__(file)
+        path = Path(self.file)
+        sidecar = next((p for p in (Path(f"{path}.json"), path.with_suffix(".json")) if p.exists()), None)
+        if sidecar is None:
+            raise ValueError(f"{self.file} needs a {path.name}.json file with its dtype and channels")
+        with open(sidecar) as f:
+            meta = json.load(f)
+        try:
+            dtype = np.dtype(meta["dtype"])
+            channels = meta["channels"]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid {sidecar.name}: {e}") from None
+        self.channels = [f"channel {k}" for k in range(channels)] if isinstance(channels, int) else list(map(str, channels))
+        n_channels = len(self.channels)
+        self.fs = _as_fs(meta["fs"]) if meta.get("fs") is not None else None
+        header_bytes = int(meta.get("header_bytes", 0))
+        scale = np.broadcast_to(np.asarray(meta.get("scale", 1.0), dtype=np.float64), (n_channels,))
+        self.gain = scale.tolist()
+        self.bias = [0.0] * n_channels
+
+        n = (os.path.getsize(self.file) - header_bytes) // (dtype.itemsize * n_channels)
+        if n <= 0:
+            raise ValueError(f"{self.file} has no samples")
+        self._data = np.memmap(self.file, dtype=dtype, mode="r", offset=header_bytes, shape=(n, n_channels))
+
+    def close(self):
+        self._data = None
+
+    def channel_fs(self, i: int) -> int | float | None:
+        return self.fs
+
+    def channel_length(self, i: int) -> int:
+        return len(self._data)
+
+    def read_raw(self, i: int, start: int, stop: int) -> np.ndarray:
+        return np.ascontiguousarray(self._data[start:stop, i])
+
+
+# 拡張子 -> 読み込むクラス
+READERS = {
+    ".txt": txt_reader,
+    ".edf": edf_reader,
+    ".h5": hdf5_reader,
+    ".hdf5": hdf5_reader,
+    ".bin": binary_reader,
+    ".dat": binary_reader,
+    ".raw": binary_reader,
+}
+
+
+def open_reader(file: str) -> signal_reader:
+    """拡張子に応じたクラスでファイルを開く(ヘッダだけを読む)
+
+    Args:
+        file (str): ファイルパス
+
+    Returns:
+        signal_reader: 読み込むクラスのインスタンス(withで閉じる)
+    """
+    ext = Path(file).suffix.lower()
+    if ext not in READERS:
+        formats = list(READERS)
+        raise ValueError(f"Unsupported file format {ext!r}. Please use {', '.join(formats[:-1])} or {formats[-1]}.")
+    return READERS[ext](file)
+
+
+def recording_fs(file: str, default: int | float | None = None, channels: list | None = None) -> int | float | None:
+    """記録ファイルのサンプリング周波数(ファイルにない場合はdefault)
+
+    Args:
+        file (str): ファイルパス
+        default (int | float | None): ファイルにない場合の値
+        channels (list | None): ECG, BP, iMSNAのチャンネル(signal_reader.resolve)
+
+    Returns:
+        int | float | None: サンプリング周波数
+    """
+    with open_reader(file) as reader:
+        return reader.fs_of(reader.resolve(channels), default)
+
+
+def source_settings(channels: list | None = None, start: float = 0.0, stop: float | None = None) -> dict | None:
+    """ファイルのうち読み込む部分を, 処理結果のキャッシュのキーに含める値にする
+
+    Args:
+        channels (list | None): ECG, BP, iMSNAのチャンネル
+        start (float): 始点(秒)
+        stop (float | None): 終点(秒)
+
+    Returns:
+        dict | None: チャンネルと範囲(ファイル全体を既定のチャンネルで読む場合はNone)
+    """
+    if channels is None and not start and stop is None:
+        return None
+    return {"channels": None if channels is None else [str(channel) for channel in channels],
+            "start": start, "stop": stop}
+
+
+def read_recording(file: str, fs: int | float | None = None, channels: list | None = None, start: float = 0.0,
+                   stop: float | None = None, dtype: type = np.float64, progress=None) -> tuple:
+    """記録ファイルから選んだチャンネルと範囲を読み込む(キャッシュを使わない場合)
+
+    Args:
+        file (str): ファイルパス
+        fs (int | float | None): ファイルにサンプリング周波数がない場合の値
+        channels (list | None): ECG, BP, iMSNAのチャンネル(名前または番号)
+        start (float): 始点(秒)
+        stop (float | None): 終点(秒)
+        dtype (type): 読み込むデータの型(np.float64 | np.float32)
+        progress (callable | None): 読み込んだ割合を受け取る関数
+
+    Returns:
+        np.ndarray: ECGのデータ
+        np.ndarray: BPのデータ
+        np.ndarray: iMSNAのデータ
+        int | float: サンプリング周波数
+        str: 読み込みの速度
+    """
+    with open_reader(file) as reader:
+        index = reader.resolve(channels)
+        fs = reader.fs_of(index, fs)
+        start, stop = reader.sample_range(index, start, stop, fs)
+        ECG, BP, iMSNA = reader.read(index, start, stop, dtype, progress=progress)
+        return ECG, BP, iMSNA, fs, reader.report()
+
+if __name__ == "__main__":
+    pass
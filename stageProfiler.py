@@ -0,0 +1,199 @@
+import contextlib
+import json
+import sys
+import threading
+import time
+
+_local = threading.local()  # スレッドごとの計測中のstage_profiler(_local.active)
+
+
+def peak_rss() -> float | None:
+    """プロセスの最大常駐メモリ(MB, 取得できない場合はNone)
+
+    Returns:
+        float | None: 最大常駐メモリ
+    """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                                                     "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                                                     "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize / 1e6
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1e6 if sys.platform == "darwin" else rss / 1e3
+
+
+def stage(name: str, samples: int | None = None, beats: int | None = None):
+    """計測中のstage_profilerがあれば, withの中を段階nameとして計測する(なければ何もしない)
+
+    withで受け取る辞書の"samples", "beats"は, 数が段階の終わりまで分からない場合に中で書き換えられる.
+
+    Args:
+        name (str): 段階の名前
+        samples (int | None): 処理したサンプル数(スループットの計算に使う)
+        beats (int | None): 処理した拍数
+
+    Returns:
+        with文で使うコンテキストマネージャ
+    """
+    active = getattr(_local, "active", None)
+    if active is None:
+        return contextlib.nullcontext({})
+    return active.stage(name, samples, beats)
+
+
+class stage_profiler:
+    def __init__(self):
+        """段階(読み込み, フィルタ, ピーク検出, バースト判定, 描画, 保存)ごとの時間, スループット, メモリを記録する
+
+        with文の中では, 各モジュールのstageProfiler.stage(...)がこのインスタンスに記録される.
+        段階の中の段階は"外側/内側"の名前で記録し, 同じ名前の段階は回数と時間を合計する.
+        withに入ったスレッドの段階だけを記録する(バックグラウンドの読み込みは, そのスレッドでwithに入る).
+        メモリはプロセスの最大常駐メモリ(段階の終了時点)と, その段階で増えた量を記録する.
+        """
+        self.stages = {}  # 名前 -> 記録
+        self._lock = threading.Lock()  # stagesを書き換える(バックグラウンドのスレッド)間に, report()で読まないようにする
+        self.started = time.time()
+        self._local = threading.local()  # スレッドごとの計測中の段階の名前(path)と, withに入る前のstage_profiler(previous)
+
+    def _state(self, name: str) -> list:
+        """このスレッドの状態のリスト
+
+        Args:
+            name (str): "path"(計測中の段階の名前)または"previous"(withに入る前のstage_profiler)
+
+        Returns:
+            list: 状態
+        """
+        if not hasattr(self._local, name):
+            setattr(self._local, name, [])
+        return getattr(self._local, name)
+
+    def __enter__(self):
+        self._state("previous").append(getattr(_local, "active", None))
+        _local.active = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.active = self._state("previous").pop()
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name: str, samples: int | None = None, beats: int | None = None):
+        """withの中を段階nameとして計測する
+
+        Args:
+            name (str): 段階の名前
+            samples (int | None): 処理したサンプル数
+            beats (int | None): 処理した拍数
+
+        Yields:
+            dict: "samples", "beats"(段階の中で書き換えてよい)
+        """
+        path = self._state("path")
+        path.append(name)
+        key = "/".join(path)
+        counts = {"samples": samples, "beats": beats}
+        # 外側の段階が内側より先に並ぶよう, 始めた時点で記録を作る
+        with self._lock:
+            record = self.stages.setdefault(key, {"stage": key, "calls": 0, "time (s)": 0.0, "samples": 0, "beats": 0,
+                                                  "peak RSS (MB)": None, "RSS growth (MB)": 0.0})
+        rss0 = peak_rss()
+        t0 = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            elapsed = time.perf_counter() - t0
+            rss1 = peak_rss()
+            path.pop()
+            with self._lock:
+                record["calls"] += 1
+                record["time (s)"] += elapsed
+                record["samples"] += counts["samples"] or 0
+                record["beats"] += counts["beats"] or 0
+                if rss1 is not None:
+                    record["peak RSS (MB)"] = rss1
+                    record["RSS growth (MB)"] += rss1 - rss0
+
+    def report(self) -> dict:
+        """記録をJSONにできる辞書にする
+
+        Returns:
+            dict: 開始時刻, 段階ごとの回数, 時間, スループット(M samples/s, beats/s), メモリ, 最大常駐メモリ
+        """
+        with self._lock:
+            records = [dict(record) for record in self.stages.values()]
+        stages = []
+        for record in records:
+            t = record["time (s)"]
+            record["M samples/s"] = record["samples"] / t / 1e6 if record["samples"] and t > 0 else None
+            record["beats/s"] = record["beats"] / t if record["beats"] and t > 0 else None
+            stages.append(record)
+        return {"started": self.started, "stages": stages, "peak RSS (MB)": peak_rss()}
+
+    def save(self, path: str, **info):
+        """記録をJSONファイルに保存する
+
+        Args:
+            path (str): 保存先
+            **info: 一緒に保存する値(ファイル名, 設定など)
+        """
+        with open(path, "w") as f:
+            json.dump({**info, **self.report()}, f, indent=2)
+
+    def text(self) -> str:
+        """記録を表示用の文字列にする(GUIのステータスパネル, -vの出力)
+
+        Returns:
+            str: 1段階1行
+        """
+        lines = []
+        for record in self.report()["stages"]:
+            depth = record["stage"].count("/")
+            name = "  " * depth + record["stage"].rsplit("/", 1)[-1]
+            line = f"{name:<24}{record['time (s)']:8.3f} s"
+            if record["calls"] > 1:
+                line += f" x{record['calls']}"
+            if record["M samples/s"] is not None:
+                line += f"  {record['M samples/s']:.1f} M samples/s"
+            if record["beats/s"] is not None:
+                line += f"  {record['beats/s']:.0f} beats/s"
+            if record["peak RSS (MB)"] is not None:
+                line += f"  RSS {record['peak RSS (MB)']:.0f} MB (+{record['RSS growth (MB)']:.0f})"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def cprofile(path: str):
+    """withの中をcProfileで計測し, pathに保存する(python -m pstats pathで確認できる)
+
+    Args:
+        path (str): 保存先(.prof)
+    """
+    import cProfile
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+
+if __name__ == "__main__":
+    pass
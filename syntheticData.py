@@ -0,0 +1,237 @@
+import math
+
+import numpy as np
+
+# ECGの1拍の波形: (R波からの時間(秒), 振幅(mV), 幅(秒))
+ECG_WAVES = (
+    (-0.20, 0.12, 0.025),  # P
+    (-0.03, -0.10, 0.010),  # Q
+    (0.00, 1.00, 0.010),  # R
+    (0.03, -0.25, 0.010),  # S
+    (0.28, 0.15, 0.045),  # T
+)
+NOISE_RATE = 20  # ゆっくり変わる雑音(基線の揺れ, MSNAの揺らぎ)を作るサンプリング周波数
+
+
+class synthetic_recording:
+    def __init__(self, duration: float, fs: int = 2000, HR: float = 70.0, HRV: float = 0.03,
+                 ectopic_rate: float = 0.0, burst_incidence: float = 50.0, burst_latency: tuple = (1.0, 1.2),
+                 baro_gain: float = 0.03, seed: int = 0):
+        """正解(R波, SBP, DBP, バースト)の分かっているECG, BP, iMSNAの記録を合成する
+
+        拍ごとの値(RR間隔, 血圧, バーストの有無と高さ)は最初に全て決めておき,
+        信号はchunksでチャンクごとに作るので, 24時間の記録でもメモリに全体を持たずに書き出せる.
+        RR間隔は呼吸性の変動(0.25 Hz)と乱数のばらつきを持ち, ectopic_rateの割合で期外収縮
+        (短いRR間隔と代償性休止)が入る. 血圧はMayer波(0.1 Hz)で変動し, バーストは拡張期血圧が
+        低い拍ほど起こりやすい(baro_gain). バーストはR波からburst_latency秒後を頂点とする山になる.
+
+        Args:
+            duration (float): 記録の長さ(秒)
+            fs (int): サンプリング周波数
+            HR (float): 平均心拍数(/分)
+            HRV (float): RR間隔のばらつき(平均に対する標準偏差の割合)
+            ectopic_rate (float): 期外収縮の拍の割合
+            burst_incidence (float): バースト発生率(/100拍, 拡張期血圧が平均の拍)
+            burst_latency (tuple): R波からバーストの頂点までの時間の範囲(秒)
+            baro_gain (float): 拡張期血圧1 mmHgあたりのバーストの確率の変化
+            seed (int): 乱数のシード
+        """
+        self.duration = duration
+        self.fs = fs
+        self.n = int(round(duration * fs))
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+
+        # RR間隔(秒): 呼吸性変動 + ばらつき, 期外収縮は短い間隔と長い間隔の組
+        RR_mean = 60 / HR
+        n_beats = int(duration / RR_mean * 1.2) + 4
+        t_approx = np.arange(n_beats) * RR_mean
+        RR = RR_mean * (1 + 0.05 * np.sin(2 * np.pi * 0.25 * t_approx) + HRV * rng.standard_normal(n_beats))
+        ectopic = rng.random(n_beats) < ectopic_rate
+        ectopic[-1] = False
+        ectopic[1:] &= ~ectopic[:-1]
+        RR[ectopic] = 0.6 * RR_mean
+        RR[1:][ectopic[:-1]] = 1.4 * RR_mean
+        RR = np.maximum(RR, 0.25)
+        R_time = 0.3 + np.concatenate([[0.0], np.cumsum(RR[:-1])])
+        keep = R_time < duration
+        self.R = np.round(R_time[keep] * fs).astype(np.int64)  # R波(サンプル)
+        self.RR = RR[keep]
+        self.ectopic = ectopic[keep]
+        t_beat = self.R / fs
+
+        # 血圧(mmHg): Mayer波 + ばらつき
+        mayer = np.sin(2 * np.pi * 0.1 * t_beat + rng.uniform(0, 2 * np.pi))
+        self.SBP = 120 + 8 * mayer + 3 * rng.standard_normal(len(self.R))
+        self.DBP = 75 + 5 * mayer + 2 * rng.standard_normal(len(self.R))
+
+        # バースト: 拡張期血圧が低い拍ほど起こりやすい
+        p = np.clip(burst_incidence / 100 + baro_gain * (75 - self.DBP), 0, 1)
+        self.Burst = (rng.random(len(self.R)) < p).astype(np.int64)
+        self.burst_peak = self.R + np.round(rng.uniform(*burst_latency, len(self.R)) * fs).astype(np.int64)
+        self.burst_height = np.where(self.Burst == 1, rng.lognormal(np.log(0.6), 0.4, len(self.R)), 0.0)
+
+        # ゆっくり変わる雑音はNOISE_RATEで全体分を作っておき, チャンクごとに補間する
+        n_slow = int(math.ceil(duration * NOISE_RATE)) + 2
+        self.ECG_wander = 0.15 * np.sin(2 * np.pi * 0.25 * np.arange(n_slow) / NOISE_RATE) \
+            + 0.05 * np.cumsum(rng.standard_normal(n_slow)) / math.sqrt(n_slow)
+        self.MSNA_noise = 0.01 * rng.standard_normal(n_slow)
+
+        # 1拍の波形(R波またはバーストの頂点を中心とする)
+        self.ECG_template = self._template(ECG_WAVES, 0.4)
+        self.burst_template = self._template(((0.0, 1.0, 0.1),), 0.4)
+
+    def _template(self, waves: tuple, half_width: float) -> tuple[np.ndarray, np.ndarray]:
+        """ガウス関数の和で1拍の波形を作る
+
+        Args:
+            waves (tuple): (中心からの時間(秒), 振幅, 幅(秒))
+            half_width (float): 波形の中心からの長さ(秒)
+
+        Returns:
+            np.ndarray: 中心からのサンプル数
+            np.ndarray: 波形
+        """
+        offsets = np.arange(-round(half_width * self.fs), round(half_width * self.fs) + 1)
+        t = offsets / self.fs
+        return offsets, sum(a * np.exp(-0.5 * ((t - c) / w) ** 2) for c, a, w in waves)
+
+    def _add_events(self, out: np.ndarray, start: int, centers: np.ndarray, heights: np.ndarray, template: tuple):
+        """チャンク[start, start + len(out))に, centersを中心とする波形をheights倍して足す
+
+        Args:
+            out (np.ndarray): チャンクの信号
+            start (int): チャンクの始点
+            centers (np.ndarray): 波形の中心(サンプル, 昇順)
+            heights (np.ndarray): 波形の倍率
+            template (tuple): _templateの戻り値
+        """
+        offsets, shape = template
+        i0, i1 = np.searchsorted(centers, [start - offsets[-1], start + len(out) - offsets[0]])
+        if i0 >= i1:
+            return
+        idx = (centers[i0:i1, None] + offsets - start).ravel()
+        weights = (heights[i0:i1, None] * shape).ravel()
+        inside = (idx >= 0) & (idx < len(out))
+        out += np.bincount(idx[inside], weights[inside], minlength=len(out))
+
+    def chunks(self, chunk_size: int = 1 << 20, dtype: type = np.float64):
+        """信号をchunk_sizeサンプルずつ作る
+
+        Args:
+            chunk_size (int): 一度に作るサンプル数
+            dtype (type): データの型
+
+        Yields:
+            int: チャンクの始点(サンプル)
+            np.ndarray: ECG(mV)
+            np.ndarray: BP(mmHg)
+            np.ndarray: iMSNA(任意単位, 基線が1)
+        """
+        R_time = self.R / self.fs
+        for start in range(0, self.n, chunk_size):
+            n = min(chunk_size, self.n - start)
+            t = (start + np.arange(n)) / self.fs
+            rng = np.random.default_rng((self.seed, start))
+            slow = np.arange(len(self.ECG_wander)) / NOISE_RATE
+
+            ECG = np.interp(t, slow, self.ECG_wander) + 0.02 * rng.standard_normal(n)
+            self._add_events(ECG, start, self.R, np.where(self.ectopic, 1.3, 1.0), self.ECG_template)
+
+            # BP: 拍の中の位相で, 拡張期(位相0.1)から収縮期(位相0.3)に上がって指数的に下がる
+            k = np.clip(np.searchsorted(R_time, t, side="right") - 1, 0, len(R_time) - 1)
+            phase = np.clip((t - R_time[k]) / self.RR[k], 0, 1)
+            decay = 0.05 + 0.95 * np.exp(-(phase - 0.3) / 0.25) + 0.08 * np.exp(-0.5 * ((phase - 0.45) / 0.03) ** 2)
+            end = 0.05 + 0.95 * math.exp(-0.7 / 0.25)
+            shape = np.where(phase < 0.1, end * (1 - phase / 0.1),
+                             np.where(phase < 0.3, np.sin(np.pi / 2 * (phase - 0.1) / 0.2) ** 2, decay))
+            BP = self.DBP[k] + (self.SBP[k] - self.DBP[k]) * shape + 0.3 * rng.standard_normal(n)
+
+            MSNA = 1 + np.interp(t, slow, self.MSNA_noise) + 0.002 * rng.standard_normal(n)
+            self._add_events(MSNA, start, self.burst_peak, self.burst_height, self.burst_template)
+            yield start, ECG.astype(dtype, copy=False), BP.astype(dtype, copy=False), MSNA.astype(dtype, copy=False)
+
+    def signals(self, dtype: type = np.float64) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """信号の全体を作る
+
+        Args:
+            dtype (type): データの型
+
+        Returns:
+            np.ndarray: ECG
+            np.ndarray: BP
+            np.ndarray: iMSNA
+        """
+        data = np.empty((3, self.n), dtype=dtype)
+        for start, *columns in self.chunks(dtype=dtype):
+            for row, column in zip(data, columns):
+                row[start:start + len(column)] = column
+        return data[0], data[1], data[2]
+
+    def write_txt(self, path: str, chunk_size: int = 1 << 20):
+        """3列(ECG, BP, iMSNA)の.txtファイルとして書き出す(GUIで開ける形式)
+
+        Args:
+            path (str): 保存先
+            chunk_size (int): 一度に書き出すサンプル数
+        """
+        with open(path, "w") as f:
+            for _, ECG, BP, MSNA in self.chunks(chunk_size):
+                # np.savetxtと同じ書式で, 行ごとの書式化をまとめて行う
+                f.write("".join(map("%.5f\t%.5f\t%.5f\n".__mod__, zip(ECG.tolist(), BP.tolist(), MSNA.tolist()))))
+
+    def beat_truth(self, region: tuple[float, float] = (0.5, 1.5)) -> np.ndarray:
+        """各拍の正解のバーストの有無
+
+        バーストはR波の後の区間regionの中に頂点がある拍に数える(頂点が区間外になる拍はバーストなし).
+
+        Args:
+            region (tuple[float, float]): R波からのバースト判定区間(秒)
+
+        Returns:
+            np.ndarray: バーストの有無(0 | 1)
+        """
+        latency = (self.burst_peak - self.R) / self.fs
+        return self.Burst * ((latency >= region[0]) & (latency <= region[1]))
+
+    def evaluate(self, peaks_ECG: np.ndarray, offset: int, df, region: tuple[float, float] = (0.5, 1.5),
+                 tolerance: float = 0.05) -> dict:
+        """検出したR波と結果表を正解と比べる
+
+        検出したR波は, tolerance秒以内にある最も近い正解のR波と対応させる.
+
+        Args:
+            peaks_ECG (np.ndarray): 検出したECGのピーク(data_set.read_dataの戻り値)
+            offset (int): 切り詰める前の最初のピークの位置(サンプル)
+            df (pd.DataFrame): 結果表(msnaAnalyze.score_beatsの戻り値)
+            region (tuple[float, float]): R波からのバースト判定区間(秒)
+            tolerance (float): R波を対応させる時間の誤差(秒)
+
+        Returns:
+            dict: R波の感度と陽性的中率, SBPとDBPの平均絶対誤差, バーストの感度, 特異度, 一致率, 発生率
+        """
+        detected = np.asarray(peaks_ECG, dtype=np.int64) + offset
+        i = np.clip(np.searchsorted(self.R, detected), 1, len(self.R) - 1)
+        nearest = np.where(np.abs(detected - self.R[i - 1]) <= np.abs(detected - self.R[i]), i - 1, i)
+        matched = np.abs(detected - self.R[nearest]) <= tolerance * self.fs
+
+        # 結果表の行(最後の2拍を除く拍)のうち, 正解のR波と対応した拍
+        rows = np.flatnonzero(matched[:len(df)])
+        k = nearest[rows]
+        truth = self.beat_truth(region)[k]
+        Burst = df["Burst"].to_numpy()[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {
+                "R sensitivity": len(np.unique(nearest[matched])) / len(self.R),
+                "R PPV": float(np.count_nonzero(matched) / len(detected)) if len(detected) else float("nan"),
+                "SBP MAE": float(np.mean(np.abs(df["SBP"].to_numpy()[rows] - self.SBP[k]))),
+                "DBP MAE": float(np.mean(np.abs(df["DBP"].to_numpy()[rows] - self.DBP[k]))),
+                "burst sensitivity": float(np.mean(Burst[truth == 1] == 1)),
+                "burst specificity": float(np.mean(Burst[truth == 0] == 0)),
+                "burst agreement": float(np.mean(Burst == truth)),
+                "true incidence": float(np.mean(truth) * 100),
+                "detected incidence": float(np.mean(Burst) * 100),
+            }
+
+if __name__ == "__main__":
+    pass